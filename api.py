@@ -1,23 +1,62 @@
-from typing import List
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+import json
+import re
+import time
+from typing import AsyncIterator, Dict, Iterator, List
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from schemas import SelectedImageIndex,FindImage,SelectedImageUrl,ArticleRequest,ArticleResponse,SearchQueryResponse
+from schemas import SelectedImageIndex,FindImage,SelectedImageUrl,ArticleRequest,ArticleResponse,SearchQueryResponse,PregenerationStats,CacheStats,LatencyStats
 from dotenv import load_dotenv
-from openai import OpenAI
-from utils import *
+from utils import fetch_images, generate_search_query_from_articles
+from clients import open_clients, close_clients, get_async_openai_client
+from image_cache import get_image_search_cache, get_image_selection_cache, image_selection_key
+from article_groups import GroupIndex
+from article_pregeneration import ArticlePregenerator
+from stage_latency import LatencyRecorder
+from metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, REGISTRY, external_call, monitor_event_loop_lag, record_llm_usage, span
 import logging
-import pandas as pd
+import os
 
 # Path to the CSV file
 CSV_PATH = "./data/df_with_embedding_and_sorted_groups.csv"
+# Number of upcoming groups whose articles are generated in the background
+PREGENERATE_AHEAD = int(os.getenv("PREGENERATE_AHEAD", 3))
 # Global variable for tracking the current article group index
 articleIndex = 0
+# In-memory index of the grouped articles, loaded at startup and hot-reloaded when the CSV changes
+group_index = None
+# Background generator and cache of the upcoming groups' articles
+pregenerator = None
+# Start writing the article while the image is searched and selected, splicing the image URL in afterwards
+PIPELINE_FULL_ARTICLE = os.getenv("PIPELINE_FULL_ARTICLE", "1") == "1"
+# Stand-in image URL the article is written with in pipelined mode
+IMAGE_PLACEHOLDER = "https://images.placeholder/selected-image.jpg"
+# Recent latencies of the generate-full-article stages
+stage_latencies = LatencyRecorder()
 # Configure logging at the beginning of the script
 logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global group_index, pregenerator
+    await open_clients()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    group_index = GroupIndex(CSV_PATH)
+    pregenerator = ArticlePregenerator(group_index, generate_group_article, lookahead=PREGENERATE_AHEAD)
+    await pregenerator.start()
+    pregenerator.schedule_from(articleIndex)
+    yield
+    await pregenerator.stop()
+    lag_monitor.cancel()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -27,9 +66,131 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request counts, latencies and per-request stage traces (served at /metrics)
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """
+    Time a generate-full-article stage in both the /latency-stats window and the /metrics histograms.
+    """
+    with span(stage), stage_latencies.timed(stage):
+        yield
+
+def build_article_prompt(articles: str, image_url: str) -> str:
+    """
+    Prompt asking GPT-4o to write the markdown article combining `articles`, with the image at `image_url`.
+    """
+    return f"""
+        You are a skilled journalist tasked with writing an article for an online newspaper that specializes in Electric Vehicle (EV) content. Your goal is to create a new and engaging article that combines the information from the following articles. 
+
+        The articles are as follows:
+        
+        {articles}
+
+        Additionally, here is an image URL: {image_url}
+
+        Please generate a new article using this exact markdown structure without any backticks:
+
+        # Main Title
+
+        ![image]({image_url})
+
+        Introduction paragraph here.
+
+        ## First Subheading
+        Content for first section.
+
+        ## Second Subheading
+        Content for second section.
+
+        And so on with your article content. The article should:
+        - Combine key insights from the three articles into a single, cohesive piece. Feel free to select the most interesting information, and filter out what is not necessary.
+        - Be informative, engaging, and written in a journalistic style
+        - Use markdown headings (# and ##) for structure
+        - Place the image near the top after the title
+        - Use the image in markdown format: `![image]({image_url})`.
+
+        Important: Do not include any backticks (```) in your response. Output the markdown directly.
+        """
+
+
+def splice_image_url(article: str, image_url: str) -> str:
+    """
+    Put the selected image into an article written with IMAGE_PLACEHOLDER.
+
+    Without an image (the image stages failed), the placeholder image is removed. If the model left the
+    placeholder out, the image is inserted after the title.
+    """
+    if not image_url:
+        return re.sub(r"!\[[^\]]*\]\(" + re.escape(IMAGE_PLACEHOLDER) + r"\)[ \t]*\n*", "", article).strip()
+    if IMAGE_PLACEHOLDER in article:
+        return article.replace(IMAGE_PLACEHOLDER, image_url)
+    title, _, body = article.partition("\n")
+    return f"{title}\n\n![image]({image_url})\n{body}".strip()
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """
+    Format one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_article_tokens(articles: str, image_url: str) -> AsyncIterator[str]:
+    """
+    Generate the article with the model's streaming API, yielding the markdown as the tokens arrive.
+    """
+    client = get_async_openai_client()
+    with span("article_stream"), external_call("llm", "gpt-4o"):
+        stream = await client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "user", "content": [{"type": "text", "text": build_article_prompt(articles, image_url)}]},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None) is not None:
+                # The last chunk (without choices) carries the token usage of the whole completion
+                record_llm_usage(chunk)
+
+
+async def article_event_stream(request: ArticleRequest, with_image_search: bool) -> AsyncIterator[str]:
+    """
+    Server-sent events of an article generation: a "stage" event when each step starts (query, image, article),
+    a "token" event per markdown fragment, then "done" with the whole article (or "error").
+    """
+    try:
+        image_url = request.image_url
+        if with_image_search:
+            yield sse_event("stage", {"stage": "query"})
+            search_query = (await generate_image_query(request)).search_query
+            yield sse_event("stage", {"stage": "image", "search_query": search_query})
+            image_url = (await find_image(FindImage(description=search_query, nimages=10))).url
+        yield sse_event("stage", {"stage": "article", "image_url": image_url})
+        fragments = []
+        async for fragment in stream_article_tokens(request.articles, image_url):
+            fragments.append(fragment)
+            yield sse_event("token", {"text": fragment})
+        yield sse_event("done", {"article": "".join(fragments).strip()})
+    except Exception as e:
+        logging.error(f"Error occurred while streaming the article: {str(e)}")
+        yield sse_event("error", {"detail": "Error generating article."})
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    # Disable caching and proxy buffering so each event reaches the client as soon as it is sent
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
 # API Endpoint: Process description and return selected image
-@app.post("/find-image/", response_model=SelectedImageIndex)
+@app.post("/find-image/", response_model=SelectedImageUrl)
 async def find_image(request: FindImage):
     """
     Fetches images based on a description, asks ChatGPT to select the best one, and returns its index.
@@ -44,7 +205,7 @@ async def find_image(request: FindImage):
     """
     try:
         # Step 1: Fetch images
-        image_urls = fetch_images(request.description, request.nimages)
+        image_urls = await fetch_images(request.description, request.nimages)
         if not image_urls:
             print('Error in the bing search')
             raise HTTPException(status_code=404, detail="No images found.")
@@ -57,30 +218,38 @@ async def find_image(request: FindImage):
             f"one based on the description. Respond with the index (0-based) of the chosen image."
         )
 
-        client = OpenAI()  # Instantiate OpenAI client
-        print('Sending images and prompt to chatgpt')
-        response = client.beta.chat.completions.parse(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        *[
-                             {
-                                "type": "image_url",
-                                "image_url": {"url": url},  # Use the actual image URL here
-                            }
-                            for url in image_urls  # `image_urls` is a list of raw image URLs
-                        ],
+        # Reuse the choice made earlier for the same description and candidates
+        selection_cache = get_image_selection_cache()
+        selection_key = image_selection_key(request.description, image_urls)
+        chosen_index = await selection_cache.aget(selection_key)
+        if chosen_index is None:
+            client = get_async_openai_client()  # Shared OpenAI client
+            print('Sending images and prompt to chatgpt')
+            with span("vision_selection"), external_call("llm", "gpt-4o"):
+                response = await client.beta.chat.completions.parse(
+                    model="gpt-4o",
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                *[
+                                     {
+                                        "type": "image_url",
+                                        "image_url": {"url": url},  # Use the actual image URL here
+                                    }
+                                    for url in image_urls  # `image_urls` is a list of raw image URLs
+                                ],
+                            ],
+                        }
                     ],
-                }
-            ],
-            response_format=SelectedImageIndex,  # Enforce the integer response schema
-        )
+                    response_format=SelectedImageIndex,  # Enforce the integer response schema
+                )
+            record_llm_usage(response)
 
-        # Parse the index from the response
-        chosen_index = response.choices[0].message.parsed.index
+            # Parse the index from the response
+            chosen_index = response.choices[0].message.parsed.index
+            await selection_cache.aset(selection_key, chosen_index)
 
         # Step 4: Validate the chosen index
         if not (0 <= chosen_index < len(image_urls)):
@@ -108,7 +277,7 @@ async def generate_image_query(request: ArticleRequest):
     """
     try:
         # Use ChatGPT to generate the search query from article content
-        search_query = generate_search_query_from_articles(request.articles)
+        search_query = await generate_search_query_from_articles(request.articles)
         
         # Return the search query as part of the response
         return SearchQueryResponse(search_query=search_query)
@@ -125,50 +294,21 @@ async def generate_article(request: ArticleRequest):
     """
     try:
         # Prepare the prompt for ChatGPT
-        prompt = f"""
-        You are a skilled journalist tasked with writing an article for an online newspaper that specializes in Electric Vehicle (EV) content. Your goal is to create a new and engaging article that combines the information from the following articles. 
+        prompt = build_article_prompt(request.articles, request.image_url)
 
-        The articles are as follows:
-        
-        {request.articles}
-
-        Additionally, here is an image URL: {request.image_url}
-
-        Please generate a new article using this exact markdown structure without any backticks:
-
-        # Main Title
-
-        ![image]({request.image_url})
-
-        Introduction paragraph here.
-
-        ## First Subheading
-        Content for first section.
-
-        ## Second Subheading
-        Content for second section.
-
-        And so on with your article content. The article should:
-        - Combine key insights from the three articles into a single, cohesive piece. Feel free to select the most interesting information, and filter out what is not necessary.
-        - Be informative, engaging, and written in a journalistic style
-        - Use markdown headings (# and ##) for structure
-        - Place the image near the top after the title
-        - Use the image in markdown format: `![image]({request.image_url})`.
-
-        Important: Do not include any backticks (```) in your response. Output the markdown directly.
-        """
-
-        # Instantiate the OpenAI client
-        client = OpenAI()
+        # Use the shared OpenAI client
+        client = get_async_openai_client()
 
         # Make the API call to generate the article
         logging.info("Sending request to OpenAI API.")
-        response = client.beta.chat.completions.parse(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": [{"type": "text", "text": prompt}]},
-            ]
-        )
+        with span("article_generation"), external_call("llm", "gpt-4o"):
+            response = await client.beta.chat.completions.parse(
+                model="gpt-4o",
+                messages=[
+                    {"role": "user", "content": [{"type": "text", "text": prompt}]},
+                ]
+            )
+        record_llm_usage(response)
         print(response)
         # Extract the generated article
         article = response.choices[0].message.content.strip()  # Directly access 'content'
@@ -188,6 +328,9 @@ async def generate_full_article(request: ArticleRequest):
     2. Fetching images using the search query.
     3. Generating a markdown article with the image included.
 
+    With PIPELINE_FULL_ARTICLE (the default), step 3 runs alongside steps 1-2 and the image URL is spliced
+    in afterwards; an image failure then yields an article without an image instead of an error.
+
     Args:
     A ArticleRequest containing:
         articles (str): Text content of multiple articles.
@@ -196,19 +339,13 @@ async def generate_full_article(request: ArticleRequest):
     ArticleResponse: Object containing the markdown of the generated article with image.
     """
     try:
-        # Step 1: Generate the search query from the articles
-        search_query_response = await generate_image_query(request)
-        search_query = search_query_response.search_query
-        logging.info(f"Generated search query: {search_query}")
-
-        # Step 2: Fetch images using the search query
-        find_image_request = FindImage(description=search_query, nimages=10)  # You can set nimages to any number you want
-        selected_image_url_response = await find_image(find_image_request)
-        image_url = selected_image_url_response.url
-        logging.info(f"Selected image URL: {image_url}")
-
-        # Step 3: Generate the final markdown article using the articles and the image URL
-        article_response = await generate_article(ArticleRequest(articles=request.articles, image_url=image_url))
+        start = time.perf_counter()
+        if PIPELINE_FULL_ARTICLE:
+            article_response = await generate_full_article_pipelined(request)
+        else:
+            article_response = await generate_full_article_sequential(request)
+        mode = "pipelined" if PIPELINE_FULL_ARTICLE else "sequential"
+        stage_latencies.record(f"full_article/{mode}", time.perf_counter() - start)
         return article_response
     
     except Exception as e:
@@ -216,53 +353,156 @@ async def generate_full_article(request: ArticleRequest):
         raise HTTPException(status_code=500, detail="Error generating full article.")
 
 
+async def select_article_image(request: ArticleRequest) -> str:
+    """
+    Generate the image search query of the articles, then search and select the image (timing each stage).
+    """
+    # Step 1: Generate the search query from the articles
+    with timed_stage("image_query"):
+        search_query_response = await generate_image_query(request)
+    search_query = search_query_response.search_query
+    logging.info(f"Generated search query: {search_query}")
+
+    # Step 2: Fetch images using the search query
+    with timed_stage("image_selection"):
+        find_image_request = FindImage(description=search_query, nimages=10)  # You can set nimages to any number you want
+        selected_image_url_response = await find_image(find_image_request)
+    image_url = selected_image_url_response.url
+    logging.info(f"Selected image URL: {image_url}")
+    return image_url
+
+
+async def write_article(articles: str, image_url: str) -> str:
+    with timed_stage("article"):
+        article_response = await generate_article(ArticleRequest(articles=articles, image_url=image_url))
+    return article_response.article
+
+
+async def generate_full_article_sequential(request: ArticleRequest) -> ArticleResponse:
+    """
+    Select the image, then write the article with it (each stage waits for the previous one).
+    """
+    image_url = await select_article_image(request)
+    # Step 3: Generate the final markdown article using the articles and the image URL
+    return ArticleResponse(article=await write_article(request.articles, image_url))
+
+
+async def generate_full_article_pipelined(request: ArticleRequest) -> ArticleResponse:
+    """
+    Write the article with IMAGE_PLACEHOLDER while the image is selected, then splice the image URL in.
+
+    The article does not depend on the image beyond its URL, so the end-to-end latency is the longest of the
+    two branches instead of their sum. If the image stages fail, the article is returned without an image.
+    """
+    image_result, article_result = await asyncio.gather(
+        select_article_image(request),
+        write_article(request.articles, IMAGE_PLACEHOLDER),
+        return_exceptions=True,
+    )
+    if isinstance(article_result, BaseException):
+        raise article_result
+    if isinstance(image_result, BaseException):
+        logging.warning(f"Image selection failed, returning the article without an image: {str(image_result)}")
+        image_result = ""
+    return ArticleResponse(article=splice_image_url(article_result, image_result))
+
+
+@app.post("/generate-article-stream/")
+async def generate_article_stream(request: ArticleRequest):
+    """
+    Streaming variant of generate-article: server-sent events with the markdown as it is generated.
+    """
+    return sse_response(article_event_stream(request, with_image_search=False))
+
+
+@app.post("/generate-full-article-stream/")
+async def generate_full_article_stream(request: ArticleRequest):
+    """
+    Streaming variant of generate-full-article: server-sent events reporting the query, image and article
+    stages, then the markdown as it is generated.
+    """
+    return sse_response(article_event_stream(request, with_image_search=True))
+
+
 @app.get("/next-article/", response_model=ArticleResponse)
 async def next_article():
     """
-    Generate the next article by reading from the CSV file, preparing the input for
-    generate-full-article, and cycling through groups using articleIndex.
+    Return the article of the next group, cycling through groups using articleIndex.
+
+    Articles are pre-generated in the background a few groups ahead of the cursor, so this usually
+    returns a cached article; on a cache miss the article is generated with generate-full-article.
     """
     global articleIndex  # Access the global variable
 
     try:
-        # Step 1: Read the CSV file
-        logging.info("Reading CSV file...")
-        df = pd.read_csv(CSV_PATH)
-
-        # Ensure the 'group' and 'content' columns exist
-        if 'group' not in df.columns or 'content' not in df.columns:
-            raise ValueError("CSV must contain 'group' and 'content' columns.")
-
-        # Step 2: Fetch articles for the current group
-        current_group = df[df['group'] == articleIndex]
-        if current_group.empty:
-            raise ValueError(f"No articles found for group {articleIndex}.")
-
-        # Combine content from the group into a single string
-        articles_combined = "\n\n".join(
-            f"title = {row['title']}\ncontent = {row['content']}"
-            for _, row in current_group.iterrows()
-        )
+        # Reload the group index off the event loop if the CSV changed (a no-op stat check otherwise)
+        await asyncio.to_thread(group_index.refresh)
 
-        # Step 3: Increment the global article index (cycle 0-9)
-        articleIndex = (articleIndex + 1) % 10
+        # Step 1: Move the global article index to the next group, cycling through the available groups
+        current_group = articleIndex
+        articleIndex = group_index.next_group_id(current_group)
         logging.info(f"Moving to the next article group: {articleIndex}")
 
-        # Step 4: Internally call generate-full-article
-        article_request = {
-            "articles": articles_combined,
-            "image_url": ""
-        }
-        full_article = await generate_full_article(ArticleRequest(**article_request))
+        # Step 2: Serve the pre-generated article of the current group (generated on demand on a cache miss)
+        with span("pregenerated_article"):
+            article = await pregenerator.get(current_group)
+
+        # Step 3: Keep the background queue ahead of the cursor
+        pregenerator.schedule_from(articleIndex)
 
-        return full_article
+        return ArticleResponse(article=article)
 
     except Exception as e:
         logging.error(f"Error in /next-article endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate the next article.")
 
 
+async def generate_group_article(articles_combined: str) -> str:
+    """
+    Generate the article of a group with generate-full-article (used by the background pre-generator).
+    """
+    full_article = await generate_full_article(ArticleRequest(articles=articles_combined, image_url=""))
+    return full_article.article
+
+
+@app.get("/pregeneration-stats/", response_model=PregenerationStats)
+async def pregeneration_stats():
+    """
+    Report the background generation queue depth and the article cache hit rate.
+    """
+    return PregenerationStats(**pregenerator.stats())
+
+
+@app.get("/cache-stats/", response_model=Dict[str, CacheStats])
+async def cache_stats():
+    """
+    Report hit/miss counters of the persistent image search and image selection caches.
+    """
+    return {
+        "image_search": CacheStats(**get_image_search_cache().stats()),
+        "image_selection": CacheStats(**get_image_selection_cache().stats()),
+    }
+
+
+@app.get("/latency-stats/", response_model=Dict[str, LatencyStats])
+async def latency_stats():
+    """
+    Report recent latencies of the generate-full-article stages (image_query, image_selection, article) and
+    end to end (full_article/pipelined or full_article/sequential).
+    """
+    return {stage: LatencyStats(**stats) for stage, stats in stage_latencies.stats().items()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: request counts and latencies per endpoint, stage latencies, external call outcomes
+    and LLM token usage.
+    """
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 # Run the FastAPI server
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("api:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("api:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+from embedding_store import read_metadata
+
+# Only these columns are needed to build the prompt of a group
+GROUP_COLUMNS = ["group", "title", "content"]
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def combine_articles(titles: List[str], contents: List[str]) -> str:
+    """
+    Build the prompt input of a group, in the format expected by /generate-full-article/.
+    """
+    return "\n\n".join(
+        f"title = {title}\ncontent = {content}"
+        for title, content in zip(titles, contents)
+    )
+
+
+class GroupSnapshot:
+    """
+    Immutable view of the grouped CSV at one point in time: the combined articles and their hashes.
+
+    GroupIndex swaps whole snapshots, so a reader holding one always sees articles and hashes that match.
+    """
+
+    def __init__(self, articles_by_group: Dict[int, str], stat=None, file_hash: Optional[str] = None,
+                 hash_by_group: Optional[Dict[int, str]] = None):
+        if hash_by_group is None:
+            hash_by_group = {
+                group_id: hashlib.sha256(articles.encode("utf-8")).hexdigest()
+                for group_id, articles in articles_by_group.items()
+            }
+        self._articles_by_group = MappingProxyType(dict(articles_by_group))
+        self._hash_by_group = MappingProxyType(dict(hash_by_group))
+        self.group_ids: Tuple[int, ...] = tuple(sorted(self._articles_by_group))
+        self.stat = stat
+        self.file_hash = file_hash
+
+    def __len__(self) -> int:
+        return len(self.group_ids)
+
+    def with_stat(self, stat) -> "GroupSnapshot":
+        return GroupSnapshot(self._articles_by_group, stat, self.file_hash, self._hash_by_group)
+
+    def next_group_id(self, group_id: int) -> int:
+        """
+        Return the group following `group_id` in id order, wrapping around to the first group.
+        """
+        if not self.group_ids:
+            raise ValueError("No article groups found.")
+        return next((candidate for candidate in self.group_ids if candidate > group_id), self.group_ids[0])
+
+    def get(self, group_id: int) -> str:
+        """
+        Return the combined articles of a group.
+
+        Raises:
+            ValueError: If the group does not exist.
+        """
+        articles = self._articles_by_group.get(group_id)
+        if articles is None:
+            raise ValueError(f"No articles found for group {group_id}.")
+        return articles
+
+    def content_hash(self, group_id: int) -> str:
+        """
+        Return the sha256 of the combined articles of a group, which changes whenever its content does.
+        """
+        return self._hash_by_group[group_id]
+
+
+class GroupIndex:
+    """
+    In-memory map from group id to the combined articles of the group.
+
+    The grouped CSV is read once (only the columns in GROUP_COLUMNS) and every group's prompt input is
+    precomputed into a GroupSnapshot. Lookups only read the current snapshot and never touch the file, so
+    they are safe on the event loop. `refresh` (run it in a worker thread) checks the file's mtime and
+    size; if they changed, the content hash is recomputed and a new snapshot is published in a single
+    assignment when the content actually differs.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._snapshot = GroupSnapshot({})
+        self.reload()
+
+    def _file_stat(self):
+        stat = os.stat(self.csv_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def snapshot(self) -> GroupSnapshot:
+        return self._snapshot
+
+    def reload(self, file_hash: Optional[str] = None) -> None:
+        """
+        Rebuild the index from the CSV.
+        """
+        stat = self._file_stat()
+        file_hash = file_hash or file_sha256(self.csv_path)
+
+        df = read_metadata(self.csv_path, lambda column: column in GROUP_COLUMNS)
+        if 'group' not in df.columns or 'content' not in df.columns:
+            raise ValueError("CSV must contain 'group' and 'content' columns.")
+        df = df.dropna(subset=['group'])
+
+        articles_by_group = {}
+        for group_id, group_df in df.groupby('group', sort=True):
+            articles_by_group[int(group_id)] = combine_articles(group_df['title'].tolist(), group_df['content'].tolist())
+
+        self._snapshot = GroupSnapshot(articles_by_group, stat, file_hash)
+        logging.info(f"Loaded {len(articles_by_group)} article groups from {self.csv_path}")
+
+    def refresh(self) -> bool:
+        """
+        Reload the index if the file changed since the last load. Blocking: call it off the event loop.
+
+        Returns:
+            bool: True if the index was rebuilt.
+        """
+        stat = self._file_stat()
+        if stat == self._snapshot.stat:
+            return False
+        with self._lock:
+            snapshot = self._snapshot
+            if stat == snapshot.stat:
+                return False
+            file_hash = file_sha256(self.csv_path)
+            if file_hash == snapshot.file_hash:
+                # Touched but not modified: keep the groups under the new stat
+                self._snapshot = snapshot.with_stat(stat)
+                return False
+            self.reload(file_hash)
+            return True
+
+    @property
+    def group_ids(self) -> List[int]:
+        return list(self._snapshot.group_ids)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def next_group_id(self, group_id: int) -> int:
+        """
+        Return the group following `group_id` in id order, wrapping around to the first group.
+        """
+        return self._snapshot.next_group_id(group_id)
+
+    def get(self, group_id: int) -> str:
+        """
+        Return the combined articles of a group.
+
+        Raises:
+            ValueError: If the group does not exist.
+        """
+        return self._snapshot.get(group_id)
+
+    def content_hash(self, group_id: int) -> str:
+        """
+        Return the sha256 of the combined articles of a group, which changes whenever its content does.
+        """
+        return self._snapshot.content_hash(group_id)
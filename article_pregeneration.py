@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from article_groups import GroupIndex, GroupSnapshot
+
+# (group id, sha256 of the group's combined articles)
+CacheKey = Tuple[int, str]
+
+
+class ArticlePregenerator:
+    """
+    Generates the articles of upcoming groups in the background and caches them.
+
+    Articles are cached by group id and content hash, so a group is regenerated only when the grouped CSV
+    changes its articles. `get` serves a cached article immediately, waits for a generation already in flight,
+    or falls back to generating on demand when the group was never scheduled.
+    """
+
+    def __init__(self,
+                 group_index: GroupIndex,
+                 generate_fn: Callable[[str], Awaitable[str]],
+                 lookahead: int = 3,
+                 max_cache_size: int = 64,
+                 num_workers: int = 1):
+        """
+        Args:
+            group_index (GroupIndex): Source of the groups' combined articles.
+            generate_fn (callable): Async function turning a group's combined articles into the final article.
+            lookahead (int): Number of groups to pre-generate ahead of the cursor.
+            max_cache_size (int): Maximum number of cached articles (least recently used are evicted).
+            num_workers (int): Number of concurrent background generations.
+        """
+        self.group_index = group_index
+        self.generate_fn = generate_fn
+        self.lookahead = lookahead
+        self.max_cache_size = max_cache_size
+        self.num_workers = num_workers
+
+        self._cache: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = set()
+        self._workers = []
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+
+    @staticmethod
+    def _key(snapshot: GroupSnapshot, group_id: int) -> CacheKey:
+        return group_id, snapshot.content_hash(group_id)
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def schedule_from(self, group_id: int) -> None:
+        """
+        Queue `group_id` and the groups following it (up to `lookahead` groups in total) for generation.
+        """
+        if self._queue is None:
+            return
+        snapshot = self.group_index.snapshot
+        for _ in range(min(self.lookahead, len(snapshot))):
+            if group_id in snapshot.group_ids:
+                key = self._key(snapshot, group_id)
+                if key not in self._cache and key not in self._in_flight and group_id not in self._queued:
+                    self._queued.add(group_id)
+                    self._queue.put_nowait(group_id)
+            group_id = snapshot.next_group_id(group_id)
+
+    async def _generate(self, key: CacheKey, articles: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            article = await self.generate_fn(articles)
+        except Exception as e:
+            self.failures += 1
+            future.set_exception(e)
+            raise
+        else:
+            self.generated += 1
+            self._cache[key] = article
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+            future.set_result(article)
+            return article
+        finally:
+            self._in_flight.pop(key, None)
+            if not future.done():
+                # Cancelled (shutdown or stop()): fail the waiters so they generate on demand instead of hanging
+                future.set_exception(RuntimeError("Article generation was cancelled"))
+            # Mark any exception as retrieved in case nobody is waiting on this generation
+            future.exception()
+
+    async def _worker(self) -> None:
+        while True:
+            group_id = await self._queue.get()
+            self._queued.discard(group_id)
+            try:
+                # The group may have changed or disappeared since it was queued
+                snapshot = self.group_index.snapshot
+                if group_id not in snapshot.group_ids:
+                    continue
+                key = self._key(snapshot, group_id)
+                if key in self._cache or key in self._in_flight:
+                    continue
+                logging.info(f"Pre-generating article for group {group_id}")
+                await self._generate(key, snapshot.get(group_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error pre-generating article for group {group_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def get(self, group_id: int) -> str:
+        """
+        Return the article of a group, from the cache when possible.
+
+        Raises:
+            ValueError: If the group does not exist.
+        """
+        # Articles and cache key from the same snapshot, even if the index is reloaded meanwhile
+        snapshot = self.group_index.snapshot
+        articles = snapshot.get(group_id)
+        key = self._key(snapshot, group_id)
+
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            # Already being generated in the background: waiting is still faster than starting over
+            try:
+                article = await asyncio.shield(in_flight)
+                self.hits += 1
+                return article
+            except Exception as e:
+                logging.warning(f"Background generation for group {group_id} failed, retrying on demand: {str(e)}")
+
+        self.misses += 1
+        return await self._generate(key, articles)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._in_flight),
+            "cached_articles": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "generated": self.generated,
+            "failures": self.failures,
+        }
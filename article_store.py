@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# SQLite database of every article seen by the collectors, with the results of the pipeline stages
+SEEN_ARTICLES_DB = os.getenv("SEEN_ARTICLES_DB", "data/seen_articles.sqlite")
+
+# Query parameters that only track the visitor and do not change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "ocid", "cvid", "ei", "mc_cid", "mc_eid", "ref", "src", "cmpid", "wt_mc"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of an article URL: lowercase scheme and host without "www.", no fragment, no tracking
+    parameters (utm_* and TRACKING_PARAMS), sorted query and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, urlencode(query), ""))
+
+
+def content_hash(text: Optional[str]) -> Optional[str]:
+    """
+    Hash of an article text, insensitive to case and whitespace. None for empty texts.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SeenArticleStore:
+    """
+    Persistent record of the articles already ingested, keyed by canonical URL and indexed by content hash.
+
+    The collectors skip known URLs before fetching and known contents before validating, and the scoring
+    stages reuse the stored feedback and summaries, so a run only processes the articles that are new.
+    `counts` tallies what each stage skipped and processed during this run.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SEEN_ARTICLES_DB
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url_key TEXT PRIMARY KEY, url TEXT NOT NULL, content_hash TEXT, source TEXT, "
+            "first_seen REAL NOT NULL, last_seen REAL NOT NULL, "
+            "is_valid_article INTEGER, validation TEXT, feedback TEXT, summary TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash)")
+        self.counts: Counter = Counter()
+
+    def _row(self, url: str, column: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {column} FROM articles WHERE url_key = ?", (canonicalize_url(url),)).fetchone()
+        return row[0] if row is not None else None
+
+    def has_url(self, url: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM articles WHERE url_key = ?", (canonicalize_url(url),)).fetchone()
+        return row is not None
+
+    def has_content(self, text: Optional[str]) -> bool:
+        digest = content_hash(text)
+        if digest is None:
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM articles WHERE content_hash = ? LIMIT 1", (digest,)).fetchone()
+        return row is not None
+
+    def skip_known_urls(self, articles: List[Dict], url_key: str, stage: str) -> List[Dict]:
+        """
+        Drop the articles whose URL is already stored (or repeated within `articles`), before they are fetched.
+        """
+        new_articles, seen = [], set()
+        for article in articles:
+            url = article.get(url_key)
+            key = canonicalize_url(url) if url else None
+            if key is None or key in seen or self.has_url(url):
+                self.counts[f"{stage}/skipped_known_url"] += 1
+                continue
+            seen.add(key)
+            new_articles.append(article)
+        return new_articles
+
+    def skip_known_contents(self, articles: List[Dict], stage: str) -> List[Dict]:
+        """
+        Drop the fetched articles whose text is already stored (e.g. syndicated copies under another URL).
+        """
+        new_articles, seen = [], set()
+        for article in articles:
+            digest = content_hash(article.get('full_content'))
+            if digest is not None and (digest in seen or self.has_content(article.get('full_content'))):
+                self.counts[f"{stage}/skipped_known_content"] += 1
+                continue
+            if digest is not None:
+                seen.add(digest)
+            new_articles.append(article)
+        return new_articles
+
+    def record_validations(self, articles: Iterable[Dict], url_key: str, stage: str) -> None:
+        """
+        Store validated articles (valid or not, so invalid pages are not fetched and validated again).
+
+        Articles whose validation call failed (marked 'validation_error') were never judged by the model and
+        are not stored, so a later run fetches and validates them again.
+        """
+        now = time.time()
+        rows = []
+        for article in articles:
+            url = article.get(url_key)
+            if not url:
+                continue
+            if article.get('validation_error'):
+                self.counts[f"{stage}/validation_error"] += 1
+                continue
+            validation = {
+                "is_valid_article": article.get('is_valid_article'),
+                "validation_confidence": article.get('validation_confidence'),
+                "validation_reason": article.get('validation_reason'),
+            }
+            rows.append((canonicalize_url(url), url, content_hash(article.get('full_content')), stage, now, now,
+                         int(bool(article.get('is_valid_article'))), json.dumps(validation)))
+            self.counts[f"{stage}/processed"] += 1
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO articles (url_key, url, content_hash, source, first_seen, last_seen, is_valid_article, validation) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url_key) DO UPDATE SET "
+                "last_seen = excluded.last_seen, content_hash = excluded.content_hash, "
+                "is_valid_article = excluded.is_valid_article, validation = excluded.validation",
+                rows,
+            )
+
+    def record_duplicates(self, articles: Iterable[Dict], url_key: str, duplicate_of: Optional[str], stage: str) -> None:
+        """
+        Store near-duplicate copies of another article, so they are skipped before fetching next time.
+        """
+        now = time.time()
+        rows = [
+            (canonicalize_url(article[url_key]), article[url_key], content_hash(article.get('full_content')), stage, now, now,
+             json.dumps({"duplicate_of": duplicate_of}))
+            for article in articles if article.get(url_key)
+        ]
+        self.counts[f"{stage}/skipped_near_duplicate"] += len(rows)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO articles (url_key, url, content_hash, source, first_seen, last_seen, validation) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url_key) DO UPDATE SET last_seen = excluded.last_seen",
+                rows,
+            )
+
+    def _set(self, url: str, column: str, value: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO articles (url_key, url, first_seen, last_seen, {column}) VALUES (?, ?, ?, ?, ?) "
+                f"ON CONFLICT(url_key) DO UPDATE SET {column} = excluded.{column}, last_seen = excluded.last_seen",
+                (canonicalize_url(url), url, now, now, value),
+            )
+
+    def get_feedback(self, url: str) -> Optional[Dict[str, Any]]:
+        feedback = self._row(url, "feedback")
+        return json.loads(feedback) if feedback is not None else None
+
+    def record_feedback(self, url: str, feedback: Dict[str, Any]) -> None:
+        self._set(url, "feedback", json.dumps(feedback, ensure_ascii=False))
+
+    def get_summary(self, url: str) -> Optional[str]:
+        return self._row(url, "summary")
+
+    def record_summary(self, url: str, summary: str) -> None:
+        self._set(url, "summary", summary)
+
+    def report(self) -> str:
+        return ", ".join(f"{name}: {count}" for name, count in sorted(self.counts.items())) or "nothing to report"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
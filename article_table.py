@@ -0,0 +1,306 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from article_store import canonicalize_url
+from embedding_store import EMBEDDING_COLUMN, load_embedding_table
+
+# Single table of the articles, keyed by article id, to which every pipeline stage adds its columns
+ARTICLE_TABLE_DB = os.getenv("ARTICLE_TABLE_DB", "data/articles.sqlite")
+
+# Storage kind of the known columns (an exact name, or a prefix ending with "/"); others are inferred
+COLUMN_KIND_RULES = {
+    "score/": "int8",
+    "news_meets_standards/": "category",
+    "overall_score": "int16",
+    "group": "int16",
+    "category": "category",
+    "data_source": "category",
+    EMBEDDING_COLUMN: "embedding",
+}
+SQL_TYPES = {
+    "int8": "INTEGER", "int16": "INTEGER", "int32": "INTEGER", "int64": "INTEGER", "bool": "INTEGER",
+    "category": "INTEGER", "float32": "REAL", "float64": "REAL", "text": "TEXT", "embedding": "BLOB",
+}
+NULLABLE_INTS = {"int8": "Int8", "int16": "Int16", "int32": "Int32", "int64": "Int64", "bool": "boolean"}
+
+# Files of the CSV pipeline, with the stage that produced them and the columns that stage added
+# (df_with_embedding_and_groups.csv is an unsorted copy of the groups, superseded by the sorted one)
+MIGRATION_SOURCES = [
+    ("news_articles.csv", "collect", lambda column: True),
+    ("news_articles_with_feedback.csv", "score", lambda column: column.split("/")[0] in ("critique", "news_meets_standards", "score")),
+    ("relevant_news_articles_with_feedback_and_summary.csv", "summarize", lambda column: column == "ev_summary"),
+    ("data_with_embeddings.csv", "embed", lambda column: column in ("overall_score", EMBEDDING_COLUMN)),
+    ("df_with_embedding_and_sorted_groups.csv", "cluster", lambda column: column == "group"),
+]
+
+
+def column_kind(name: str, values: pd.Series) -> str:
+    """
+    Storage kind of a column: from COLUMN_KIND_RULES, else inferred from the pandas dtype.
+    """
+    for rule, kind in COLUMN_KIND_RULES.items():
+        if name == rule or (rule.endswith("/") and name.startswith(rule)):
+            return kind
+    if values.isna().all():
+        return "text"
+    if pd.api.types.is_bool_dtype(values):
+        return "bool"
+    if pd.api.types.is_integer_dtype(values):
+        return "int64"
+    if pd.api.types.is_float_dtype(values):
+        return "float64"
+    return "text"
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ArticleTable:
+    """
+    Typed, column-oriented store of the articles in SQLite.
+
+    Each article has one row (article_id, keyed by canonical URL); each stage adds or updates its own columns
+    instead of copying the whole table into a new CSV. Readers select only the columns they need and get
+    compact dtypes: scores as small ints, verdicts and sources as categoricals, embeddings as a float32 matrix.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ARTICLE_TABLE_DB
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS articles (article_id INTEGER PRIMARY KEY, url_key TEXT UNIQUE NOT NULL, url TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS columns (name TEXT PRIMARY KEY, kind TEXT NOT NULL, stage TEXT, updated REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS categories (name TEXT, code INTEGER, value TEXT, PRIMARY KEY (name, code))")
+
+    def columns(self) -> Dict[str, str]:
+        """
+        Column name -> storage kind, in the order the columns were added.
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, kind FROM columns ORDER BY rowid").fetchall())
+
+    def _categories(self, name: str) -> List[str]:
+        return [value for (value,) in self._conn.execute("SELECT value FROM categories WHERE name = ? ORDER BY code", (name,))]
+
+    def _ensure_ids(self, urls: Iterable[str]) -> List[int]:
+        urls = list(urls)
+        keys = [canonicalize_url(url) for url in urls]
+        self._conn.executemany("INSERT OR IGNORE INTO articles (url_key, url) VALUES (?, ?)", zip(keys, urls))
+        ids = {}
+        # Chunked to stay below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            ids.update(self._conn.execute(
+                f"SELECT url_key, article_id FROM articles WHERE url_key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return [ids[key] for key in keys]
+
+    def _ensure_column(self, name: str, kind: str, stage: str) -> str:
+        existing = self._conn.execute("SELECT kind FROM columns WHERE name = ?", (name,)).fetchone()
+        if existing is None:
+            self._conn.execute(f"ALTER TABLE articles ADD COLUMN {quote(name)} {SQL_TYPES[kind]}")
+            self._conn.execute("INSERT INTO columns (name, kind, stage, updated) VALUES (?, ?, ?, ?)", (name, kind, stage, time.time()))
+            return kind
+        self._conn.execute("UPDATE columns SET stage = ?, updated = ? WHERE name = ?", (stage, time.time(), name))
+        return existing[0]
+
+    def _encode(self, name: str, kind: str, values: pd.Series) -> List:
+        if kind == "category":
+            categories = self._categories(name)
+            codes = {value: code for code, value in enumerate(categories)}
+            for value in values.dropna().astype(str).unique():
+                if value not in codes:
+                    codes[value] = len(codes)
+                    self._conn.execute("INSERT INTO categories (name, code, value) VALUES (?, ?, ?)", (name, codes[value], value))
+            return [None if pd.isna(value) else codes[str(value)] for value in values]
+        if kind == "embedding":
+            return [None if value is None else np.asarray(value, dtype=np.float32).tobytes() for value in values]
+        if kind in NULLABLE_INTS:
+            return [None if pd.isna(value) else int(value) for value in values]
+        if kind in ("float32", "float64"):
+            return [None if pd.isna(value) else float(value) for value in values]
+        return [None if pd.isna(value) else str(value) for value in values]
+
+    def write_columns(self, df: pd.DataFrame, stage: str, id_column: str = "url",
+                      kinds: Optional[Dict[str, str]] = None) -> List[int]:
+        """
+        Add or update the columns of `df` for its articles (matched on `id_column`); new articles get a row.
+
+        Args:
+            df (pd.DataFrame): Columns to store, with the article URL in `id_column`.
+            stage (str): Stage writing the columns, recorded with them.
+            id_column (str): Column holding the article URL.
+            kinds (dict): Storage kinds overriding COLUMN_KIND_RULES and the inferred ones, for new columns.
+
+        Returns:
+            list: The article ids of the rows of `df`.
+        """
+        df = df[df[id_column].notna()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                ids = self._ensure_ids(df[id_column])
+                names, encoded = [], []
+                for name in df.columns:
+                    if name == id_column or name.startswith("Unnamed:"):
+                        continue
+                    kind = (kinds or {}).get(name) or column_kind(name, df[name])
+                    kind = self._ensure_column(name, kind, stage)
+                    names.append(name)
+                    encoded.append(self._encode(name, kind, df[name]))
+                if names:
+                    assignments = ", ".join(f"{quote(name)} = ?" for name in names)
+                    self._conn.executemany(f"UPDATE articles SET {assignments} WHERE article_id = ?",
+                                           [(*row, article_id) for *row, article_id in zip(*encoded, ids)])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def write_embeddings(self, urls: Iterable[str], embeddings: np.ndarray, stage: str, column: str = EMBEDDING_COLUMN) -> List[int]:
+        """
+        Store one float32 vector per article, as a BLOB column.
+        """
+        df = pd.DataFrame({"url": list(urls), column: list(np.asarray(embeddings, dtype=np.float32))})
+        return self.write_columns(df, stage, kinds={column: "embedding"})
+
+    def read(self, columns: Optional[List[str]] = None, ids: Optional[Iterable[int]] = None,
+             require: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read some columns of the articles, with their storage dtypes.
+
+        Args:
+            columns (list): Columns to read ('url' is always included). Defaults to every non-embedding column.
+            ids (iterable): Article ids to read. Defaults to all articles.
+            require (list): Only read the articles where these columns are set (e.g. ['ev_summary']).
+
+        Returns:
+            pd.DataFrame: Indexed by article_id.
+        """
+        kinds = self.columns()
+        if columns is None:
+            columns = [name for name, kind in kinds.items() if kind != "embedding"]
+        unknown = [name for name in columns + (require or []) if name not in kinds and name != "url"]
+        if unknown:
+            raise KeyError(f"Unknown columns: {unknown}")
+        columns = [name for name in columns if name != "url"]
+        conditions = [f"{quote(name)} IS NOT NULL" for name in require or []]
+        parameters: List = []
+        if ids is not None:
+            conditions.append("article_id IN (SELECT value FROM json_each(?))")
+            parameters.append(json.dumps([int(article_id) for article_id in ids]))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        select = ", ".join(["article_id", "url"] + [quote(name) for name in columns])
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {select} FROM articles{where} ORDER BY article_id", parameters).fetchall()
+            categories = {name: self._categories(name) for name in columns if kinds[name] == "category"}
+        df = pd.DataFrame.from_records(rows, columns=["article_id", "url"] + columns).set_index("article_id")
+        for name in columns:
+            df[name] = self._decode(df[name], kinds[name], categories.get(name))
+        return df
+
+    @staticmethod
+    def _decode(values: pd.Series, kind: str, categories: Optional[List[str]]) -> pd.Series:
+        if kind == "category":
+            codes = values.fillna(-1).astype(np.int32).to_numpy()
+            return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=values.index)
+        if kind in NULLABLE_INTS:
+            if values.isna().any():
+                return values.astype(NULLABLE_INTS[kind])
+            return values.astype(np.bool_ if kind == "bool" else kind)
+        if kind in ("float32", "float64"):
+            return values.astype(kind)
+        if kind == "embedding":
+            return values.map(lambda blob: None if blob is None else np.frombuffer(blob, dtype=np.float32))
+        return values
+
+    def read_embeddings(self, column: str = EMBEDDING_COLUMN, ids: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read an embedding column as a dense matrix.
+
+        Returns:
+            tuple: (article ids, (n, dim) float32 matrix), for the articles that have an embedding.
+        """
+        vectors = self.read([column], ids=ids, require=[column])[column]
+        if vectors.empty:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        return vectors.index.to_numpy(), np.stack(vectors.to_list())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_csvs(data_dir: str = "data", path: Optional[str] = None) -> ArticleTable:
+    """
+    Load the CSVs of the pipeline (MIGRATION_SOURCES) into an ArticleTable, each file adding the columns of
+    the stage that wrote it. Embeddings are read from the 'embedding' column or the binary sidecar.
+
+    Args:
+        data_dir (str): Folder holding the CSVs; missing files are skipped.
+        path (str): Path of the table. Defaults to ARTICLE_TABLE_DB.
+
+    Returns:
+        ArticleTable: The (open) table.
+    """
+    table = ArticleTable(path)
+    frames = {}
+    for file_name, stage, _ in MIGRATION_SOURCES:
+        csv_path = os.path.join(data_dir, file_name)
+        if os.path.exists(csv_path):
+            df, embeddings = load_embedding_table(csv_path) if stage == "embed" else (pd.read_csv(csv_path), None)
+            frames[file_name] = (df.loc[:, ~df.columns.str.startswith("Unnamed:")], embeddings)
+
+    # Step 1: The collected fields of every article, from the first file that has it
+    base_columns = list(frames["news_articles.csv"][0].columns) if "news_articles.csv" in frames else ["url"]
+    base = pd.concat([df[[column for column in base_columns if column in df.columns]] for df, _ in frames.values()],
+                     ignore_index=True).drop_duplicates(subset=["url"])
+    table.write_columns(base, "collect")
+
+    # Step 2: The columns each later stage added
+    for file_name, stage, selects in MIGRATION_SOURCES[1:]:
+        if file_name not in frames:
+            continue
+        df, embeddings = frames[file_name]
+        df = df.drop_duplicates(subset=["url"])
+        if embeddings is not None:
+            embeddings = embeddings[df.index.to_numpy()]
+            table.write_embeddings(df["url"], embeddings, stage)
+        columns = [column for column in df.columns if selects(column) and column != EMBEDDING_COLUMN]
+        table.write_columns(df[["url"] + columns], stage)
+        print(f"{file_name}: {len(df)} rows, {len(columns) + (embeddings is not None)} columns ({stage})")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the pipeline CSVs into the columnar article table.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--output", default=ARTICLE_TABLE_DB)
+    args = parser.parse_args()
+
+    table = migrate_csvs(args.data_dir, args.output)
+    kinds = table.columns()
+    print(f"{len(table)} articles, {len(kinds)} columns in {args.output}")
+    for kind in sorted(set(kinds.values())):
+        print(f"  {kind}: {sum(value == kind for value in kinds.values())} columns")
+    table.close()
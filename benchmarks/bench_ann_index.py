@@ -0,0 +1,89 @@
+import sys
+sys.path.append("./")
+import argparse
+import time
+
+import numpy as np
+
+from clustering.ann_index import IVFIndex
+from clustering.knn_clustering import form_groups_with_disjoint_nn, normalize_embeddings
+
+
+def make_corpus(n_rows: int, dim: int, n_topics: int, noise: float, seed: int = 0) -> np.ndarray:
+    """
+    Synthetic embeddings: rows scattered around random topic directions, like news stories around events.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    rows = topics[rng.integers(0, n_topics, size=n_rows)] + noise * rng.normal(size=(n_rows, dim)).astype(np.float32)
+    return normalize_embeddings(rows)
+
+
+def exact_search(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    sims = queries @ matrix.T
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    return top
+
+
+def mean_group_similarity(matrix: np.ndarray, groups) -> float:
+    """
+    Mean cosine similarity between each seed and the other members of its group.
+    """
+    return float(np.mean([matrix[group[1:]] @ matrix[group[0]] for group in groups]))
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs speed of the IVF index against exact search.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=5000)
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--group-rows", type=int, default=50_000, help="Corpus size for the grouping comparison.")
+    args = parser.parse_args()
+
+    matrix = make_corpus(args.rows, args.dim, args.topics, args.noise)
+    queries = matrix[np.random.default_rng(1).choice(args.rows, size=args.queries, replace=False)]
+
+    start = time.perf_counter()
+    truth = exact_search(matrix, queries, args.k)
+    exact_qps = args.queries / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix)
+    build_s = time.perf_counter() - start
+    print(f"corpus: {args.rows} x {args.dim}, {index.n_lists} lists, build {build_s:.1f}s")
+    print(f"{'search':<18}{'queries/s':>12}{'recall@' + str(args.k):>12}")
+    print(f"{'exact':<18}{exact_qps:>12.0f}{1.0:>12.3f}")
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        start = time.perf_counter()
+        found, _ = index.search(queries, args.k, n_probe=n_probe)
+        qps = args.queries / (time.perf_counter() - start)
+        print(f"{'ivf n_probe=' + str(n_probe):<18}{qps:>12.0f}{recall(found, truth):>12.3f}")
+
+    # End-to-end grouping: how many groups come out identical to the exact greedy grouping
+    group_matrix = matrix[:args.group_rows]
+    num_groups = args.group_rows // 3
+    start = time.perf_counter()
+    exact_groups = form_groups_with_disjoint_nn(group_matrix, num_groups=num_groups, group_size=3)
+    exact_s = time.perf_counter() - start
+    print(f"\ngrouping {args.group_rows} rows into groups of 3")
+    print(f"{'engine':<18}{'seconds':>10}{'same groups':>14}{'seed-member sim':>18}")
+    print(f"{'exact (tiled)':<18}{exact_s:>10.2f}{1.0:>14.3f}{mean_group_similarity(group_matrix, exact_groups):>18.4f}")
+    exact_set = {tuple(sorted(group)) for group in exact_groups}
+    for n_probe in (4, 16):
+        start = time.perf_counter()
+        index = IVFIndex.build(group_matrix, n_probe=n_probe)
+        ann_groups = form_groups_with_disjoint_nn(group_matrix, num_groups=num_groups, group_size=3, index=index)
+        ann_s = time.perf_counter() - start
+        same = len(exact_set & {tuple(sorted(group)) for group in ann_groups}) / max(len(exact_set), 1)
+        print(f"{'ivf n_probe=' + str(n_probe):<18}{ann_s:>10.2f}{same:>14.3f}{mean_group_similarity(group_matrix, ann_groups):>18.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+
+from article_table import MIGRATION_SOURCES, migrate_csvs
+
+# Each loader runs in a fresh interpreter so that RSS is not polluted by the other runs (Linux only: reads /proc).
+# "Memory" is the deep size of the loaded DataFrame plus the embedding matrix.
+LOADER_SNIPPET = """
+import sys, time, json, os
+sys.path.append("./")
+import numpy as np, pandas as pd
+from article_table import ArticleTable
+from embedding_store import parse_embedding_column
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+query, source, data_dir, table_path = sys.argv[1:5]
+rss_before = current_rss_mb()
+start = time.perf_counter()
+matrix = np.empty(0, dtype=np.float32)
+if source == "csv":
+    if query == "all":
+        df = pd.read_csv(os.path.join(data_dir, "news_articles_with_feedback.csv"))
+    elif query == "scores":
+        df = pd.read_csv(os.path.join(data_dir, "news_articles_with_feedback.csv"))
+        df = df[["title"] + [c for c in df.columns if c.startswith(("score/", "news_meets_standards/"))]]
+    else:
+        df = pd.read_csv(os.path.join(data_dir, "data_with_embeddings.csv"))
+        matrix = parse_embedding_column(df.pop("embedding"))
+        df = df[["title", "ev_summary", "overall_score"]]
+else:
+    table = ArticleTable(table_path)
+    if query == "all":
+        df = table.read(require=["critique/up-to-date"])
+    elif query == "scores":
+        df = table.read(["title"] + [c for c in table.columns() if c.startswith(("score/", "news_meets_standards/"))])
+    else:
+        ids, matrix = table.read_embeddings()
+        df = table.read(["title", "ev_summary", "overall_score"], ids=ids)
+load_time = time.perf_counter() - start
+rss_after = current_rss_mb()
+print(json.dumps({"load_s": load_time, "rss_delta_mb": rss_after - rss_before, "rows": len(df),
+                  "memory_mb": (df.memory_usage(deep=True).sum() + matrix.nbytes) / 2**20}))
+"""
+
+QUERIES = {
+    "all": "every column of the scored articles",
+    "scores": "title, scores and verdicts",
+    "clustering": "title, summary, overall score and embeddings",
+}
+
+
+def run_loader(query: str, source: str, data_dir: str, table_path: str, repeat: int) -> dict:
+    """
+    Run one loader `repeat` times in subprocesses and keep the fastest run.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", LOADER_SNIPPET, query, source, data_dir, table_path],
+                                capture_output=True, text=True, check=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["load_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reading the pipeline CSVs with reading the columnar article table.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table_path = os.path.join(tmp_dir, "articles.sqlite")
+        migrate_csvs(args.data_dir, table_path).close()
+
+        csv_bytes = sum(os.path.getsize(os.path.join(args.data_dir, name)) for name in os.listdir(args.data_dir) if name.endswith(".csv"))
+        print(f"\non disk: {csv_bytes / 2**20:.1f} MB of CSVs vs {os.path.getsize(table_path) / 2**20:.1f} MB table "
+              f"(migrated from {len(MIGRATION_SOURCES)} files)\n")
+
+        print(f"{'query':<12}{'source':<8}{'rows':>6}{'load [ms]':>12}{'memory [MB]':>14}{'RSS delta [MB]':>17}")
+        for query, description in QUERIES.items():
+            for source in ("csv", "table"):
+                result = run_loader(query, source, args.data_dir, table_path, args.repeat)
+                print(f"{query:<12}{source:<8}{result['rows']:>6}{result['load_s'] * 1000:>12.1f}"
+                      f"{result['memory_mb']:>14.2f}{result['rss_delta_mb']:>17.1f}")
+        print("\n" + "\n".join(f"{query}: {description}" for query, description in QUERIES.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import sys
+import time
+from contextlib import ExitStack
+
+sys.path.append("./")
+from benchmarks.fake_services import FakeServer, create_fake_news_app
+from news_collector.crawler import crawl_article_contents
+from utils import extract_article_content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial newspaper3k extraction vs the async crawler against local news sites.")
+    parser.add_argument("--pages", type=int, default=60, help="Number of article pages")
+    parser.add_argument("--hosts", type=int, default=4, help="Number of local news sites the pages are spread over")
+    parser.add_argument("--latency", type=float, default=0.3, help="Server latency per page, in seconds")
+    parser.add_argument("--fail-first-every", type=int, default=10, help="Every k-th page fails once with a 503")
+    args = parser.parse_args()
+
+    def start_sites(stack: ExitStack, fail_first_every: int):
+        servers = [
+            stack.enter_context(FakeServer(create_fake_news_app(args.latency, fail_first_every=fail_first_every)))
+            for _ in range(args.hosts)
+        ]
+        return [f"{servers[i % args.hosts].url}/news/{i}.html" for i in range(args.pages)]
+
+    with ExitStack() as stack:
+        # Step 1: Start the local news sites. The serial baseline does not retry, so its sites never fail
+        serial_urls = start_sites(stack, fail_first_every=0)
+        urls = start_sites(stack, fail_first_every=args.fail_first_every)
+
+        # Step 2: Serial baseline (utils.extract_article_content, one page after the other)
+        start = time.perf_counter()
+        serial_contents = [extract_article_content(url).text for url in serial_urls]
+        serial_time = time.perf_counter() - start
+        serial_ok = sum(content != "" for content in serial_contents)
+
+        # Step 3: Async crawler (global and per-host limits, retries, parsing in a process pool)
+        start = time.perf_counter()
+        contents = crawl_article_contents(urls, concurrency=16, per_host_concurrency=4, per_host_delay=0.05, backoff=0.1)
+        crawler_time = time.perf_counter() - start
+        crawler_ok = sum(content is not None and content != "" for content in contents.values())
+
+        # Step 4: Pages that can never be fetched (a redirect loop, an invalid URL) must not abort the crawl
+        broken_urls = [f"{urls[0].rsplit('/news/', 1)[0]}/loop.html", "http://[invalid/news.html"]
+        mixed = crawl_article_contents([urls[0], *broken_urls, urls[-1]], per_host_delay=0.0, backoff=0.1)
+        broken_ok = all(mixed[url] is None for url in broken_urls) and mixed[urls[0]] and mixed[urls[-1]]
+
+    same_text = all(contents[url] == serial for url, serial in zip(urls, serial_contents) if serial)
+    print(f"{args.pages} pages on {args.hosts} hosts, {args.latency:.2f}s latency")
+    print(f"serial:  {serial_time:6.2f}s  {args.pages / serial_time:6.1f} pages/s  ({serial_ok} extracted)")
+    print(f"crawler: {crawler_time:6.2f}s  {args.pages / crawler_time:6.1f} pages/s  ({crawler_ok} extracted)")
+    print(f"speed-up: {serial_time / crawler_time:.1f}x, identical text: {same_text}")
+    print(f"redirect loop and invalid URL skipped, other pages extracted: {bool(broken_ok)}")
+    if not (same_text and broken_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
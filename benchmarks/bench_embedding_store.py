@@ -0,0 +1,67 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+
+from embedding_store import convert_csv
+
+# Each loader runs in a fresh interpreter so that RSS is not polluted by the other runs (Linux only: reads /proc).
+# The matrix is summed after loading so that the memory-mapped variant pays for actually reading the rows.
+LOADER_SNIPPET = """
+import sys, time, json, os
+sys.path.append("./")
+import numpy as np, pandas as pd
+from embedding_store import load_embedding_table, parse_embedding_column
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+rss_before = current_rss_mb()
+start = time.perf_counter()
+if sys.argv[1] == "csv":
+    df = pd.read_csv(sys.argv[2])
+    matrix = parse_embedding_column(df["embedding"])
+else:
+    df, matrix = load_embedding_table(sys.argv[2], mmap=sys.argv[1] == "mmap")
+load_time = time.perf_counter() - start
+checksum = float(np.asarray(matrix, dtype=np.float64).sum())
+touch_time = time.perf_counter() - start
+rss_after = current_rss_mb()
+print(json.dumps({"load_s": load_time, "load_and_scan_s": touch_time, "rss_delta_mb": rss_after - rss_before, "rows": len(df), "checksum": checksum}))
+"""
+
+
+def run_loader(mode: str, csv_path: str, repeat: int) -> dict:
+    """
+    Run one loader `repeat` times in subprocesses and keep the fastest run.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", LOADER_SNIPPET, mode, csv_path], capture_output=True, text=True, check=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["load_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loading stringified CSV embeddings with the binary sidecar store.")
+    parser.add_argument("--csv", default="data/df_with_embedding_and_sorted_groups.csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        converted = convert_csv(args.csv, os.path.join(tmp_dir, os.path.basename(args.csv)))
+        results = {
+            "csv (stringified lists)": run_loader("csv", args.csv, args.repeat),
+            "sidecar (np.load)": run_loader("load", converted, args.repeat),
+            "sidecar (mmap)": run_loader("mmap", converted, args.repeat),
+        }
+
+    print(f"{'loader':<26}{'load [ms]':>12}{'load+scan [ms]':>16}{'RSS delta [MB]':>18}")
+    for name, result in results.items():
+        print(f"{name:<26}{result['load_s'] * 1000:>12.1f}{result['load_and_scan_s'] * 1000:>16.1f}{result['rss_delta_mb']:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import sys
+sys.path.append("./")
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fake_services import FakeServer, create_fake_app
+
+
+def synthetic_summaries(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = ["battery", "charging", "electric", "vehicle", "range", "sales", "factory", "model", "price", "grid"]
+    return [f"Summary {i}: " + " ".join(rng.choice(words, size=60)) for i in range(n)]
+
+
+def per_row_embeddings(texts, model):
+    """
+    The notebook's approach: one synchronous request per text.
+    """
+    from openai import OpenAI
+    client = OpenAI()
+    return np.asarray([client.embeddings.create(input=[text.replace("\n", " ")], model=model).data[0].embedding for text in texts],
+                      dtype=np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row vs batched, cached embedding generation against a fake embeddings API.")
+    parser.add_argument("--texts", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake latency per embeddings request, in seconds.")
+    parser.add_argument("--changed", type=float, default=0.1, help="Fraction of texts changed before the incremental run.")
+    args = parser.parse_args()
+
+    fake_app = create_fake_app(latency=args.latency, embedding_dim=256)
+    with FakeServer(fake_app) as fake, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        from embeddings import EMBEDDING_MODEL, EmbeddingCache, embed_texts
+
+        texts = synthetic_summaries(args.texts)
+        cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite"))
+        changed = list(texts)
+        for i in range(0, len(changed), max(1, round(1 / args.changed))):
+            changed[i] += " (updated)"
+
+        results = []
+        for name, run in [
+            ("per-row requests", lambda: per_row_embeddings(texts, EMBEDDING_MODEL)),
+            ("batched, cold cache", lambda: embed_texts(texts, cache=cache)),
+            ("batched, warm cache", lambda: embed_texts(texts, cache=cache)),
+            (f"batched, {args.changed:.0%} changed", lambda: embed_texts(changed, cache=cache)),
+        ]:
+            requests_before = fake_app.state.embedding_requests
+            start = time.perf_counter()
+            matrix = run()
+            results.append((name, time.perf_counter() - start, fake_app.state.embedding_requests - requests_before, matrix))
+
+    print(f"\n{'mode':<24} {'time':>8} {'requests':>9} {'texts/s':>9}")
+    for name, elapsed, requests, _ in results:
+        print(f"{name:<24} {elapsed:>7.2f}s {requests:>9} {args.texts / elapsed:>9.0f}")
+    same = np.allclose(results[0][3], results[1][3]) and np.array_equal(results[1][3], results[2][3])
+    print(f"vectors identical across modes: {same}, matrix {results[1][3].shape} {results[1][3].dtype}")
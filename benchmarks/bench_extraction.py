@@ -0,0 +1,103 @@
+import argparse
+import difflib
+import os
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.append("./")
+from benchmarks.fake_services import FAKE_PARAGRAPH, fake_news_page
+from extraction import MIN_CONFIDENCE, extract_html, extract_pages, newspaper_extract
+
+
+def magazine_page(page_id: int, n_paragraphs: int = 10) -> str:
+    # Article in nested divs next to a sidebar, related links and a comment section
+    paragraphs = "".join(f"<p>{FAKE_PARAGRAPH}{FAKE_PARAGRAPH}</p>" for _ in range(n_paragraphs))
+    related = "".join(f"<li><a href='/news/{i}.html'>Related EV story number {i} with a long headline</a></li>" for i in range(8))
+    return (
+        f"<html><head><title>Magazine {page_id}</title>"
+        f"<meta property='article:published_time' content='2024-05-{page_id % 28 + 1:02d}T08:00:00Z'></head><body>"
+        f"<header><a href='/'>Magazine</a></header>"
+        f"<div class='layout'><div class='main'><div class='story-body'><h1>Magazine {page_id}</h1>{paragraphs}</div>"
+        f"<div class='related-links'><ul>{related}</ul></div></div>"
+        f"<div class='sidebar'><p>Subscribe to our newsletter for the latest electric vehicle news, every week.</p></div></div>"
+        f"<div id='comments'><p>Great article, thanks for sharing these numbers with us all.</p></div>"
+        f"</body></html>"
+    )
+
+
+def teaser_page(page_id: int) -> str:
+    # Index page with teasers too short to count as paragraphs: neither the fast path nor newspaper3k finds an article
+    teasers = "".join(f"<div class='teaser'><a href='/news/{i}.html'>EV story {i}</a><p>Short teaser text {i}.</p></div>" for i in range(6))
+    return f"<html><head><title>Index {page_id}</title></head><body><h1>Latest news</h1>{teasers}</body></html>"
+
+
+def synthetic_pages(n: int) -> List[Tuple[str, str]]:
+    layouts = [fake_news_page, magazine_page, fake_news_page, magazine_page, teaser_page]
+    return [(f"https://news{i % 4}.example/news/{i}.html", layouts[i % len(layouts)](i)) for i in range(n)]
+
+
+def load_fixtures(directory: str) -> List[Tuple[str, str]]:
+    # Pages stored as *.html files, the file name stands in for the URL
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                pages.append((f"https://fixtures.local/{name}", f.read()))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="newspaper3k vs the lxml extraction fast path, serially and in a process pool.")
+    parser.add_argument("--fixtures", help="Directory of article pages (*.html), e.g. benchmarks/fixtures/extraction; generated pages otherwise")
+    parser.add_argument("--pages", type=int, default=200, help="Number of generated pages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes of the parsing pool")
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures) if args.fixtures else synthetic_pages(args.pages)
+    if not pages:
+        sys.exit(f"No pages found in {args.fixtures}")
+
+    # Step 1: Old path, a full newspaper3k parse of every page
+    start = time.perf_counter()
+    reference = [newspaper_extract(url, html) for url, html in pages]
+    newspaper_time = time.perf_counter() - start
+
+    # Step 2: Fast path with the newspaper3k fallback, serially
+    start = time.perf_counter()
+    serial = [extract_html(url, html) for url, html in pages]
+    serial_time = time.perf_counter() - start
+
+    # Step 3: Same, in a process pool
+    start = time.perf_counter()
+    pooled = extract_pages(pages, workers=args.workers)
+    pool_time = time.perf_counter() - start
+
+    n = len(pages)
+    # Pages under the confidence threshold are parsed a second time by newspaper3k
+    fallbacks = sum(article.confidence < MIN_CONFIDENCE for article in serial)
+    failed = sum(article.method == "failed" for article in serial)
+    fast = [(article, expected) for article, expected in zip(serial, reference) if article.method == "lxml"]
+    agreement = sum(article.text == expected.text for article, expected in fast) / len(fast) if fast else 0.0
+    # Character-level similarity: pages of real sites rarely give the exact same text (captions, ad labels, ...)
+    similarities = [1.0 if article.text == expected.text else
+                    difflib.SequenceMatcher(None, article.text, expected.text, autojunk=False).ratio()
+                    for article, expected in zip(serial, reference)]
+    mean_confidence = sum(article.confidence for article in serial) / n
+
+    print(f"{n} pages ({args.fixtures or 'generated'}), {args.workers} workers")
+    print(f"newspaper3k serial: {newspaper_time:6.2f}s  {n / newspaper_time:7.1f} pages/s")
+    print(f"fast path serial:   {serial_time:6.2f}s  {n / serial_time:7.1f} pages/s  ({newspaper_time / serial_time:.1f}x)")
+    print(f"fast path pooled:   {pool_time:6.2f}s  {n / pool_time:7.1f} pages/s  ({newspaper_time / pool_time:.1f}x)")
+    print(f"fallback rate: {fallbacks / n:.1%}, failed: {failed}, mean confidence: {mean_confidence:.2f}")
+    print(f"fast-path text identical to newspaper3k: {agreement:.1%} of {len(fast)} pages, "
+          f"mean similarity: {sum(similarities) / n:.2f}, pooled results identical to serial: {pooled == serial}")
+    if args.fixtures:
+        print(f"{'page':<45} {'method':<10} {'confidence':>10} {'chars':>7} {'newspaper3k':>11} {'similarity':>10}")
+        for (url, _), article, expected, similarity in zip(pages, serial, reference, similarities):
+            print(f"{url.rsplit('/', 1)[-1]:<45} {article.method:<10} {article.confidence:>10.2f} "
+                  f"{len(article.text):>7} {len(expected.text):>11} {similarity:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
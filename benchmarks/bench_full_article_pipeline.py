@@ -0,0 +1,82 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+from benchmarks.fake_services import FakeServer, create_fake_app
+
+
+def unique_articles() -> str:
+    # A different text per request, so neither the LLM nor the image caches answer
+    return f"title = Fake EV news {uuid.uuid4()}\ncontent = A new battery factory opened."
+
+
+async def run_mode(api, client: httpx.AsyncClient, pipelined: bool, n_requests: int) -> list:
+    """
+    Generate `n_requests` full articles one after another in one mode and return them.
+    """
+    api.PIPELINE_FULL_ARTICLE = pipelined
+    articles = []
+    for _ in range(n_requests):
+        response = await client.post("/generate-full-article/", json={"articles": unique_articles(), "image_url": ""})
+        response.raise_for_status()
+        articles.append(response.json()["article"])
+    return articles
+
+
+async def main(n_requests: int, fake_url: str) -> int:
+    import api  # Imported after the environment points it at the fake services
+    import utils
+
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as client:
+            # Warm up the clients, then time both modes
+            await run_mode(api, client, True, 1)
+            api.stage_latencies.clear()
+            await run_mode(api, client, False, n_requests)
+            articles = await run_mode(api, client, True, n_requests)
+            stats = (await client.get("/latency-stats/")).json()
+
+            # Image search failures: the pipelined mode still returns the article, without an image
+            utils.BING_IMAGE_SEARCH_URL = f"{fake_url}/missing"
+            fallback_articles = await run_mode(api, client, True, 1)
+
+    print(f"{'stage':<24} {'count':>5} {'mean':>7} {'p50':>7} {'p95':>7}")
+    for stage, values in stats.items():
+        print(f"{stage:<24} {values['count']:>5} {values['mean']:>6.2f}s {values['p50']:>6.2f}s {values['p95']:>6.2f}s")
+    speedup = stats["full_article/sequential"]["p50"] / stats["full_article/pipelined"]["p50"]
+    print(f"end-to-end speed-up (p50): {speedup:.2f}x")
+
+    if any(api.IMAGE_PLACEHOLDER in article or "/images/0.jpg" not in article for article in articles):
+        print("FAIL: the selected image was not spliced into every pipelined article")
+        return 1
+    if "![image]" in fallback_articles[0] or api.IMAGE_PLACEHOLDER in fallback_articles[0]:
+        print("FAIL: the image-less fallback article still has an image")
+        return 1
+    print("OK: images spliced in, image failures fall back to an image-less article")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential vs pipelined /generate-full-article/ latency.")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per mode.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake model latency per call, in seconds.")
+    parser.add_argument("--tokens", type=int, default=100, help="Fake article length, in tokens.")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Fake generation time per token, in seconds.")
+    args = parser.parse_args()
+
+    fake_app = create_fake_app(latency=args.latency, article_tokens=args.tokens, token_interval=args.token_interval)
+    with FakeServer(fake_app) as fake, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["BING_API_KEY"] = "fake-key"
+        os.environ["BING_IMAGE_SEARCH_URL"] = f"{fake.url}/bing/images/search"
+        os.environ["PREGENERATE_AHEAD"] = "0"
+        os.environ["CACHE_DIR"] = cache_dir
+        sys.exit(asyncio.run(main(args.requests, fake.url)))
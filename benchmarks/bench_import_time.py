@@ -0,0 +1,73 @@
+import sys
+sys.path.append("./")
+import argparse
+import os
+import re
+import subprocess
+from typing import Dict, List, Tuple
+
+# Import time budgets in milliseconds (best of the runs), with headroom over the measured times
+IMPORT_BUDGETS_MS = {
+    "api": 1500,
+    "utils": 400,
+    "embeddings": 400,
+    "pipeline": 200,
+}
+# Heavy packages these modules must leave to first use
+DEFERRED_IMPORTS = {
+    "api": ["litellm", "newspaper", "openai"],
+    "utils": ["litellm", "newspaper", "openai", "fastapi", "pandas", "extraction", "lxml"],
+    "embeddings": ["openai", "litellm"],
+    "pipeline": ["litellm", "newspaper", "openai", "pandas"],
+}
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime, without any API key set.
+
+    Returns:
+        tuple: (total import time in ms, cumulative time in ms of every imported module).
+    """
+    env = {key: value for key, value in os.environ.items() if not key.endswith("_API_KEY")}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    cumulative = {}
+    for self_us, cumulative_us, name in re.findall(r"^import time:\s+(\d+) \|\s+(\d+) \| (.*)$", result.stderr, re.MULTILINE):
+        cumulative[name.strip()] = int(cumulative_us) / 1000
+    return cumulative[module], cumulative
+
+
+def top_level_costs(cumulative: Dict[str, float], n: int = 5) -> List[Tuple[str, float]]:
+    # Packages (first dotted component) by cumulative import time
+    packages = {name: ms for name, ms in cumulative.items() if "." not in name}
+    return sorted(packages.items(), key=lambda item: -item[1])[:n]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure module import times and fail if they exceed their budgets.")
+    parser.add_argument("--modules", nargs="+", default=list(IMPORT_BUDGETS_MS))
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module (the fastest counts).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the budgets (for slower machines).")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<12} {'best':>8} {'budget':>8}  heaviest imports")
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.runs)]
+        best, cumulative = min(runs, key=lambda run: run[0])
+        budget = IMPORT_BUDGETS_MS.get(module, float("inf")) * args.scale
+        heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in top_level_costs(cumulative) if name != module)
+        print(f"{module:<12} {best:>6.0f}ms {budget:>6.0f}ms  {heaviest}")
+        if best > budget:
+            failures.append(f"{module} imports in {best:.0f}ms, over its {budget:.0f}ms budget")
+        eager = [package for package in DEFERRED_IMPORTS.get(module, []) if package in cumulative]
+        if eager:
+            failures.append(f"{module} imports {eager} at import time")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: every module imports within its budget and defers its heavy dependencies")
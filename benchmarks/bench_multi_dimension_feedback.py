@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append("./")
+from summary_and_feedback_generation.evaluation_dimensions import (
+    NewsRating,
+    MultiDimensionNewsRating,
+    build_feedback_messages,
+    build_multi_dimension_messages,
+    dimension_name_to_prompt,
+    parse_multi_dimension_reply,
+    verbal_feedback_to_score,
+)
+from utils import get_completion_litellm_for_burda
+
+
+async def rate_per_dimension(completion_fn, news_dict, dimension_names):
+    replies = await asyncio.gather(*(
+        completion_fn(messages=build_feedback_messages(news_dict, name), response_format=NewsRating)
+        for name in dimension_names
+    ))
+    ratings = {name: NewsRating(**json.loads(reply.choices[0].message.content)) for name, reply in zip(dimension_names, replies)}
+    return ratings, sum(reply.usage.prompt_tokens for reply in replies), sum(reply.usage.completion_tokens for reply in replies)
+
+
+async def rate_multi_dimension(completion_fn, news_dict, dimension_names):
+    reply = await completion_fn(messages=build_multi_dimension_messages(news_dict, dimension_names), response_format=MultiDimensionNewsRating)
+    return parse_multi_dimension_reply(reply, dimension_names), reply.usage.prompt_tokens, reply.usage.completion_tokens
+
+
+async def run_mode(rate_fn, completion_fn, news_dicts, dimension_names):
+    latencies, prompt_tokens, completion_tokens, all_ratings = [], 0, 0, []
+    for news_dict in news_dicts:
+        start = time.perf_counter()
+        ratings, prompt, completion = await rate_fn(completion_fn, news_dict, dimension_names)
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens += prompt
+        completion_tokens += completion
+        all_ratings.append(ratings)
+    return all_ratings, latencies, prompt_tokens, completion_tokens
+
+
+def agreement(ratings, labels: pd.DataFrame, dimension_names):
+    """
+    Fraction of exact verdict matches and of verdicts within one step of the label, over all rows and dimensions.
+    """
+    exact, close, total = 0, 0, 0
+    for row_ratings, (_, row) in zip(ratings, labels.iterrows()):
+        for name in dimension_names:
+            predicted = verbal_feedback_to_score.get(row_ratings[name].news_meets_standards.lower())
+            expected = row[f"score/{name}"]
+            total += 1
+            exact += predicted == expected
+            close += predicted is not None and abs(predicted - expected) <= 1
+    return exact / total, close / total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-dimension vs single-call multi-dimension evaluation (needs AZURE_API_KEY).")
+    parser.add_argument("--input", type=str, default="data/news_articles_with_feedback.csv", help="CSV with per-dimension labels")
+    parser.add_argument("--limit", type=int, default=20, help="Number of articles to rate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the article sample")
+    args = parser.parse_args()
+
+    # Step 1: Sample labelled articles
+    df = pd.read_csv(args.input)
+    df = df.sample(n=min(args.limit, len(df)), random_state=args.seed)
+    news_dicts = [{"content": row["content"], "title": row["title"], "description": row["description"]} for _, row in df.iterrows()]
+    dimension_names = list(dimension_name_to_prompt.keys())
+
+    # Step 2: Rate them in both modes, bypassing the LLM cache so every call reaches the model
+    completion_fn = get_completion_litellm_for_burda("gpt-4o", cache=False)
+    results = {
+        "per-dimension": await run_mode(rate_per_dimension, completion_fn, news_dicts, dimension_names),
+        "multi-dimension": await run_mode(rate_multi_dimension, completion_fn, news_dicts, dimension_names),
+    }
+
+    # Step 3: Report tokens, latency and agreement with the labels (and between the two modes)
+    print(f"{len(news_dicts)} articles, {len(dimension_names)} dimensions")
+    print(f"{'mode':<16} {'prompt tok/article':>18} {'completion tok/article':>22} {'latency p50':>11} {'exact':>6} {'+-1':>6}")
+    for mode, (ratings, latencies, prompt_tokens, completion_tokens) in results.items():
+        exact, close = agreement(ratings, df, dimension_names)
+        print(f"{mode:<16} {prompt_tokens / len(news_dicts):>18.0f} {completion_tokens / len(news_dicts):>22.0f} "
+              f"{pd.Series(latencies).median():>10.2f}s {exact:>6.2f} {close:>6.2f}")
+
+    per_dimension_ratings, multi_dimension_ratings = results["per-dimension"][0], results["multi-dimension"][0]
+    same = sum(
+        per_row[name].news_meets_standards.lower() == multi_row[name].news_meets_standards.lower()
+        for per_row, multi_row in zip(per_dimension_ratings, multi_dimension_ratings)
+        for name in dimension_names
+    )
+    print(f"verdict agreement between the modes: {same / (len(news_dicts) * len(dimension_names)):.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
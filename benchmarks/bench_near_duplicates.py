@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("./")
+from news_collector.near_duplicates import MinHashLSH, shingles
+
+
+def synthetic_corpus(n_stories: int, words_per_story: int, copies: int, edit_rate: float, vocabulary_size: int, seed: int):
+    """
+    Stories of random words, each followed by up to `copies` rewordings with `edit_rate` of the words replaced.
+
+    Returns:
+        tuple: (texts, story id of every text)
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(vocabulary_size)])
+    texts, story_ids = [], []
+    for story in range(n_stories):
+        words = rng.choice(vocabulary, size=words_per_story)
+        texts.append(" ".join(words))
+        story_ids.append(story)
+        for _ in range(rng.integers(0, copies + 1)):
+            edited = words.copy()
+            positions = rng.random(words_per_story) < edit_rate
+            edited[positions] = rng.choice(vocabulary, size=positions.sum())
+            texts.append(" ".join(edited))
+            story_ids.append(story)
+    return texts, np.array(story_ids)
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / max(1, len(a | b))
+
+
+def pair_quality(clusters, story_ids, shingle_sets, threshold):
+    """
+    Precision of the clustered pairs, recall of the pairs of copies whose exact Jaccard similarity reaches
+    the threshold, and recall of all the pairs of copies of a story (reached through transitive clustering).
+    """
+    predicted = {pair for cluster in clusters for pair in itertools.combinations(cluster, 2)}
+    by_story = {}
+    for index, story in enumerate(story_ids):
+        by_story.setdefault(story, []).append(index)
+    same_story = {pair for members in by_story.values() for pair in itertools.combinations(members, 2)}
+    above_threshold = {(i, j) for i, j in same_story if jaccard(shingle_sets[i], shingle_sets[j]) >= threshold}
+    precision = len(predicted & same_story) / len(predicted) if predicted else 1.0
+    recall = len(predicted & above_threshold) / len(above_threshold) if above_threshold else 1.0
+    story_recall = len(predicted & same_story) / len(same_story) if same_story else 1.0
+    return precision, recall, story_recall
+
+
+def brute_force_seconds(shingle_sets):
+    # Exact Jaccard of every pair: the quadratic baseline the LSH avoids
+    start = time.perf_counter()
+    for i in range(len(shingle_sets)):
+        for j in range(i):
+            jaccard(shingle_sets[i], shingle_sets[j])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and accuracy of MinHash-LSH near-duplicate detection on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="Number of stories per corpus")
+    parser.add_argument("--words", type=int, default=300, help="Words per story")
+    parser.add_argument("--copies", type=int, default=3, help="Maximum number of reworded copies per story")
+    parser.add_argument("--edit-rate", type=float, default=0.03, help="Fraction of words replaced in a copy")
+    parser.add_argument("--brute-force-max", type=int, default=3000, help="Largest corpus (in texts) timed with the all-pairs baseline")
+    args = parser.parse_args()
+
+    lsh = MinHashLSH()
+    print(f"MinHash: {lsh.num_permutations} permutations, {lsh.bands} bands x {lsh.rows} rows, threshold {lsh.threshold}")
+    print(f"{'texts':>7} {'seconds':>8} {'texts/s':>8} {'precision':>9} {'recall':>7} {'story recall':>12} {'all-pairs s':>11}")
+    for size in args.sizes:
+        texts, story_ids = synthetic_corpus(size, args.words, args.copies, args.edit_rate, vocabulary_size=20000, seed=size)
+        start = time.perf_counter()
+        clusters = lsh.clusters(texts)
+        elapsed = time.perf_counter() - start
+        shingle_sets = [set(shingles(text).tolist()) for text in texts]
+        precision, recall, story_recall = pair_quality(clusters, story_ids, shingle_sets, lsh.threshold)
+        brute_force = f"{brute_force_seconds(shingle_sets):11.1f}" if len(texts) <= args.brute_force_max else f"{'-':>11}"
+        print(f"{len(texts):>7} {elapsed:>8.2f} {len(texts) / elapsed:>8.0f} {precision:>9.3f} {recall:>7.3f} {story_recall:>12.3f} {brute_force}")
+
+
+if __name__ == "__main__":
+    main()
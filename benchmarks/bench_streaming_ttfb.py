@@ -0,0 +1,87 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.fake_services import FakeServer, create_fake_app
+
+
+def unique_articles() -> str:
+    # A different text per request, so no response comes from the LLM cache
+    return f"title = Fake EV news {uuid.uuid4()}\ncontent = A new battery factory opened."
+
+
+async def time_request(client: httpx.AsyncClient, path: str, image_url: str):
+    """
+    Time one request to the API.
+
+    Returns:
+        tuple: Seconds until the first body byte, until the first article text (a "token" event for the
+        streaming endpoints, the whole body otherwise) and until the end of the response.
+    """
+    start = time.perf_counter()
+    first_byte = first_text = None
+    streaming = path.endswith("-stream/")
+    async with client.stream("POST", path, json={"articles": unique_articles(), "image_url": image_url}) as response:
+        response.raise_for_status()
+        buffer = ""
+        async for text in response.aiter_text():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            buffer += text
+            if first_text is None and (not streaming or "event: token" in buffer):
+                first_text = now
+        total = time.perf_counter() - start
+    if streaming and "event: done" not in buffer:
+        raise RuntimeError(f"{path} did not finish the article: {buffer[-200:]}")
+    if not streaming:
+        first_text = total
+    return first_byte, first_text, total
+
+
+async def main(api_url: str, n_requests: int) -> None:
+    async with httpx.AsyncClient(base_url=api_url, timeout=120) as client:
+        # Warm up the clients and connection pools
+        await time_request(client, "/generate-article/", "http://example.com/image.jpg")
+
+        print(f"{'endpoint':<32} {'first byte':>10} {'first text':>10} {'total':>8}   (median of {n_requests})")
+        for path, image_url in [
+            ("/generate-article/", "http://example.com/image.jpg"),
+            ("/generate-article-stream/", "http://example.com/image.jpg"),
+            ("/generate-full-article/", ""),
+            ("/generate-full-article-stream/", ""),
+        ]:
+            timings = [await time_request(client, path, image_url) for _ in range(n_requests)]
+            first_byte, first_text, total = (statistics.median(values) for values in zip(*timings))
+            print(f"{path:<32} {first_byte:>9.2f}s {first_text:>9.2f}s {total:>7.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first byte and first article text, buffered vs streamed generation.")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per endpoint.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake model latency before the first token, in seconds.")
+    parser.add_argument("--tokens", type=int, default=300, help="Fake article length, in tokens.")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Fake generation time per token, in seconds.")
+    args = parser.parse_args()
+
+    fake_app = create_fake_app(latency=args.latency, article_tokens=args.tokens, token_interval=args.token_interval)
+    with FakeServer(fake_app) as fake, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["BING_API_KEY"] = "fake-key"
+        os.environ["BING_IMAGE_SEARCH_URL"] = f"{fake.url}/bing/images/search"
+        os.environ["PREGENERATE_AHEAD"] = "0"
+        os.environ["CACHE_DIR"] = cache_dir
+        import api  # Imported after the environment points it at the fake services
+
+        # A real server: the in-process ASGI transport buffers whole responses
+        with FakeServer(api.app) as api_server:
+            asyncio.run(main(api_server.url, args.requests))
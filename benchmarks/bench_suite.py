@@ -0,0 +1,233 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_services import FakeServerProcess, create_fake_app, create_fake_news_app
+
+STAGE_NAMES = ["fetch_images", "validate_article", "extract_article_content", "get_feedback", "generate_summary",
+               "bing_news", "api/generate-article", "api/find-image", "api/generate-full-article"]
+
+
+def point_at_fakes(fake_url: str, news_url: str, cache_dir: str) -> None:
+    """
+    Point every external service at the fake servers through the base-URL settings, before the modules
+    reading them are imported.
+    """
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "OPENAI_API_KEY": "fake-key",
+        "AZURE_API_BASE": fake_url,
+        "AZURE_API_KEY": "fake-key",
+        "BING_API_KEY": "fake-key",
+        "BING_IMAGE_SEARCH_URL": f"{fake_url}/bing/images/search",
+        "BING_NEWS_URL": f"{fake_url}/bing/news",
+        # Every op must reach the fake services, not the caches of an earlier op or run
+        "CACHE_DIR": cache_dir,
+        "LLM_CACHE": "off",
+        "PREGENERATE_AHEAD": "0",
+        "REQUEST_TRACE_LOG": "0",
+    })
+
+
+def fake_article(i: int) -> Dict[str, Any]:
+    # A different text per op, so the image search and selection caches never answer
+    return {
+        "title": f"EV news {i} {uuid.uuid4().hex[:8]}",
+        "description": "Electric vehicle sales kept growing this quarter.",
+        "content": "Electric vehicle sales kept growing as new models reached dealerships. " * 20,
+        "full_content": "Electric vehicle sales kept growing as new models reached dealerships. " * 20,
+    }
+
+
+def build_stages(api_client, news_url: str) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+    """
+    One operation per stage: an async function of the op index.
+    """
+    import utils
+    from news_collector.bingnews import get_news
+    from summary_and_feedback_generation.evaluation_dimensions import get_feedback
+    from summary_and_feedback_generation.summary_generation import generate_summary
+
+    async def post(path: str, body: Dict) -> Any:
+        response = await api_client.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    def articles_text(i: int) -> str:
+        article = fake_article(i)
+        return f"title = {article['title']}\ncontent = {article['content']}"
+
+    async def validate(i: int) -> Any:
+        validated = (await utils.avalidate_articles([fake_article(i)]))[0]
+        if not validated["is_valid_article"]:
+            raise RuntimeError(validated["validation_reason"])
+        return validated
+
+    async def extract(i: int) -> Any:
+        article = await asyncio.to_thread(utils.extract_article_content, f"{news_url}/news/{i}.html")
+        if article.method == "failed":
+            raise RuntimeError("No content extracted")
+        return article
+
+    async def news(i: int) -> Any:
+        articles = await asyncio.to_thread(get_news, f"electric vehicles {i}", "en-US", 10)
+        if not articles:
+            raise RuntimeError("No news returned")
+        return articles
+
+    return {
+        "fetch_images": lambda i: utils.fetch_images(f"electric car {i} {uuid.uuid4().hex[:8]}", 10),
+        "validate_article": validate,
+        "extract_article_content": extract,
+        "get_feedback": lambda i: get_feedback(fake_article(i), "originality-value-purpose"),
+        "generate_summary": lambda i: generate_summary(fake_article(i)),
+        "bing_news": news,
+        "api/generate-article": lambda i: post("/generate-article/", {"articles": articles_text(i), "image_url": "http://example.com/image.jpg"}),
+        "api/find-image": lambda i: post("/find-image/", {"description": f"electric car {i} {uuid.uuid4().hex[:8]}", "nimages": 10}),
+        "api/generate-full-article": lambda i: post("/generate-full-article/", {"articles": articles_text(i), "image_url": ""}),
+    }
+
+
+async def run_stage(op: Callable[[int], Awaitable[Any]], n_ops: int, concurrency: int, trace_memory: bool) -> Dict[str, Any]:
+    """
+    Run `n_ops` operations with at most `concurrency` in flight.
+
+    Returns:
+        dict: ops, errors, ops/s, latency percentiles in milliseconds and peak memory in MB.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def timed(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await op(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(n_ops)))
+    elapsed = time.perf_counter() - start
+    values = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "ops": n_ops,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        # Python heap peak during the stage (tracemalloc), its growth over the heap at the start of the stage,
+        # and the process peak RSS so far
+        "peak_traced_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2) if trace_memory else None,
+        "peak_growth_mb": round((tracemalloc.get_traced_memory()[1] - traced_before) / 2**20, 2) if trace_memory else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+async def run_suite(stage_names: List[str], n_ops: int, concurrency: int, trace_memory: bool, news_url: str) -> Dict[str, Any]:
+    import httpx
+    import api  # Imported after the environment points it at the fake services
+
+    results = {}
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as api_client:
+            stages = build_stages(api_client, news_url)
+            for name in stage_names:
+                # One untimed op first, so imports and connection setup are not measured
+                await run_stage(stages[name], 1, 1, False)
+                results[name] = await run_stage(stages[name], n_ops, concurrency, trace_memory)
+                print(f"{name:<28} {results[name]['ops_per_sec']:>8.1f} ops/s  p50 {results[name]['p50_ms']:>7.1f}ms  "
+                      f"p95 {results[name]['p95_ms']:>7.1f}ms  p99 {results[name]['p99_ms']:>7.1f}ms  errors {results[name]['errors']}",
+                      file=sys.stderr)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Stages whose throughput dropped or whose p95 latency grew by more than `max_regression` against a baseline report.
+    """
+    if baseline.get("config") != report["config"]:
+        print(f"Warning: the baseline ran with another configuration: {baseline.get('config')}", file=sys.stderr)
+    regressions = []
+    for name, result in report["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or not previous["ops_per_sec"]:
+            continue
+        throughput_change = result["ops_per_sec"] / previous["ops_per_sec"] - 1
+        p95_change = result["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        print(f"{name:<28} ops/s {throughput_change:+7.1%}  p95 {p95_change:+7.1%}", file=sys.stderr)
+        if throughput_change < -max_regression or p95_change > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite: throughput, latency percentiles and memory of the "
+                                                 "pipeline and API stages against local stand-ins for OpenAI, Bing and news sites.")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_NAMES, default=STAGE_NAMES)
+    parser.add_argument("--ops", type=int, default=40, help="Operations per stage.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Operations in flight per stage.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake latency per LLM/search/page request, in seconds.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every k-th chat completion with a 429.")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Do not trace Python allocations (faster, no peak_traced_mb).")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout).")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare with.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Relative throughput drop or p95 growth that fails the comparison.")
+    args = parser.parse_args()
+
+    with FakeServerProcess(create_fake_news_app, latency=args.latency) as news_site, \
+            FakeServerProcess(create_fake_app, latency=args.latency, rate_limit_every=args.rate_limit_every, news_site_url=news_site.url) as fake, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        point_at_fakes(fake.url, news_site.url, cache_dir)
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+        stage_results = asyncio.run(run_suite(args.stages, args.ops, args.concurrency, not args.no_tracemalloc, news_site.url))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {"ops": args.ops, "concurrency": args.concurrency, "latency": args.latency,
+                   "rate_limit_every": args.rate_limit_every, "tracemalloc": not args.no_tracemalloc},
+        "stages": stage_results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Regressions beyond {args.max_regression:.0%}: {regressions}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append("./")
+from benchmarks.fake_services import FakeServer, create_fake_app
+
+# Validation replies must come from the fake server, not from an earlier run's LLM cache
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_validation_")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# Sleep validate_article used to do before every call
+LEGACY_WAIT_TIME = 0.75
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent rate-limited article validation against a fake OpenAI server.")
+    parser.add_argument("--articles", type=int, default=200, help="Number of articles to validate")
+    parser.add_argument("--latency", type=float, default=0.5, help="Completion latency, in seconds")
+    parser.add_argument("--rate-limit-every", type=int, default=25, help="Every k-th completion gets a 429")
+    args = parser.parse_args()
+
+    with FakeServer(create_fake_app(args.latency, rate_limit_every=args.rate_limit_every)) as server:
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        from rate_limiter import AsyncRateLimiter
+        from utils import avalidate_articles
+
+        articles = [{"title": f"EV news {i}", "full_content": f"Electric vehicles, part {i}."} for i in range(args.articles)]
+        limiter = AsyncRateLimiter(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=32)
+
+        start = time.perf_counter()
+        validated = asyncio.run(avalidate_articles(articles, rate_limiter=limiter))
+        elapsed = time.perf_counter() - start
+
+    valid = sum(article["is_valid_article"] for article in validated)
+    serial_estimate = args.articles * (args.latency + LEGACY_WAIT_TIME)
+    print(f"{args.articles} articles, {args.latency:.2f}s latency, a 429 every {args.rate_limit_every} requests")
+    print(f"serial with sleep (estimate): {serial_estimate:7.1f}s")
+    print(f"rate-limited concurrent:      {elapsed:7.1f}s  ({valid} valid)")
+    print(f"limiter: {limiter.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fake_services import FakeServer, create_fake_app
+
+ARTICLES = "title = Fake EV news {n}\ncontent = A new battery factory opened, report {n}."
+
+
+async def run_requests(app, n_requests: int, first: int = 0) -> float:
+    """
+    Send `n_requests` simultaneous /generate-full-article/ requests and return the wall time.
+
+    Every request gets its own articles (numbered from `first`), so none of them is answered from the
+    image caches filled by another request.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/generate-full-article/", json={"articles": ARTICLES.format(n=first + i), "image_url": ""})
+            for i in range(n_requests)
+        ])
+        elapsed = time.perf_counter() - start
+    failed = [response for response in responses if response.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} requests failed: {failed[0].text}")
+    return elapsed
+
+
+async def main(n_requests: int, latency: float) -> int:
+    import api  # Imported after the environment points it at the fake services
+
+    async with api.app.router.lifespan_context(api.app):
+        # Warm up (connections, lazy imports), then time uncached requests on articles never seen before
+        await run_requests(api.app, 1, first=0)
+        single = await run_requests(api.app, 1, first=1)
+        concurrent = await run_requests(api.app, n_requests, first=2)
+
+    # Each request makes three sequential model calls; serialized requests would take ~n_requests * single
+    print(f"1 request: {single:.2f}s, {n_requests} simultaneous requests: {concurrent:.2f}s "
+          f"(serialized would be ~{single * n_requests:.2f}s)")
+    if concurrent > 2 * single:
+        print("FAIL: simultaneous requests did not overlap")
+        return 1
+    print("OK: simultaneous requests overlap")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that simultaneous /generate-full-article/ requests overlap.")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake model latency per call, in seconds.")
+    args = parser.parse_args()
+
+    with FakeServer(create_fake_app(latency=args.latency)) as fake, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["BING_API_KEY"] = "fake-key"
+        os.environ["BING_IMAGE_SEARCH_URL"] = f"{fake.url}/bing/images/search"
+        os.environ["PREGENERATE_AHEAD"] = "0"
+        # Isolated caches and no LLM response cache: every timed request pays all its model calls
+        os.environ["CACHE_DIR"] = cache_dir
+        os.environ["LLM_CACHE"] = "off"
+        sys.exit(asyncio.run(main(args.requests, args.latency)))
@@ -0,0 +1,45 @@
+import sys
+sys.path.append("./")
+import argparse
+
+from benchmarks.bench_extraction import load_fixtures
+from extraction import FULL_ARTICLE_CHARS, MIN_CONFIDENCE, extract_html
+
+FIXTURES_DIR = "benchmarks/fixtures/extraction"
+# Pages that hold no article: the fast path must not return one (newspaper3k may parse them again, or nothing is found)
+LISTING_PAGES = {"listing_teasers.html"}
+
+
+def check_page(name: str, url: str, html: str) -> str:
+    """
+    Extract a fixture page and return what is wrong with the result ("" if nothing).
+    """
+    article = extract_html(url, html)
+    if name in LISTING_PAGES:
+        if article.method == "lxml":
+            return f"listing page extracted as an article ({len(article.text)} chars, confidence {article.confidence:.2f})"
+        return ""
+    if article.method != "lxml" or article.confidence < MIN_CONFIDENCE:
+        return f"article left the fast path (method {article.method}, confidence {article.confidence:.2f})"
+    if len(article.text) < FULL_ARTICLE_CHARS:
+        return f"article text cut short ({len(article.text)} chars)"
+    return ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the fast-path extraction of the fixture pages.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    failures = []
+    for url, html in load_fixtures(args.fixtures):
+        name = url.rsplit("/", 1)[-1]
+        problem = check_page(name, url, html)
+        print(f"{name:<40} {problem or 'ok'}")
+        if problem:
+            failures.append(name)
+
+    if failures:
+        print(f"FAIL: {', '.join(failures)}")
+        sys.exit(1)
+    print("OK: article pages stay on the fast path and listing pages are not taken for articles")
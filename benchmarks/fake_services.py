@@ -0,0 +1,278 @@
+import asyncio
+import base64
+import json
+import multiprocessing
+import re
+import socket
+import threading
+import time
+import zlib
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Smallest valid JPEG header + padding, enough for content sniffing
+FAKE_JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00" + b"\x00" * 1024 + b"\xff\xd9"
+
+# Replies to structured-output requests, by response format (schema) name
+STRUCTURED_REPLIES = {
+    "SelectedImageIndex": {"index": 0},
+    "Summary": {"summary": "Electric vehicle sales kept growing as charging networks expanded."},
+    "NewsRating": {"critique": "Fake critique of the article.", "news_meets_standards": "agree"},
+}
+
+
+def create_fake_app(latency: float = 0.2, n_images: int = 10, rate_limit_every: int = 0, retry_after: float = 0.5,
+                    article_tokens: int = 0, token_interval: float = 0.0, embedding_dim: int = 1536,
+                    n_news: int = 10, news_site_url: str = None) -> FastAPI:
+    """
+    Local stand-in for the OpenAI chat and embeddings APIs (also under the Azure deployment paths used by
+    litellm), the Bing image and news search APIs and an image host.
+
+    Every chat completion sleeps `latency` seconds (without blocking the server) before answering, so
+    overlapping and serialized callers are easy to tell apart. With `rate_limit_every=k`, every k-th
+    completion request is rejected with a 429 and a Retry-After of `retry_after` seconds.
+
+    Generated articles get `article_tokens` extra words, each taking `token_interval` seconds to "generate":
+    a streamed completion (stream=true) sends its first token after `latency` and then one token per
+    interval, a regular completion answers once all tokens are generated.
+
+    Embedding requests also take `latency` seconds, whatever the number of inputs, and return a deterministic
+    unit vector of `embedding_dim` floats per input text.
+
+    News searches return `n_news` articles whose pages are served by `news_site_url` (see create_fake_news_app).
+    """
+    app = FastAPI()
+    app.state.completion_requests = 0
+    app.state.embedding_requests = 0
+    app.state.embedded_inputs = 0
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.completion_requests += 1
+        if rate_limit_every and app.state.completion_requests % rate_limit_every == 0:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(retry_after)},
+            )
+        await asyncio.sleep(latency)
+        response_format = body.get("response_format") or {}
+        system_prompt = str(body["messages"][0].get("content", "")) if body.get("messages") else ""
+        generation_time = 0.0
+        if response_format.get("type") == "json_schema":
+            # Structured outputs: a canned reply per schema (image selection always picks the first image)
+            content = json.dumps(STRUCTURED_REPLIES.get(response_format.get("json_schema", {}).get("name"), {"index": 0}))
+        elif '"is_article"' in system_prompt:
+            # Article validation
+            content = json.dumps({"is_article": True, "confidence": 0.9, "reason": "Fake validation"})
+        elif "image search engine" in system_prompt:
+            # Image search query, distinct per article so the image caches only hit for repeated articles
+            user_prompt = str(body["messages"][-1].get("content", ""))
+            content = f"electric car battery factory {zlib.crc32(user_prompt.encode('utf-8'))}"
+        else:
+            # Article: embed the image the prompt asks for, as the model does
+            image = re.search(r"!\[image\]\(([^)]*)\)", json.dumps(body["messages"]))
+            image_url = image.group(1) if image else "http://example.com/image.jpg"
+            # The title identifies the articles the prompt was built from
+            digest = zlib.crc32(re.sub(r"!\[image\]\([^)]*\)", "", json.dumps(body["messages"])).encode("utf-8"))
+            content = f"# Fake Title {digest}\n\n![image]({image_url})\n\nFake article body." + " body" * article_tokens
+            generation_time = article_tokens * token_interval
+        if body.get("stream"):
+            return StreamingResponse(stream_completion(body, content), media_type="text/event-stream")
+        await asyncio.sleep(generation_time)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }
+
+    async def stream_completion(body, content: str):
+        tokens = content.split(" ")
+        for position, token in enumerate(tokens):
+            if position:
+                await asyncio.sleep(token_interval)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token if not position else " " + token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {**final, "choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": len(tokens), "total_tokens": 10 + len(tokens)}}
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/embeddings")
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.embedding_requests += 1
+        app.state.embedded_inputs += len(inputs)
+        await asyncio.sleep(latency)
+        data = []
+        for index, text in enumerate(inputs):
+            vector = np.random.default_rng(zlib.crc32(str(text).encode("utf-8"))).standard_normal(embedding_dim)
+            vector = (vector / np.linalg.norm(vector)).astype(np.float32)
+            # The OpenAI SDK asks for base64-encoded float32 vectors by default
+            encoded = base64.b64encode(vector.tobytes()).decode("ascii") if body.get("encoding_format") == "base64" else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": encoded})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.get("/bing/images/search")
+    async def image_search(request: Request):
+        base_url = str(request.base_url).rstrip("/")
+        return {"value": [{"contentUrl": f"{base_url}/images/{i}.jpg"} for i in range(n_images)]}
+
+    @app.get("/bing/news")
+    @app.get("/bing/news/search")
+    async def news_search(request: Request):
+        site_url = news_site_url or str(request.base_url).rstrip("/")
+        query = request.query_params.get("q", "")
+        return {"value": [
+            {
+                "name": f"EV news {query} {i}",
+                "description": "Electric vehicle sales kept growing this quarter.",
+                "url": f"{site_url}/news/{i}.html",
+                "datePublished": "2024-11-20T08:00:00.0000000Z",
+                "provider": [{"name": "Fake News"}],
+                "category": "Business",
+            }
+            for i in range(n_news)
+        ]}
+
+    @app.api_route("/images/{name}", methods=["GET", "HEAD"])
+    async def image(name: str):
+        return Response(content=FAKE_JPEG, media_type="image/jpeg")
+
+    return app
+
+
+FAKE_PARAGRAPH = (
+    "Electric vehicle sales kept growing this quarter as new models reached dealerships across Europe. "
+    "Analysts expect charging infrastructure and battery prices to decide how fast the trend continues. "
+)
+
+
+def fake_news_page(page_id: int, n_paragraphs: int = 12) -> str:
+    paragraphs = "".join(f"<p>{FAKE_PARAGRAPH * 2}</p>" for _ in range(n_paragraphs))
+    return (
+        f"<html><head><title>EV news {page_id}</title></head><body>"
+        f"<nav><a href='/'>Home</a> <a href='/privacy'>Privacy</a></nav>"
+        f"<article><h1>EV news {page_id}</h1>{paragraphs}</article>"
+        f"<footer>Cookie settings</footer></body></html>"
+    )
+
+
+def create_fake_news_app(latency: float = 0.2, n_paragraphs: int = 12, fail_first_every: int = 0) -> FastAPI:
+    """
+    Local stand-in for news sites serving canned article pages at /news/{page_id}.html.
+
+    With `fail_first_every=k`, the first request of every k-th page answers 503, to exercise retries.
+    /loop.html redirects to itself forever, to exercise pages that can never be fetched.
+    """
+    app = FastAPI()
+    seen = set()
+
+    @app.get("/news/{page_id}.html")
+    async def news_page(page_id: int):
+        await asyncio.sleep(latency)
+        if fail_first_every and page_id % fail_first_every == 0 and page_id not in seen:
+            seen.add(page_id)
+            return Response(status_code=503)
+        return Response(content=fake_news_page(page_id, n_paragraphs), media_type="text/html")
+
+    @app.get("/loop.html")
+    async def redirect_loop():
+        return Response(status_code=302, headers={"Location": "/loop.html"})
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeServer:
+    """
+    Run an ASGI app with uvicorn in a background thread (use as a context manager).
+    """
+
+    def __init__(self, app, port: int = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "FakeServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def _serve(app_factory, app_kwargs: dict, port: int) -> None:
+    uvicorn.run(app_factory(**app_kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+class FakeServerProcess:
+    """
+    Run a fake app in a separate process (use as a context manager), so that neither its CPU time nor its
+    memory are counted in the measurements of the benchmarked process.
+    """
+
+    def __init__(self, app_factory, port: int = None, **app_kwargs):
+        """
+        Args:
+            app_factory (callable): Module-level function building the app, e.g. create_fake_app.
+            port (int): Port to listen on. Defaults to a free port.
+            **app_kwargs: Arguments of `app_factory`.
+        """
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process = multiprocessing.get_context("spawn").Process(target=_serve, args=(app_factory, app_kwargs, self.port), daemon=True)
+
+    def __enter__(self) -> "FakeServerProcess":
+        self._process.start()
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.1):
+                    return self
+            except OSError:
+                if not self._process.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError(f"Fake server on port {self.port} did not start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,276 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_services import FakeServerProcess, create_fake_app, free_port
+
+ENDPOINTS = ["find-image", "generate-article", "generate-full-article", "next-article"]
+GROUPS_CSV = "./data/df_with_embedding_and_sorted_groups.csv"
+
+
+def build_request(endpoint: str) -> Tuple[str, str, Optional[Dict]]:
+    """
+    Method, path and body of one request. Texts are unique so the image and LLM caches do not answer.
+    """
+    unique = uuid.uuid4().hex[:8]
+    articles = f"title = Fake EV news {unique}\ncontent = A new battery factory opened."
+    if endpoint == "find-image":
+        return "POST", "/find-image/", {"description": f"electric car battery factory {unique}", "nimages": 10}
+    if endpoint == "generate-article":
+        return "POST", "/generate-article/", {"articles": articles, "image_url": "http://example.com/image.jpg"}
+    if endpoint == "generate-full-article":
+        return "POST", "/generate-full-article/", {"articles": articles, "image_url": ""}
+    return "GET", "/next-article/", None
+
+
+class RunResult:
+    """
+    Latencies, errors and served articles of one load level.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.titles: List[str] = []
+        self.max_in_flight = 0
+
+    async def send(self, client: httpx.AsyncClient, endpoint: str, scheduled: float) -> None:
+        """
+        Send one request; latency is counted from `scheduled` (the intended send time), so a backed-up
+        client does not hide queueing delays.
+        """
+        method, path, body = build_request(endpoint)
+        try:
+            response = await client.request(method, path, json=body)
+            if response.status_code != 200:
+                self.errors[f"http_{response.status_code}"] += 1
+                return
+            if endpoint == "next-article":
+                self.titles.append(response.json()["article"].split("\n", 1)[0])
+            self.latencies.append(time.perf_counter() - scheduled)
+        except httpx.HTTPError as e:
+            self.errors[type(e).__name__] += 1
+
+
+async def closed_model(client: httpx.AsyncClient, endpoint: str, concurrency: int, duration: float) -> Tuple[RunResult, float]:
+    """
+    `concurrency` users each sending their next request as soon as the previous one is answered.
+    """
+    result = RunResult()
+    result.max_in_flight = concurrency
+    deadline = time.perf_counter() + duration
+
+    async def user() -> None:
+        while time.perf_counter() < deadline:
+            await result.send(client, endpoint, time.perf_counter())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return result, time.perf_counter() - start
+
+
+async def open_model(client: httpx.AsyncClient, endpoint: str, rate: float, duration: float, seed: int = 0) -> Tuple[RunResult, float]:
+    """
+    Requests arriving at `rate` per second (Poisson arrivals) for `duration` seconds, whether or not the
+    earlier ones were answered, as independent users would.
+    """
+    result = RunResult()
+    rng = random.Random(seed)
+    tasks = []
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start > duration:
+            break
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.create_task(result.send(client, endpoint, scheduled)))
+        result.max_in_flight = max(result.max_in_flight, sum(not task.done() for task in tasks))
+    await asyncio.gather(*tasks)
+    return result, time.perf_counter() - start
+
+
+def lag_histogram(exposition: str) -> Dict[str, Any]:
+    """
+    Buckets, sum and count of event_loop_lag_seconds in a /metrics exposition.
+    """
+    buckets = {}
+    for bound, value in re.findall(r'^event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\S+)$', exposition, re.MULTILINE):
+        buckets[float(bound)] = float(value)
+    total = re.search(r"^event_loop_lag_seconds_sum (\S+)$", exposition, re.MULTILINE)
+    count = re.search(r"^event_loop_lag_seconds_count (\S+)$", exposition, re.MULTILINE)
+    return {"buckets": buckets, "sum": float(total.group(1)) if total else 0.0, "count": float(count.group(1)) if count else 0.0}
+
+
+def lag_summary(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """
+    Mean and p99 (bucket upper bound) event loop lag in milliseconds between two /metrics scrapes.
+    """
+    count = after["count"] - before["count"]
+    if count <= 0:
+        return {"lag_mean_ms": None, "lag_p99_ms": None}
+    p99 = None
+    for bound in sorted(after["buckets"]):
+        if after["buckets"][bound] - before["buckets"].get(bound, 0.0) >= 0.99 * count:
+            p99 = bound
+            break
+    return {"lag_mean_ms": round((after["sum"] - before["sum"]) / count * 1000, 2),
+            "lag_p99_ms": None if p99 is None or p99 == float("inf") else p99 * 1000}
+
+
+def cursor_summary(titles: List[str], n_groups: int) -> Dict[str, Any]:
+    """
+    How evenly /next-article/ cycled through the groups: a single shared cursor serves every group once per
+    cycle, so the most served group is at most ceil(requests / groups) times.
+    """
+    if not titles:
+        return {}
+    counts = Counter(titles)
+    return {"groups_served": len(counts), "max_serves_per_group": max(counts.values()),
+            "expected_max_serves": -(-len(titles) // n_groups)}
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, model: str, level: float, duration: float, n_groups: int) -> Dict[str, Any]:
+    before = lag_histogram((await client.get("/metrics")).text)
+    if model == "closed":
+        result, elapsed = await closed_model(client, endpoint, int(level), duration)
+    else:
+        result, elapsed = await open_model(client, endpoint, level, duration)
+    after = lag_histogram((await client.get("/metrics")).text)
+
+    requests = len(result.latencies) + sum(result.errors.values())
+    latencies = np.asarray(result.latencies) * 1000 if result.latencies else np.full(1, np.nan)
+    row = {
+        "endpoint": endpoint,
+        "model": model,
+        "level": level,
+        "requests": requests,
+        "throughput": round(len(result.latencies) / elapsed, 2),
+        "error_rate": round(sum(result.errors.values()) / requests, 4) if requests else 0.0,
+        "errors": dict(result.errors),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        "max_in_flight": result.max_in_flight,
+        **lag_summary(before, after),
+    }
+    if endpoint == "next-article":
+        row.update(cursor_summary(result.titles, n_groups))
+    return row
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    header = f"{'endpoint':<22} {'load':>10} {'reqs':>6} {'req/s':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'lag':>7} {'lag99':>7} {'cursor':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        load = f"c={int(row['level'])}" if row["model"] == "closed" else f"{row['level']:g}/s"
+        lag = "-" if row["lag_mean_ms"] is None else f"{row['lag_mean_ms']:.1f}"
+        lag99 = "-" if row["lag_p99_ms"] is None else f"<{row['lag_p99_ms']:g}"
+        cursor = f"{row['max_serves_per_group']}/{row['expected_max_serves']}" if "max_serves_per_group" in row else ""
+        print(f"{row['endpoint']:<22} {load:>10} {row['requests']:>6} {row['throughput']:>7.1f} {row['error_rate'] * 100:>5.1f}% "
+              f"{row['p50_ms']:>6.0f}ms {row['p95_ms']:>6.0f}ms {row['p99_ms']:>6.0f}ms {lag:>5}ms {lag99:>5}ms {cursor:>8}")
+
+
+async def run_sweep(client: httpx.AsyncClient, args: argparse.Namespace, n_groups: int) -> List[Dict[str, Any]]:
+    rows = []
+    levels = [("open", rate) for rate in args.rates] if args.rates else [("closed", c) for c in args.concurrency]
+    for endpoint in args.endpoints:
+        # One untimed request first, so lazy imports and connection setup are not measured
+        await RunResult().send(client, endpoint, time.perf_counter())
+        for model, level in levels:
+            rows.append(await run_level(client, endpoint, model, level, args.duration, n_groups))
+            print(f"{endpoint} {model} {level}: {rows[-1]['throughput']} req/s, p95 {rows[-1]['p95_ms']}ms", file=sys.stderr)
+    return rows
+
+
+async def run_in_process(args: argparse.Namespace, n_groups: int) -> List[Dict[str, Any]]:
+    import api  # Imported after the environment points it at the fake services
+
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=args.timeout) as client:
+            return await run_sweep(client, args, n_groups)
+
+
+async def run_against_server(args: argparse.Namespace, n_groups: int) -> List[Dict[str, Any]]:
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+                               "--workers", str(args.workers), "--log-level", "warning"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if args.quiet_server else None)
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            # Wait until every worker has finished its startup
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/pregeneration-stats/")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("The API server did not start")
+                await asyncio.sleep(0.2)
+            return await run_sweep(client, args, n_groups)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API endpoints at a sweep of concurrency levels (closed model) "
+                                                 "or arrival rates (open model), against a fake model backend.")
+    parser.add_argument("--target", choices=["in-process", "uvicorn"], default="in-process",
+                        help="Drive the app through ASGI in this process, or a local uvicorn server.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn target).")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64], help="Closed model: simultaneous users.")
+    parser.add_argument("--rates", nargs="+", type=float, help="Open model: arrival rates in requests per second (replaces --concurrency).")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per load level.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout, in seconds (timeouts count as errors).")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake latency per model/search call, in seconds.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every k-th chat completion with a 429.")
+    parser.add_argument("--pregenerate-ahead", type=int, default=3, help="PREGENERATE_AHEAD of the app.")
+    parser.add_argument("--output", help="Also write the rows as JSON to this file.")
+    parser.add_argument("--quiet-server", action="store_true", help="Hide the uvicorn server's logs.")
+    args = parser.parse_args()
+
+    from article_groups import GroupIndex
+    n_groups = len(GroupIndex(GROUPS_CSV))
+
+    with FakeServerProcess(create_fake_app, latency=args.latency, rate_limit_every=args.rate_limit_every) as fake, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        os.environ.update({
+            "OPENAI_BASE_URL": f"{fake.url}/v1",
+            "OPENAI_API_KEY": "fake-key",
+            "BING_API_KEY": "fake-key",
+            "BING_IMAGE_SEARCH_URL": f"{fake.url}/bing/images/search",
+            "CACHE_DIR": cache_dir,
+            "PREGENERATE_AHEAD": str(args.pregenerate_ahead),
+            "REQUEST_TRACE_LOG": "0",
+        })
+        if args.target == "in-process":
+            rows = asyncio.run(run_in_process(args, n_groups))
+        else:
+            rows = asyncio.run(run_against_server(args, n_groups))
+
+    print()
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
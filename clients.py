@@ -0,0 +1,51 @@
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Shared, long-lived clients for the serving path. They are opened once in the app lifespan so that
+# every request reuses the same connection pools (and keep-alive connections) instead of building a
+# new client per call. The openai package is imported when the first OpenAI client is built.
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+_async_openai_client: Optional["AsyncOpenAI"] = None
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_openai_client() -> "AsyncOpenAI":
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI(http_client=httpx.AsyncClient(timeout=httpx.Timeout(600.0, connect=5.0), limits=HTTP_LIMITS))
+    return _async_openai_client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, follow_redirects=True)
+    return _http_client
+
+
+async def open_clients() -> None:
+    """
+    Create the shared clients (called at app startup).
+    """
+    get_async_openai_client()
+    get_http_client()
+
+
+async def close_clients() -> None:
+    """
+    Close the shared clients and their connection pools (called at app shutdown).
+    """
+    global _async_openai_client, _http_client
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+        _async_openai_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
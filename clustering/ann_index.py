@@ -0,0 +1,217 @@
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+
+# k-means is trained on at most this many points per list, which is plenty for the coarse quantizer
+TRAINING_POINTS_PER_LIST = 64
+# Rows assigned to centroids per matrix product when training/adding
+ASSIGN_TILE_SIZE = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Return the index of the most similar centroid for every (normalized) vector, in bounded tiles.
+    """
+    return np.concatenate([
+        np.argmax(vectors[start:start + ASSIGN_TILE_SIZE] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), ASSIGN_TILE_SIZE)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Cluster unit vectors with cosine-similarity k-means.
+
+    Args:
+        vectors (np.ndarray): Normalized float32 vectors.
+        n_clusters (int): Number of centroids.
+        n_iter (int): Number of Lloyd iterations.
+        seed (int): Random seed for the initialization.
+
+    Returns:
+        np.ndarray: (n_clusters, dim) unit-norm centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _assign(vectors, centroids)
+        # Sum the members of each cluster one dimension at a time (much faster than an np.add.at scatter)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.stack([
+            np.bincount(assignments, weights=vectors[:, dim], minlength=n_clusters)
+            for dim in range(vectors.shape[1])
+        ], axis=1).astype(np.float32)
+        # Re-seed empty clusters on random points so every list stays usable
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over cosine similarity, with a spherical k-means coarse quantizer.
+
+    Vectors are stored normalized, in insertion order, so that row ids match the rows of the matrix
+    the index was built from. A search only scores the rows of the `n_probe` lists whose centroids are
+    closest to the query, and widens the probe when the exclusion mask leaves fewer than k candidates.
+    """
+
+    def __init__(self, dim: int, n_lists: int, n_probe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids = None
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int64)
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: Optional[int] = None, n_probe: int = 8, n_iter: int = 10, seed: int = 0) -> "IVFIndex":
+        """
+        Train the coarse quantizer on `vectors` and add them to a new index.
+
+        Args:
+            vectors (np.ndarray): (n_rows, dim) embeddings.
+            n_lists (int): Number of inverted lists. Defaults to ~4 * sqrt(n_rows).
+            n_probe (int): Default number of lists scored per query.
+            n_iter (int): k-means iterations.
+            seed (int): Random seed.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        matrix = _normalize(vectors)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(len(matrix)))
+        n_lists = max(1, min(n_lists, len(matrix)))
+
+        index = cls(matrix.shape[1], n_lists, n_probe=n_probe, seed=seed)
+        index.train(matrix, n_iter=n_iter)
+        index.add(matrix)
+        return index
+
+    def train(self, vectors: np.ndarray, n_iter: int = 10) -> None:
+        matrix = _normalize(vectors)
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(matrix), self.n_lists * TRAINING_POINTS_PER_LIST)
+        sample = matrix[rng.choice(len(matrix), size=sample_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, self.n_lists, n_iter=n_iter, seed=self.seed)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Add vectors to the index.
+
+        Returns:
+            np.ndarray: The row ids given to the new vectors.
+        """
+        if self.centroids is None:
+            raise ValueError("The index must be trained before adding vectors.")
+        matrix = _normalize(vectors)
+        start = len(self.vectors)
+        assignments = _assign(matrix, self.centroids)
+
+        self.vectors = np.concatenate([self.vectors, matrix])
+        self.assignments = np.concatenate([self.assignments, assignments])
+        self._rebuild_lists()
+        return np.arange(start, len(self.vectors))
+
+    def _rebuild_lists(self) -> None:
+        # A stable sort keeps every inverted list in row-id order
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self._lists = [order[bounds[list_id]:bounds[list_id + 1]] for list_id in range(self.n_lists)]
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def _search_one(self, query: np.ndarray, centroid_sims: np.ndarray, k: int, exclude_mask: Optional[np.ndarray], n_probe: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Only the first probe needs the closest lists; the full ordering is computed if the probe has to widen
+        if n_probe < self.n_lists:
+            first = np.argpartition(-centroid_sims, n_probe - 1)[:n_probe]
+            centroid_order = first[np.argsort(-centroid_sims[first])]
+        else:
+            centroid_order = np.argsort(-centroid_sims)
+        probed = 0
+        candidates = np.empty(0, dtype=np.int64)
+        while True:
+            if probed + n_probe > len(centroid_order) and len(centroid_order) < self.n_lists:
+                centroid_order = np.argsort(-centroid_sims)
+            # Probe the next batch of lists, doubling until enough non-excluded candidates are found
+            batch = centroid_order[probed:probed + n_probe]
+            probed += len(batch)
+            new = np.concatenate([self._lists[list_id] for list_id in batch]) if len(batch) else np.empty(0, dtype=np.int64)
+            if exclude_mask is not None and len(new):
+                new = new[~exclude_mask[new]]
+            candidates = np.concatenate([candidates, new])
+            if len(candidates) >= k or probed >= self.n_lists:
+                break
+            n_probe *= 2
+
+        sims = self.vectors[candidates] @ query
+        if len(candidates) > k:
+            top = np.argpartition(-sims, k - 1)[:k]
+            candidates, sims = candidates[top], sims[top]
+        order = np.lexsort((candidates, -sims))
+        return candidates[order], sims[order]
+
+    def search(self, queries: np.ndarray, k: int, exclude_mask: Optional[np.ndarray] = None, n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar stored vectors for each query.
+
+        Args:
+            queries (np.ndarray): (dim,) or (n_queries, dim) query vectors.
+            k (int): Number of neighbours to return.
+            exclude_mask (np.ndarray): Boolean mask over row ids; True rows are never returned (e.g. already grouped rows).
+            n_probe (int): Lists scored per query. Defaults to the index setting.
+
+        Returns:
+            tuple: (ids, similarities), each (n_queries, k) and sorted by decreasing similarity.
+                Rows are padded with -1 / -inf when fewer than k vectors are available.
+        """
+        query_matrix = _normalize(queries)
+        n_probe = n_probe or self.n_probe
+        k = max(k, 0)
+        ids = np.full((len(query_matrix), k), -1, dtype=np.int64)
+        sims = np.full((len(query_matrix), k), -np.inf, dtype=np.float32)
+        if k <= 0 or len(self.vectors) == 0:
+            return ids, sims
+
+        n_probe = min(n_probe, self.n_lists)
+        all_centroid_sims = query_matrix @ self.centroids.T
+        for row, (query, centroid_sims) in enumerate(zip(query_matrix, all_centroid_sims)):
+            found_ids, found_sims = self._search_one(query, centroid_sims, k, exclude_mask, n_probe)
+            ids[row, :len(found_ids)] = found_ids
+            sims[row, :len(found_sims)] = found_sims
+        return ids, sims
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to a single .npz file.
+        """
+        params = {"dim": self.dim, "n_lists": self.n_lists, "n_probe": self.n_probe, "seed": self.seed}
+        with open(path, "wb") as f:
+            np.savez(f, params=np.array(json.dumps(params)), centroids=self.centroids, vectors=self.vectors, assignments=self.assignments)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            params = json.loads(str(data["params"]))
+            index = cls(params["dim"], params["n_lists"], n_probe=params["n_probe"], seed=params["seed"])
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.assignments = data["assignments"]
+        index._rebuild_lists()
+        return index
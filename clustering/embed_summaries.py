@@ -0,0 +1,50 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from embeddings import EMBEDDING_MODEL, embed_texts
+
+# Default paths, mirroring the ones used by the clustering notebook
+INPUT_CSV_PATH = "data/relevant_news_articles_with_feedback_and_summary.csv"
+OUTPUT_CSV_PATH = "data/data_with_embeddings.csv"
+
+# Weights of the dimension scores in 'overall_score', as computed by the clustering notebook
+# (originality counts twice and quality is left out; kept so the existing groups stay reproducible)
+OVERALL_SCORE_WEIGHTS = {
+    "originality-value-purpose": 2,
+    "relevance-audiance-impact": 1,
+    "up-to-date": 1,
+    "clarity-engagement-structure": 1,
+    "trust-accuracy-expertise": 1,
+}
+
+
+def overall_score(df: pd.DataFrame) -> pd.Series:
+    return sum(weight * df[f"score/{dimension}"] for dimension, weight in OVERALL_SCORE_WEIGHTS.items())
+
+
+def embed_summaries(input_path: str = INPUT_CSV_PATH, output_path: str = OUTPUT_CSV_PATH, model: str = EMBEDDING_MODEL) -> None:
+    """
+    Prepare the clustering input from the summarized articles: drop duplicates by (title, source), compute
+    'overall_score' and add the 'embedding' of every summary (batched, only new summaries reach the API).
+    """
+    df = pd.read_csv(input_path)
+    df = df.drop_duplicates(subset=['title', 'source'])
+    df['overall_score'] = overall_score(df)
+    df['embedding'] = [json.dumps(embedding.tolist()) for embedding in embed_texts(df['ev_summary'].tolist(), model=model)]
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    df.to_csv(output_path, index=False)
+    print(f"Saved {len(df)} embedded articles to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed the article summaries for the clustering step.")
+    parser.add_argument("--input", default=INPUT_CSV_PATH)
+    parser.add_argument("--output", default=OUTPUT_CSV_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    args = parser.parse_args()
+    embed_summaries(args.input, args.output, args.model)
@@ -0,0 +1,318 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from clustering.ann_index import IVFIndex
+from embedding_store import has_sidecar, load_embedding_table, parse_embedding_column, save_embedding_table
+
+# Default paths, mirroring the ones used by the clustering notebook
+INPUT_CSV_PATH = "data/data_with_embeddings.csv"
+OUTPUT_CSV_PATH = "data/df_with_embedding_and_sorted_groups.csv"
+
+# Rows (seeds) and columns scored per matrix product. A tile holds at most
+# SEED_TILE_SIZE x (COLUMN_TILE_SIZE + candidate pool) float32 similarities.
+SEED_TILE_SIZE = 256
+COLUMN_TILE_SIZE = 4096
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the embeddings once so that cosine similarity becomes a plain dot product.
+
+    Args:
+        embeddings (np.ndarray): (n_rows, dim) matrix.
+
+    Returns:
+        np.ndarray: Contiguous float32 matrix with unit-norm rows (zero rows are left at zero).
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _rank_by_similarity(indices: np.ndarray, similarities: np.ndarray) -> np.ndarray:
+    """
+    Order indices by decreasing similarity, breaking ties by row index like the notebook's stable sort.
+    """
+    order = np.lexsort((indices, -similarities))
+    return indices[order]
+
+
+def _top_candidates(matrix: np.ndarray, seeds: np.ndarray, pool_size: int, column_tile_size: int) -> Dict[int, np.ndarray]:
+    """
+    Compute the `pool_size` most similar rows for each seed using blocked matrix products.
+
+    The seeds are scored against the whole matrix one column tile at a time, keeping only a running
+    top-`pool_size` per seed, so memory stays bounded by len(seeds) x (pool_size + column_tile_size).
+
+    Args:
+        matrix (np.ndarray): Normalized float32 embeddings.
+        seeds (np.ndarray): Row indices to compute neighbours for.
+        pool_size (int): Number of neighbours to keep per seed.
+        column_tile_size (int): Number of columns scored per matrix product.
+
+    Returns:
+        dict: Seed index -> neighbour indices sorted by decreasing similarity (seed itself excluded).
+    """
+    n_rows = len(matrix)
+    seed_vectors = matrix[seeds]
+    best_idx = np.empty((len(seeds), 0), dtype=np.int64)
+    best_sim = np.empty((len(seeds), 0), dtype=np.float32)
+
+    for start in range(0, n_rows, column_tile_size):
+        stop = min(start + column_tile_size, n_rows)
+        sims = seed_vectors @ matrix[start:stop].T
+        cols = np.broadcast_to(np.arange(start, stop), sims.shape)
+        # Never propose a seed as its own neighbour
+        sims = np.where(cols == seeds[:, None], -np.inf, sims)
+
+        cand_sim = np.concatenate([best_sim, sims], axis=1)
+        cand_idx = np.concatenate([best_idx, cols], axis=1)
+        if cand_sim.shape[1] > pool_size:
+            part = np.argpartition(-cand_sim, pool_size - 1, axis=1)[:, :pool_size]
+            cand_sim = np.take_along_axis(cand_sim, part, axis=1)
+            cand_idx = np.take_along_axis(cand_idx, part, axis=1)
+        best_sim, best_idx = cand_sim, cand_idx
+
+    candidates = {}
+    for row, seed in enumerate(seeds):
+        keep = np.isfinite(best_sim[row])
+        candidates[int(seed)] = _rank_by_similarity(best_idx[row][keep], best_sim[row][keep])
+    return candidates
+
+
+def _exact_neighbours(matrix: np.ndarray, seed_idx: int, used_mask: np.ndarray, k: int, column_tile_size: int) -> List[int]:
+    """
+    Exhaustively find the k most similar unused rows to the seed (fallback when the candidate pool is exhausted).
+    """
+    available = np.flatnonzero(~used_mask)
+    available = available[available != seed_idx]
+    if len(available) < k:
+        return []
+    sims = np.concatenate([
+        matrix[available[start:start + column_tile_size]] @ matrix[seed_idx]
+        for start in range(0, len(available), column_tile_size)
+    ])
+    if len(available) > k:
+        part = np.argpartition(-sims, k - 1)[:k]
+        # Include every row tied with the k-th similarity so index tie-breaking stays deterministic
+        threshold = sims[part].min()
+        part = np.flatnonzero(sims >= threshold)
+        available, sims = available[part], sims[part]
+    return [int(idx) for idx in _rank_by_similarity(available, sims)[:k]]
+
+
+def form_groups_with_disjoint_nn(embeddings: np.ndarray,
+                                 num_groups: int = 3,
+                                 group_size: int = 5,
+                                 pool_size: Optional[int] = None,
+                                 seed_tile_size: int = SEED_TILE_SIZE,
+                                 column_tile_size: int = COLUMN_TILE_SIZE,
+                                 index: Optional[IVFIndex] = None) -> List[List[int]]:
+    """
+    Form disjoint groups ensuring all nearest neighbors of the seed are unused.
+
+    Same semantics as the notebook implementation: seeds are taken in row order (first unused row first),
+    each group is the seed plus its `group_size - 1` nearest unused rows by cosine distance, and grouping stops
+    once `num_groups` groups are formed or not enough unused rows remain.
+
+    Args:
+        embeddings (np.ndarray): (n_rows, dim) embedding matrix, in seed order.
+        num_groups (int): Maximum number of groups to form.
+        group_size (int): Number of rows per group (seed included).
+        pool_size (int): Neighbours precomputed per seed. Defaults to a small multiple of the group size.
+        seed_tile_size (int): Number of upcoming seeds scored per blocked product.
+        column_tile_size (int): Number of columns scored per blocked product.
+        index (IVFIndex): Approximate index built over the same rows. When given, neighbours are searched in
+            the index (with the used rows excluded) instead of exhaustively, trading exactness for speed at corpus scale.
+
+    Returns:
+        list: Groups as lists of row indices, seed first.
+    """
+    matrix = normalize_embeddings(embeddings)
+    n_rows = len(matrix)
+    k = group_size - 1
+    if n_rows == 0 or k < 0:
+        return []
+    if pool_size is None:
+        pool_size = max(4 * k, 32)
+    pool_size = max(1, min(pool_size, n_rows - 1))
+
+    used_mask = np.zeros(n_rows, dtype=bool)
+    candidates = {}
+    groups = []
+    cursor = 0
+
+    for _ in range(num_groups):
+        # Step 1: Find the first unused seed text
+        while cursor < n_rows and used_mask[cursor]:
+            cursor += 1
+        if cursor >= n_rows or n_rows - used_mask.sum() - 1 < k:
+            break  # No more valid groups can be formed
+        seed_idx = cursor
+
+        if index is not None:
+            # Approximate path: search the index with the grouped rows and the seed itself excluded
+            used_mask[seed_idx] = True
+            found, _ = index.search(matrix[seed_idx], k, exclude_mask=used_mask)
+            used_mask[seed_idx] = False
+            neighbours = [int(idx) for idx in found[0] if idx >= 0]
+        else:
+            # Step 2: Precompute candidates for the next tile of unused seeds if needed
+            if seed_idx not in candidates:
+                upcoming = np.flatnonzero(~used_mask[seed_idx:])[:seed_tile_size] + seed_idx
+                candidates = _top_candidates(matrix, upcoming, pool_size, column_tile_size)
+
+            # Step 3: Keep the closest unused neighbours, falling back to an exact scan if the pool ran dry
+            pool = candidates.pop(seed_idx)
+            neighbours = [int(idx) for idx in pool[~used_mask[pool]][:k]]
+            if len(neighbours) < k:
+                neighbours = _exact_neighbours(matrix, seed_idx, used_mask, k, column_tile_size)
+        if len(neighbours) < k:
+            break
+
+        # Step 4: Mark group members as used and add to groups
+        valid_group = [int(seed_idx)] + neighbours
+        used_mask[valid_group] = True
+        groups.append(valid_group)
+
+    return groups
+
+
+def calculate_group_std(group: List[int], embeddings: np.ndarray) -> float:
+    """
+    Calculate the standard deviation of embeddings for a given group.
+
+    Args:
+        group (list): List of indices in the group.
+        embeddings (np.ndarray): Embedding matrix.
+
+    Returns:
+        float: Mean over dimensions of the per-dimension standard deviation.
+    """
+    return float(np.std(embeddings[group], axis=0).mean())
+
+
+def sort_groups_by_std(groups: List[List[int]], embeddings: np.ndarray) -> List[List[int]]:
+    """
+    Reorder groups by ascending embedding standard deviation (most coherent groups first).
+    """
+    group_std_devs = [(i, calculate_group_std(group, embeddings)) for i, group in enumerate(groups)]
+    sorted_groups = sorted(group_std_devs, key=lambda x: x[1])
+    return [groups[i] for i, _ in sorted_groups]
+
+
+def assign_groups(df: pd.DataFrame, groups: List[List[int]]) -> pd.DataFrame:
+    """
+    Write the 'group' column: group number for grouped rows, NaN for the others.
+
+    Args:
+        df (pd.DataFrame): DataFrame with a default RangeIndex matching the group indices.
+        groups (list): Groups as returned by `sort_groups_by_std`.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the 'group' column set.
+    """
+    index_to_group = {}
+    for group_num, indices in enumerate(groups):
+        for index in indices:
+            index_to_group[index] = group_num
+
+    df['group'] = df.index.map(index_to_group).astype(float)
+    return df
+
+
+def group_articles(df: pd.DataFrame,
+                   embeddings: Optional[np.ndarray] = None,
+                   num_groups: int = 10,
+                   group_size: int = 3,
+                   sort_by: Optional[str] = 'overall_score',
+                   use_ann: bool = False,
+                   n_probe: int = 8) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Run the notebook's grouping step on a table of articles.
+
+    Args:
+        df (pd.DataFrame): Articles, with an 'embedding' column unless `embeddings` is given.
+        embeddings (np.ndarray): Matrix aligned with `df` rows (e.g. memory-mapped from the embedding store).
+        num_groups (int): Maximum number of groups to form.
+        group_size (int): Number of articles per group.
+        sort_by (str): Column defining the seed order (ascending), or None to keep the current order.
+        use_ann (bool): Search neighbours in an IVF index instead of exhaustively (for large corpora).
+        n_probe (int): Lists scored per query by the IVF index.
+
+    Returns:
+        tuple: (re-indexed DataFrame with the 'group' column set, embeddings in the same row order).
+    """
+    df = df.reset_index(drop=True)
+    if embeddings is None:
+        embeddings = parse_embedding_column(df['embedding'])
+    if sort_by is not None and sort_by in df.columns:
+        df = df.sort_values(by=sort_by)
+        embeddings = embeddings[df.index.to_numpy()]
+    df = df.reset_index(drop=True)
+
+    index = IVFIndex.build(embeddings, n_probe=n_probe) if use_ann else None
+    groups = form_groups_with_disjoint_nn(embeddings, num_groups=num_groups, group_size=group_size, index=index)
+    print(f"Formed {len(groups)} groups of {group_size} articles")
+    return assign_groups(df, sort_groups_by_std(groups, embeddings)), embeddings
+
+
+def cluster_file(input_path: str = INPUT_CSV_PATH,
+                 output_path: str = OUTPUT_CSV_PATH,
+                 num_groups: int = 10,
+                 group_size: int = 3,
+                 sort_by: Optional[str] = 'overall_score',
+                 use_ann: bool = False,
+                 n_probe: int = 8,
+                 binary_embeddings: bool = False) -> None:
+    """
+    Group the articles of `input_path` and write them with their 'group' column to `output_path`.
+
+    Embeddings are written to a binary sidecar if `binary_embeddings` is set or the input has one, and back
+    into an 'embedding' column otherwise. See `group_articles` for the other arguments.
+    """
+    df, embeddings = load_embedding_table(input_path)
+    # Drop the unnamed index column left behind by earlier `to_csv` calls
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+    if 'group' in df.columns:
+        df = df.drop(columns='group')
+
+    df, embeddings = group_articles(df, embeddings, num_groups=num_groups, group_size=group_size,
+                                   sort_by=sort_by, use_ann=use_ann, n_probe=n_probe)
+    if binary_embeddings or has_sidecar(input_path):
+        save_embedding_table(df, output_path, embeddings)
+    else:
+        # Keep the legacy layout: the group column stays last, after the stringified embeddings
+        df.insert(len(df.columns) - 1, 'embedding', [json.dumps(row.tolist()) for row in embeddings])
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        df.to_csv(output_path, index=False)
+    print(f"Saved grouped articles to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group articles with the greedy disjoint-KNN clustering.")
+    parser.add_argument("--input", default=INPUT_CSV_PATH, help="CSV with an 'embedding' column or a binary embedding sidecar.")
+    parser.add_argument("--output", default=OUTPUT_CSV_PATH, help="Where to write the CSV with the 'group' column.")
+    parser.add_argument("--num-groups", type=int, default=10)
+    parser.add_argument("--group-size", type=int, default=3)
+    parser.add_argument("--sort-by", default="overall_score", help="Column defining the seed order (ascending).")
+    parser.add_argument("--ann", action="store_true", help="Use the approximate IVF index instead of exact search.")
+    parser.add_argument("--n-probe", type=int, default=8, help="Lists scored per query when --ann is set.")
+    parser.add_argument("--binary-embeddings", action="store_true",
+                        help="Write embeddings to a binary sidecar instead of an 'embedding' column (default when the input has one).")
+    args = parser.parse_args()
+
+    cluster_file(args.input, args.output, num_groups=args.num_groups, group_size=args.group_size, sort_by=args.sort_by,
+                 use_ann=args.ann, n_probe=args.n_probe, binary_embeddings=args.binary_embeddings)
+
+
+if __name__ == "__main__":
+    main()
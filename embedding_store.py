@@ -0,0 +1,231 @@
+import sys
+sys.path.append("./")
+import argparse
+import json
+import os
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Sidecar files written next to a metadata CSV `foo.csv`:
+#   foo.embeddings.npy  -> (n_rows, dim) float32 matrix, memory-mappable with np.load(mmap_mode='r')
+#   foo.embeddings.json -> index with the matrix shape and the url of every row
+EMBEDDING_COLUMN = "embedding"
+ID_COLUMN = "url"
+MATRIX_SUFFIX = ".embeddings.npy"
+INDEX_SUFFIX = ".embeddings.json"
+FORMAT_VERSION = 1
+
+
+def parse_embedding_column(embeddings: pd.Series) -> np.ndarray:
+    """
+    Convert an 'embedding' column into a dense float32 matrix.
+
+    Args:
+        embeddings (pd.Series): Column holding either stringified lists (as read back from CSV) or lists.
+
+    Returns:
+        np.ndarray: (n_rows, dim) float32 matrix.
+    """
+    rows = [json.loads(value) if isinstance(value, str) else value for value in embeddings]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def sidecar_paths(csv_path: str) -> Tuple[str, str]:
+    """
+    Return the (matrix, index) sidecar paths belonging to a metadata CSV.
+    """
+    stem, _ = os.path.splitext(csv_path)
+    return stem + MATRIX_SUFFIX, stem + INDEX_SUFFIX
+
+
+def has_sidecar(csv_path: str) -> bool:
+    matrix_path, index_path = sidecar_paths(csv_path)
+    return os.path.exists(matrix_path) and os.path.exists(index_path)
+
+
+class EmbeddingStore:
+    """
+    Read-only view over a float32 embedding matrix and its row-id/url index.
+
+    The matrix is memory-mapped by default, so opening the store costs a few page faults rather than
+    parsing every float: rows are only read from disk when they are actually used.
+    """
+
+    def __init__(self, matrix: np.ndarray, ids: List[str]):
+        if len(ids) != len(matrix):
+            raise ValueError(f"Index has {len(ids)} ids but the matrix has {len(matrix)} rows.")
+        self.matrix = matrix
+        self.ids = ids
+        self._row_of = {row_id: row for row, row_id in enumerate(ids)}
+
+    @classmethod
+    def open(cls, csv_path: str, mmap: bool = True) -> "EmbeddingStore":
+        """
+        Open the sidecar of a metadata CSV.
+
+        Args:
+            csv_path (str): Path of the metadata CSV the sidecar belongs to.
+            mmap (bool): Memory-map the matrix instead of reading it into memory.
+
+        Returns:
+            EmbeddingStore: The opened store.
+        """
+        matrix_path, index_path = sidecar_paths(csv_path)
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store version in {index_path}: {index.get('format_version')}")
+
+        matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        if list(matrix.shape) != index["shape"] or matrix.dtype != np.float32:
+            raise ValueError(f"{matrix_path} does not match its index {index_path}.")
+        return cls(matrix, index["ids"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def row_of(self, row_id: str) -> int:
+        return self._row_of[row_id]
+
+    def get(self, row_ids: Iterable[str]) -> np.ndarray:
+        """
+        Gather the embeddings of the given ids (copies only the requested rows).
+        """
+        return self.matrix[[self._row_of[row_id] for row_id in row_ids]]
+
+
+def write_sidecar(csv_path: str, embeddings: np.ndarray, ids: List[str]) -> None:
+    """
+    Write the embedding matrix and its index next to a metadata CSV.
+
+    The files are written to temporary names and renamed, so readers never see a half-written store.
+
+    Args:
+        csv_path (str): Path of the metadata CSV the sidecar belongs to.
+        embeddings (np.ndarray): (n_rows, dim) matrix aligned with the CSV rows.
+        ids (list): Row ids (urls) aligned with the CSV rows.
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(ids):
+        raise ValueError(f"Expected a 2D matrix with {len(ids)} rows, got shape {matrix.shape}.")
+
+    matrix_path, index_path = sidecar_paths(csv_path)
+    tmp_matrix_path = matrix_path + ".tmp"
+    # np.save appends '.npy' to paths not ending with it, so write through a file object
+    with open(tmp_matrix_path, "wb") as f:
+        np.save(f, matrix)
+    tmp_index_path = index_path + ".tmp"
+    with open(tmp_index_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "dtype": "float32",
+            "shape": list(matrix.shape),
+            "id_column": ID_COLUMN,
+            "ids": [str(row_id) for row_id in ids],
+        }, f)
+    os.replace(tmp_matrix_path, matrix_path)
+    os.replace(tmp_index_path, index_path)
+
+
+def save_embedding_table(df: pd.DataFrame, csv_path: str, embeddings: Optional[np.ndarray] = None) -> None:
+    """
+    Save a DataFrame as a metadata CSV (without the embedding column) plus its binary sidecar.
+
+    Args:
+        df (pd.DataFrame): Articles, with an 'embedding' column unless `embeddings` is given.
+        csv_path (str): Where to write the metadata CSV.
+        embeddings (np.ndarray): Matrix aligned with `df` rows. Parsed from the 'embedding' column if None.
+    """
+    if embeddings is None:
+        embeddings = parse_embedding_column(df[EMBEDDING_COLUMN])
+
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    write_sidecar(csv_path, embeddings, df[ID_COLUMN].tolist())
+    df.drop(columns=[EMBEDDING_COLUMN], errors="ignore").to_csv(csv_path, index=False)
+
+
+def read_metadata(csv_path: str, columns: Optional[Union[List[str], Callable[[str], bool]]] = None) -> pd.DataFrame:
+    """
+    Read the tabular part of an article CSV without parsing the embedding column.
+
+    Works with both converted CSVs and legacy CSVs that still embed stringified vectors.
+
+    Args:
+        csv_path (str): Path of the CSV.
+        columns (list or callable): Columns to keep, or a predicate on column names. Defaults to every column except 'embedding'.
+
+    Returns:
+        pd.DataFrame: The requested columns.
+    """
+    if columns is None:
+        return pd.read_csv(csv_path, usecols=lambda column: column != EMBEDDING_COLUMN)
+    return pd.read_csv(csv_path, usecols=columns)
+
+
+def load_embedding_table(csv_path: str, columns: Optional[List[str]] = None, mmap: bool = True) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Load article metadata and the aligned embedding matrix.
+
+    Uses the memory-mapped sidecar when present and falls back to parsing the legacy 'embedding' column.
+
+    Args:
+        csv_path (str): Path of the metadata CSV.
+        columns (list): Metadata columns to keep. Defaults to every column except 'embedding'.
+        mmap (bool): Memory-map the sidecar matrix.
+
+    Returns:
+        tuple: (metadata DataFrame, (n_rows, dim) float32 matrix aligned with its rows).
+    """
+    if has_sidecar(csv_path):
+        df = read_metadata(csv_path, columns)
+        store = EmbeddingStore.open(csv_path, mmap=mmap)
+        if len(store) != len(df):
+            raise ValueError(f"{csv_path} has {len(df)} rows but its embedding sidecar has {len(store)}.")
+        return df, store.matrix
+
+    df = pd.read_csv(csv_path)
+    embeddings = parse_embedding_column(df[EMBEDDING_COLUMN])
+    df = df.drop(columns=[EMBEDDING_COLUMN])
+    if columns is not None:
+        df = df[columns]
+    return df, embeddings
+
+
+def convert_csv(csv_path: str, output_path: Optional[str] = None) -> str:
+    """
+    Convert a CSV holding stringified embeddings into a metadata CSV plus binary sidecar.
+
+    Args:
+        csv_path (str): Legacy CSV with an 'embedding' column.
+        output_path (str): Where to write the metadata CSV. Defaults to rewriting `csv_path` in place.
+
+    Returns:
+        str: Path of the written metadata CSV.
+    """
+    output_path = output_path or csv_path
+    df = pd.read_csv(csv_path)
+    if EMBEDDING_COLUMN not in df.columns:
+        raise ValueError(f"{csv_path} has no '{EMBEDDING_COLUMN}' column to convert.")
+    # Drop the unnamed index column left behind by earlier `to_csv` calls
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+
+    save_embedding_table(df, output_path)
+    print(f"Converted {csv_path} -> {output_path} + {sidecar_paths(output_path)[0]} ({len(df)} rows)")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move stringified embeddings out of article CSVs into binary sidecars.")
+    parser.add_argument("csv_paths", nargs="+", help="CSVs with an 'embedding' column.")
+    parser.add_argument("--output-dir", default=None, help="Write converted files here instead of in place.")
+    args = parser.parse_args()
+
+    for path in args.csv_paths:
+        output = os.path.join(args.output_dir, os.path.basename(path)) if args.output_dir else None
+        convert_csv(path, output)
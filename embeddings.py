@@ -0,0 +1,201 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rate_limiter import AsyncRateLimiter, get_rate_limiter
+from sqlite_cache import CACHE_DIR, hash_key
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Bounds of one embeddings request: number of inputs and estimated tokens (the API allows 2048 inputs and
+# 300k tokens per request; smaller batches keep several requests in flight)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 128))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", 50_000))
+# Inputs longer than this many estimated tokens are truncated (the models accept 8191)
+MAX_INPUT_TOKENS = 8000
+
+
+def prepare_text(text: str) -> str:
+    """
+    Text sent to the embedding model: newlines replaced by spaces, as in the clustering notebook, and
+    truncated to MAX_INPUT_TOKENS.
+    """
+    return str(text).replace("\n", " ")[:MAX_INPUT_TOKENS * 4]
+
+
+def estimate_text_tokens(text: str) -> int:
+    # About 4 characters per token, like rate_limiter.estimate_tokens
+    return len(text) // 4 + 1
+
+
+def make_batches(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE, batch_tokens: int = EMBEDDING_BATCH_TOKENS) -> List[List[int]]:
+    """
+    Split the texts, in order, into batches of at most `batch_size` texts and `batch_tokens` estimated tokens.
+
+    Returns:
+        list: Batches as lists of text indices.
+    """
+    batches, current, current_tokens = [], [], 0
+    for index, text in enumerate(texts):
+        tokens = estimate_text_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of embedding vectors keyed by model and text hash, stored as float32 BLOBs in SQLite.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "embeddings.sqlite")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hash_key(model, text)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            # Chunked to stay below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                rows = self._conn.execute(f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def set_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, model, vector) VALUES (?, ?, ?)",
+                [(key, model, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def response_vectors(response: Any) -> List[np.ndarray]:
+    """
+    Vectors of an embeddings response in input order (OpenAI objects or litellm dicts).
+    """
+    items = [item if isinstance(item, dict) else item.model_dump() for item in response.data]
+    return [np.asarray(item["embedding"], dtype=np.float32) for item in sorted(items, key=lambda item: item["index"])]
+
+
+async def aembed_texts(texts: List[str],
+                       model: str = EMBEDDING_MODEL,
+                       embedding_fn: Optional[Callable[..., Awaitable[Any]]] = None,
+                       rate_limiter: Optional[AsyncRateLimiter] = None,
+                       cache: Optional[EmbeddingCache] = None,
+                       batch_size: int = EMBEDDING_BATCH_SIZE,
+                       batch_tokens: int = EMBEDDING_BATCH_TOKENS) -> np.ndarray:
+    """
+    Embed texts in batches sent concurrently, reusing the cached vectors of texts embedded before.
+
+    Args:
+        texts (list): Texts to embed (duplicates are embedded once).
+        model (str): Embedding model.
+        embedding_fn (callable): Async function (input=[...]) -> embeddings response, with `model` already bound.
+            Defaults to the OpenAI embeddings API; get_completion_litellm_for_burda("text-embedding-ada-002") also fits.
+        rate_limiter (AsyncRateLimiter): Limiter the requests go through. Defaults to the shared limiter of the model.
+        cache (EmbeddingCache): Vector cache. Defaults to the shared cache in CACHE_DIR.
+        batch_size (int): Maximum number of texts per request.
+        batch_tokens (int): Maximum number of estimated tokens per request.
+
+    Returns:
+        np.ndarray: (len(texts), dim) float32 matrix, row i being the embedding of texts[i].
+    """
+    cache = cache if cache is not None else get_embedding_cache()
+    prepared = [prepare_text(text) for text in texts]
+    keys = [cache.key(model, text) for text in prepared]
+    vectors = cache.get_many(list(dict.fromkeys(keys)))
+
+    # Step 1: Batch the texts missing from the cache
+    missing = {key: text for key, text in zip(keys, prepared) if key not in vectors}
+    missing_keys, missing_texts = list(missing.keys()), list(missing.values())
+    batches = make_batches(missing_texts, batch_size=batch_size, batch_tokens=batch_tokens)
+
+    # Step 2: Send the batches concurrently through the rate limiter
+    if batches:
+        client = None
+        if embedding_fn is None:
+            from openai import AsyncOpenAI  # Imported on first use, like the other API clients
+            client = AsyncOpenAI(max_retries=0)  # The rate limiter retries 429s and transient errors
+            embedding_fn = partial(client.embeddings.create, model=model)
+        limiter = rate_limiter or get_rate_limiter(model)
+
+        async def embed_batch(batch: List[int]) -> None:
+            inputs = [missing_texts[index] for index in batch]
+            response = await limiter.run(embedding_fn, input=inputs,
+                                         estimated_tokens=sum(estimate_text_tokens(text) for text in inputs))
+            new_vectors = dict(zip((missing_keys[index] for index in batch), response_vectors(response)))
+            await asyncio.to_thread(cache.set_many, model, new_vectors)
+            vectors.update(new_vectors)
+
+        try:
+            await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        finally:
+            if client is not None:
+                await client.close()
+    print(f"Embeddings: {len(texts)} texts, {len(texts) - len(missing_keys)} from cache, {len(missing_keys)} embedded in {len(batches)} requests")
+
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+
+def embed_texts(texts: List[str], model: str = EMBEDDING_MODEL, **kwargs) -> np.ndarray:
+    """
+    Synchronous aembed_texts.
+    """
+    return asyncio.run(aembed_texts(texts, model=model, **kwargs))
+
+
+def embed_articles(articles: List[Dict[str, Any]], text_key: str, id_key: str = "url",
+                   model: str = EMBEDDING_MODEL, **kwargs) -> Tuple[List[Any], np.ndarray]:
+    """
+    Embed one text field of the articles.
+
+    Returns:
+        tuple: (article ids, (n, dim) float32 matrix whose row i belongs to ids[i]).
+    """
+    ids = [article[id_key] for article in articles]
+    return ids, embed_texts([article[text_key] for article in articles], model=model, **kwargs)
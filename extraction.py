@@ -0,0 +1,273 @@
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+from pydantic import BaseModel
+
+# Pages whose fast-path extraction is less confident than this are parsed again with newspaper3k
+MIN_CONFIDENCE = float(os.getenv("EXTRACTION_MIN_CONFIDENCE", 0.5))
+# Length (in characters) from which an extracted text counts as a full article
+FULL_ARTICLE_CHARS = 1000
+# Paragraphs shorter than this are ignored when scoring the content containers
+MIN_PARAGRAPH_CHARS = 25
+
+# Elements that never hold the article text
+JUNK_TAGS = ("script", "style", "noscript", "nav", "footer", "header", "aside", "form", "iframe", "svg", "button", "select")
+# Class or id tokens that mark a container as page furniture rather than content. Whole tokens only:
+# "comments" is junk, but "comments-enabled", "has-ad-slots" or "related-content" are not
+JUNK_ATTRIBUTES = re.compile(
+    r"comments?|comment-(?:list|section|area|form|thread)s?|disqus_thread|sidebar|side-bar|footer|site-footer|"
+    r"menu|main-menu|nav|navigation|share|sharing|share-(?:bar|buttons|tools|links)|social|social-(?:share|links|buttons|icons)|"
+    r"related|related-(?:articles|links|posts|stories)|promo|promos|advert|advertisement|ad|ads|ad-(?:slot|container|wrapper|banner|unit)|"
+    r"cookie|cookies|cookie-(?:banner|notice|consent)|newsletter|newsletter-(?:signup|box)|subscribe|subscription|"
+    r"banner|popup|modal|breadcrumbs?",
+    re.IGNORECASE,
+)
+# A container holding more than this share of the page's paragraph text is never dropped as junk
+MAX_JUNK_TEXT_SHARE = 0.5
+# Teasers are short blocks opening with a link (a linked headline); a container mostly made of them is a listing
+TEASER_MAX_CHARS = 400
+MAX_TEASER_SHARE = 0.5
+CONTENT_TAGS = ("p", "h1", "h2", "h3", "h4", "li", "blockquote", "pre")
+WHITESPACE = re.compile(r"\s+")
+COMMA = re.compile(r"[,،、，]")
+
+DATE_XPATHS = (
+    "//meta[@property='article:published_time']/@content",
+    "//meta[@name='pubdate' or @name='publishdate' or @name='date']/@content",
+    "//*[@itemprop='datePublished']/@content",
+    "//time/@datetime",
+)
+
+
+class ExtractedArticle(BaseModel):
+    url: str
+    title: str = ""
+    text: str = ""  # Main text, whitespace collapsed; empty if nothing could be extracted
+    publish_date: Optional[str] = None  # As written in the page (ISO 8601 for most sites)
+    method: str = "failed"  # "lxml" (fast path), "newspaper" (fallback) or "failed"
+    confidence: float = 0.0  # Fast-path confidence in [0, 1]
+
+
+def clean_text(text: str) -> str:
+    """
+    Collapse every run of whitespace (newlines included) into a single space.
+    """
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def _link_density(element) -> float:
+    text_length = len(element.text_content())
+    if not text_length:
+        return 0.0
+    return sum(len(link.text_content()) for link in element.iter("a")) / text_length
+
+
+def _inside_block(element, container) -> bool:
+    # Whether a text block is nested in another one below `container`
+    for ancestor in element.iterancestors():
+        if ancestor is container:
+            return False
+        if ancestor.tag in CONTENT_TAGS:
+            return True
+    return False
+
+
+def _paragraph_chars(element) -> int:
+    # Length of the paragraphs that count when scoring (see extract_main_content)
+    lengths = (len(clean_text(paragraph.text_content())) for paragraph in element.iter("p", "pre"))
+    return sum(length for length in lengths if length >= MIN_PARAGRAPH_CHARS)
+
+
+def _is_junk(element) -> bool:
+    tokens = f"{element.get('class', '')} {element.get('id', '')}".split()
+    return any(JUNK_ATTRIBUTES.fullmatch(token) for token in tokens)
+
+
+def _remove_junk(document) -> None:
+    etree.strip_elements(document, etree.Comment, *JUNK_TAGS, with_tail=False)
+    total_chars = _paragraph_chars(document)
+    for element in list(document.iter("div", "section", "ul", "aside")):
+        if element.getparent() is None or not _is_junk(element):
+            continue
+        # A mislabeled wrapper of the article itself (or an element already dropped with its parent) is kept
+        if _paragraph_chars(element) > MAX_JUNK_TEXT_SHARE * total_chars:
+            continue
+        element.drop_tree()
+
+
+def _teaser_share(container) -> float:
+    """
+    Share of the container's child blocks that look like teasers of other pages: short blocks whose text
+    opens with a link, usually a linked headline followed by a summary.
+    """
+    blocks = [child for child in container if isinstance(child.tag, str) and clean_text(child.text_content())]
+    if len(blocks) < 3:
+        return 0.0
+    teasers = 0
+    for block in blocks:
+        text = clean_text(block.text_content())
+        links = [link for link in block.iter("a") if clean_text(link.text_content())]
+        if links and len(text) <= TEASER_MAX_CHARS and text.startswith(clean_text(links[0].text_content())):
+            teasers += 1
+    return teasers / len(blocks)
+
+
+def _title(document) -> str:
+    for xpath in ("//meta[@property='og:title']/@content", "//title/text()", "//h1//text()"):
+        values = document.xpath(xpath)
+        if values:
+            return clean_text(str(values[0]))
+    return ""
+
+
+def _publish_date(document) -> Optional[str]:
+    for xpath in DATE_XPATHS:
+        values = document.xpath(xpath)
+        if values and str(values[0]).strip():
+            return str(values[0]).strip()
+    return None
+
+
+def extract_main_content(html: str) -> Tuple[str, str, Optional[str], float]:
+    """
+    Readability-style main content extraction with lxml.
+
+    Paragraphs give a score (1 + commas + length / 100, capped) to their parent and half of it to their
+    grandparent; the container with the best score, discounted by its link density, holds the article.
+
+    Returns:
+        tuple: (title, text, publish date, confidence). The confidence is the product of how long the text
+            is (relative to FULL_ARTICLE_CHARS), the share of the page's paragraph text it holds, how few of
+            its words are links and how few of its blocks look like teasers. A container mostly made of
+            teasers is a listing page rather than an article: no text is returned for it.
+    """
+    document = lxml.html.document_fromstring(html)
+    title, publish_date = _title(document), _publish_date(document)
+    _remove_junk(document)
+
+    # Step 1: Score the containers of the paragraphs
+    paragraph_texts = {}
+    scores = {}
+    for paragraph in document.iter("p", "pre"):
+        text = clean_text(paragraph.text_content())
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        paragraph_texts[paragraph] = text
+        score = 1 + len(COMMA.findall(text)) + min(len(text) / 100, 3)
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0.0) + score
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0.0) + score / 2
+    if not scores:
+        return title, "", publish_date, 0.0
+
+    # Step 2: Pick the best container, penalizing link-heavy ones (lists of teasers, menus)
+    link_densities = {element: _link_density(element) for element in scores}
+    best = max(scores, key=lambda element: scores[element] * (1 - link_densities[element]))
+    teaser_share = _teaser_share(best)
+    if teaser_share >= MAX_TEASER_SHARE:
+        return title, "", publish_date, 0.0
+
+    # Step 3: Keep its outermost text blocks (a paragraph inside a list item is kept once), without link lists
+    blocks = []
+    for element in best.iter(*CONTENT_TAGS):
+        if _inside_block(element, best):
+            continue
+        text = clean_text(element.text_content())
+        if text and (element.tag != "li" or _link_density(element) < 0.5):
+            blocks.append(text)
+    text = " ".join(blocks)
+
+    total_chars = sum(len(text) for text in paragraph_texts.values())
+    kept_chars = sum(len(paragraph_text) for paragraph, paragraph_text in paragraph_texts.items()
+                     if best in paragraph.iterancestors())
+    confidence = (min(1.0, len(text) / FULL_ARTICLE_CHARS) * (kept_chars / total_chars)
+                  * (1 - link_densities[best]) * (1 - teaser_share))
+    return title, text, publish_date, round(confidence, 3)
+
+
+def newspaper_extract(url: str, html: str) -> ExtractedArticle:
+    """
+    Full newspaper3k parse of an already fetched page (the slow, more thorough fallback).
+    """
+    from newspaper import Article  # Only imported when a page needs the fallback
+
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return ExtractedArticle(
+        url=url,
+        title=article.title or "",
+        text=clean_text(article.text),
+        publish_date=article.publish_date.isoformat() if article.publish_date else None,
+        method="newspaper" if article.text else "failed",
+    )
+
+
+def extract_html(url: str, html: str, min_confidence: float = MIN_CONFIDENCE) -> ExtractedArticle:
+    """
+    Extract the article of an already fetched page: the lxml fast path, falling back to newspaper3k when its
+    confidence is below `min_confidence`.
+
+    Runs in worker processes, so it must stay a picklable top-level function.
+
+    Args:
+        url (str): Page URL.
+        html (str): Page HTML.
+        min_confidence (float): Fast-path confidence under which newspaper3k parses the page again.
+
+    Returns:
+        ExtractedArticle: The extracted article (method "failed" and empty text if nothing was found).
+    """
+    result = ExtractedArticle(url=url)
+    try:
+        title, text, publish_date, confidence = extract_main_content(html)
+        result = ExtractedArticle(url=url, title=title, text=text, publish_date=publish_date,
+                                  method="lxml" if text else "failed", confidence=confidence)
+    except (etree.ParserError, ValueError) as e:
+        print(f"Error parsing {url}: {str(e)}")
+    if result.confidence >= min_confidence or not html.strip():
+        return result
+
+    try:
+        fallback = newspaper_extract(url, html)
+    except Exception as e:
+        print(f"Error parsing {url} with newspaper: {str(e)}")
+        return result
+    # Keep the fast-path text if newspaper found nothing better
+    if len(fallback.text) <= len(result.text):
+        return result
+    return fallback.model_copy(update={"confidence": result.confidence,
+                                       "title": fallback.title or result.title,
+                                       "publish_date": fallback.publish_date or result.publish_date})
+
+
+def _extract_page(page: Tuple[str, str]) -> ExtractedArticle:
+    return extract_html(*page)
+
+
+def extract_pages(pages: Iterable[Tuple[str, str]], workers: Optional[int] = None,
+                  executor: Optional[Executor] = None, chunksize: int = 8) -> List[ExtractedArticle]:
+    """
+    Extract many fetched pages in a process pool (parsing is CPU-bound).
+
+    Args:
+        pages (iterable): (url, html) pairs.
+        workers (int): Number of processes of the pool (defaults to the number of CPUs).
+        executor (Executor): Executor to use instead of a new process pool.
+        chunksize (int): Pages sent to a worker at once.
+
+    Returns:
+        list: One ExtractedArticle per page, in input order.
+    """
+    if executor is not None:
+        return list(executor.map(_extract_page, pages, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_page, pages, chunksize=chunksize))
@@ -0,0 +1,55 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlite_cache import SQLiteCache, hash_key
+
+# Bing results drift slowly; a chosen image stays valid as long as the candidates are the same
+IMAGE_SEARCH_TTL = 7 * 24 * 60 * 60
+IMAGE_SELECTION_TTL = 30 * 24 * 60 * 60
+MAX_CACHED_QUERIES = 5000
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+_image_search_cache: Optional[SQLiteCache] = None
+_image_selection_cache: Optional[SQLiteCache] = None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so that near-identical regenerated queries share a cache entry
+    (case, accents, punctuation and spacing are ignored).
+    """
+    query = unicodedata.normalize("NFKD", query)
+    query = "".join(char for char in query if not unicodedata.combining(char))
+    query = _PUNCTUATION.sub(" ", query.lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def get_image_search_cache() -> SQLiteCache:
+    """
+    Cache of normalized query -> candidate image URLs returned by Bing.
+    """
+    global _image_search_cache
+    if _image_search_cache is None:
+        _image_search_cache = SQLiteCache("image_search", ttl=IMAGE_SEARCH_TTL, max_entries=MAX_CACHED_QUERIES)
+    return _image_search_cache
+
+
+def get_image_selection_cache() -> SQLiteCache:
+    """
+    Cache of (normalized query, candidate URLs) -> index of the image chosen by the vision model.
+    """
+    global _image_selection_cache
+    if _image_selection_cache is None:
+        _image_selection_cache = SQLiteCache("image_selection", ttl=IMAGE_SELECTION_TTL, max_entries=MAX_CACHED_QUERIES)
+    return _image_selection_cache
+
+
+def image_search_key(query: str, num_images: int) -> str:
+    return hash_key(normalize_query(query), num_images)
+
+
+def image_selection_key(description: str, image_urls: List[str]) -> str:
+    return hash_key(normalize_query(description), list(image_urls))
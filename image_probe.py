@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from clients import get_http_client
+from metrics import external_call
+
+# Image formats accepted by the vision model, identified by their leading bytes
+IMAGE_MAGIC_BYTES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+ACCEPTED_CONTENT_TYPES = set(IMAGE_MAGIC_BYTES.values()) | {"image/jpg"}
+SNIFF_BYTES = 16
+
+PROBE_TIMEOUT = httpx.Timeout(5.0, connect=3.0)
+PROBE_CONCURRENCY = 8
+# Successes are remembered longer than failures, which are more often transient
+ALIVE_TTL = 60 * 60
+DEAD_TTL = 10 * 60
+MAX_CACHED_URLS = 10_000
+
+
+class ProbeCache:
+    """
+    Per-URL liveness results with a TTL, bounded to `max_size` entries (oldest evicted first).
+    """
+
+    def __init__(self, alive_ttl: float = ALIVE_TTL, dead_ttl: float = DEAD_TTL, max_size: int = MAX_CACHED_URLS):
+        self.alive_ttl = alive_ttl
+        self.dead_ttl = dead_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[bool]:
+        entry = self._entries.get(url)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, url: str, alive: bool) -> None:
+        ttl = self.alive_ttl if alive else self.dead_ttl
+        self._entries[url] = (alive, time.monotonic() + ttl)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+probe_cache = ProbeCache()
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """
+    Return the content type matching the leading bytes of an image, or None if it is not an accepted image.
+    """
+    for magic, content_type in IMAGE_MAGIC_BYTES.items():
+        if data.startswith(magic):
+            return content_type
+    return None
+
+
+async def _ranged_get_is_image(client: httpx.AsyncClient, url: str) -> bool:
+    # Ask for the first bytes only; servers ignoring Range still only have their first chunk read
+    headers = {"Range": f"bytes=0-{SNIFF_BYTES - 1}"}
+    async with client.stream("GET", url, headers=headers, timeout=PROBE_TIMEOUT) as response:
+        if response.status_code not in (200, 206):
+            return False
+        head = b""
+        async for chunk in response.aiter_bytes():
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+    return sniff_image_type(head) is not None
+
+
+async def probe_image(url: str, client: Optional[httpx.AsyncClient] = None) -> bool:
+    """
+    Check that an image URL is reachable and serves a JPEG or PNG, without downloading the image.
+
+    A HEAD request is tried first. If the server does not support HEAD or does not announce an image
+    content type, the first bytes are fetched with a ranged GET and the type is confirmed from the magic bytes.
+
+    Args:
+        url (str): Image URL.
+        client (httpx.AsyncClient): Client to use. Defaults to the shared client.
+
+    Returns:
+        bool: True if the URL serves an accepted image.
+    """
+    client = client or get_http_client()
+    with external_call("image_host", "probe") as call:
+        alive = await _probe_image(client, url)
+        if not alive:
+            call["outcome"] = "dead"
+    return alive
+
+
+async def _probe_image(client: httpx.AsyncClient, url: str) -> bool:
+    try:
+        response = await client.head(url, timeout=PROBE_TIMEOUT)
+        if response.status_code in (404, 410):
+            return False
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if response.status_code == 200 and content_type in ACCEPTED_CONTENT_TYPES:
+            return True
+        return await _ranged_get_is_image(client, url)
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        logging.info(f"Image probe failed for {url}: {str(e)}")
+        return False
+
+
+async def cached_probe_image(url: str, cache: ProbeCache = probe_cache) -> bool:
+    alive = cache.get(url)
+    if alive is None:
+        alive = await probe_image(url)
+        cache.set(url, alive)
+    return alive
+
+
+async def find_live_images(urls: List[str],
+                           num_images: int,
+                           concurrency: int = PROBE_CONCURRENCY,
+                           cache: ProbeCache = probe_cache) -> List[str]:
+    """
+    Probe candidate image URLs concurrently and return the first `num_images` live ones, in input order.
+
+    At most `concurrency` probes run at once. Probing stops (and pending probes are cancelled) as soon as
+    the first `num_images` live URLs of the ranking are known, i.e. every URL ranked before them has resolved.
+
+    Args:
+        urls (list): Candidate URLs, best ranked first.
+        num_images (int): Number of live images wanted.
+        concurrency (int): Maximum number of simultaneous probes.
+        cache (ProbeCache): TTL cache of earlier probe results.
+
+    Returns:
+        list: Live URLs, in the order of `urls`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[int, bool] = {}
+
+    async def probe(position: int, url: str) -> None:
+        async with semaphore:
+            results[position] = await cached_probe_image(url, cache)
+
+    def ranked_live_prefix() -> Optional[List[str]]:
+        live = []
+        for position, url in enumerate(urls):
+            if position not in results:
+                return None
+            if results[position]:
+                live.append(url)
+                if len(live) >= num_images:
+                    return live
+        return live
+
+    tasks = [asyncio.create_task(probe(position, url)) for position, url in enumerate(urls)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            await finished
+            live = ranked_live_prefix()
+            if live is not None:
+                return live
+        return ranked_live_prefix() or []
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
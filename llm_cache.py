@@ -0,0 +1,151 @@
+import functools
+import importlib
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+from sqlite_cache import SQLiteCache, hash_key
+
+# "on": read and write the cache, "refresh": ignore cached replies but store the new ones, "off": bypass entirely
+LLM_CACHE_MODE = os.getenv("LLM_CACHE", "on")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_MODES = ("on", "refresh", "off")
+
+_llm_cache: Optional[SQLiteCache] = None
+
+
+def get_llm_cache() -> SQLiteCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SQLiteCache("llm_responses", max_bytes=LLM_CACHE_MAX_BYTES)
+    return _llm_cache
+
+
+def _response_format_key(response_format: Any) -> Any:
+    # Pydantic response formats are keyed on their JSON schema, so editing the model invalidates the entries
+    if hasattr(response_format, "model_json_schema"):
+        return {"name": response_format.__name__, "schema": response_format.model_json_schema()}
+    return response_format
+
+
+def completion_cache_key(call_kwargs: Dict[str, Any]) -> str:
+    """
+    Content address of a chat completion request: model, messages, temperature and response_format.
+    """
+    return hash_key(
+        call_kwargs.get("model"),
+        call_kwargs.get("messages"),
+        call_kwargs.get("temperature"),
+        _response_format_key(call_kwargs.get("response_format")),
+    )
+
+
+def _dump_response(response: Any) -> Dict[str, Any]:
+    response_class = type(response)
+    return {
+        "class": f"{response_class.__module__}:{response_class.__qualname__}",
+        "data": response.model_dump(mode="json", warnings=False),
+    }
+
+
+def _load_response(entry: Dict[str, Any]) -> Any:
+    module_name, class_name = entry["class"].split(":")
+    response_class = importlib.import_module(module_name)
+    for name in class_name.split("."):
+        response_class = getattr(response_class, name)
+    return response_class.model_validate(entry["data"])
+
+
+def _cached_response(llm_cache: SQLiteCache, key: str, entry: Optional[Dict[str, Any]]) -> Any:
+    """
+    Rebuild a cached response, or return None (a miss) if the entry can no longer be loaded.
+
+    Entries go stale when litellm/openai are upgraded or a response class is renamed, and generic classes
+    (e.g. ParsedChatCompletion[X]) cannot be resolved by name. Such entries are deleted and recomputed.
+    """
+    if entry is None:
+        return None
+    try:
+        return _load_response(entry)
+    except Exception as e:
+        logging.warning(f"Dropping unloadable LLM cache entry {key} ({entry.get('class')}): {str(e)}")
+        llm_cache.delete(key)
+        return None
+
+
+def _bound_kwargs(completion_fn: Callable, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # Completion functions from get_completion_litellm_for_burda are partials with the model bound,
+    # possibly wrapped (e.g. by the rate limiter)
+    while not hasattr(completion_fn, "keywords") and hasattr(completion_fn, "__wrapped__"):
+        completion_fn = completion_fn.__wrapped__
+    bound = dict(getattr(completion_fn, "keywords", None) or {})
+    bound.update(kwargs)
+    return bound
+
+
+def _resolve_mode(cache_mode: Optional[str]) -> str:
+    mode = cache_mode or LLM_CACHE_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid LLM cache mode: {mode}. Valid modes are: {CACHE_MODES}")
+    return mode
+
+
+def cached_completion(completion_fn: Callable, cache_mode: Optional[str] = None, cache: Optional[SQLiteCache] = None) -> Callable:
+    """
+    Wrap a synchronous chat completion function (litellm `completion` partial or `client.chat.completions.create`)
+    with the content-addressed response cache.
+
+    Args:
+        completion_fn (callable): Function returning a pydantic chat completion response.
+        cache_mode (str): "on", "refresh" or "off". Defaults to the LLM_CACHE environment variable.
+        cache (SQLiteCache): Cache to use. Defaults to the shared LLM response cache.
+
+    Returns:
+        callable: Function with the same signature as `completion_fn`.
+    """
+    mode = _resolve_mode(cache_mode)
+    if mode == "off":
+        return completion_fn
+
+    @functools.wraps(completion_fn)
+    def wrapper(*args, **kwargs):
+        llm_cache = cache if cache is not None else get_llm_cache()
+        key = completion_cache_key(_bound_kwargs(completion_fn, kwargs))
+        if mode == "on":
+            cached = _cached_response(llm_cache, key, llm_cache.get(key))
+            if cached is not None:
+                return cached
+        response = completion_fn(*args, **kwargs)
+        try:
+            llm_cache.set(key, _dump_response(response))
+        except Exception as e:
+            logging.warning(f"Could not cache LLM response: {str(e)}")
+        return response
+
+    return wrapper
+
+
+def cached_acompletion(completion_fn: Callable, cache_mode: Optional[str] = None, cache: Optional[SQLiteCache] = None) -> Callable:
+    """
+    Async counterpart of `cached_completion` (litellm `acompletion` partial or `AsyncOpenAI` create).
+    """
+    mode = _resolve_mode(cache_mode)
+    if mode == "off":
+        return completion_fn
+
+    @functools.wraps(completion_fn)
+    async def wrapper(*args, **kwargs):
+        llm_cache = cache if cache is not None else get_llm_cache()
+        key = completion_cache_key(_bound_kwargs(completion_fn, kwargs))
+        if mode == "on":
+            cached = _cached_response(llm_cache, key, await llm_cache.aget(key))
+            if cached is not None:
+                return cached
+        response = await completion_fn(*args, **kwargs)
+        try:
+            await llm_cache.aset(key, _dump_response(response))
+        except Exception as e:
+            logging.warning(f"Could not cache LLM response: {str(e)}")
+        return response
+
+    return wrapper
@@ -0,0 +1,314 @@
+import asyncio
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Log one structured line per request with its span timings and token usage
+REQUEST_TRACE_LOG = os.getenv("REQUEST_TRACE_LOG", "1") == "1"
+# Latency buckets in seconds, from cache hits to multi-call generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Event loop lag buckets, from a healthy loop (well under a millisecond) to a blocked one
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Seconds between two event loop lag measurements
+LAG_INTERVAL = 0.05
+
+trace_logger = logging.getLogger("api.trace")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, (v.replace("\\", "\\\\").replace('"', '\\"') for v in values))]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """
+    Base of the metric types: a named family of series, one per combination of label values.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {repr(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests = REGISTRY.register(Counter("http_requests_total", "HTTP requests by endpoint, method and status.", ("endpoint", "method", "status")))
+http_request_duration = REGISTRY.register(Histogram("http_request_duration_seconds", "HTTP request latency (until the last body byte).", ("endpoint", "method")))
+http_requests_in_flight = REGISTRY.register(Gauge("http_requests_in_flight", "HTTP requests being served.", ("endpoint",)))
+stage_duration = REGISTRY.register(Histogram("stage_duration_seconds", "Latency of the internal stages of a request.", ("stage", "outcome")))
+stages_in_flight = REGISTRY.register(Gauge("stages_in_flight", "Internal stages currently running.", ("stage",)))
+external_calls = REGISTRY.register(Counter("external_calls_total", "Calls to external services by outcome.", ("service", "operation", "outcome")))
+llm_tokens = REGISTRY.register(Counter("llm_tokens_total", "LLM tokens used, by model and kind (prompt or completion).", ("model", "kind")))
+event_loop_lag = REGISTRY.register(Histogram("event_loop_lag_seconds", "Delay of the event loop in resuming a sleeping task.", buckets=LAG_BUCKETS))
+
+
+async def monitor_event_loop_lag(interval: float = LAG_INTERVAL) -> None:
+    """
+    Measure, until cancelled, how late the event loop wakes up a task sleeping `interval` seconds. Sustained lag
+    means some code blocks the loop (CPU work or synchronous I/O) and delays every request served by it.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+class RequestTrace:
+    """
+    Span timings and token usage of one request, logged as a single structured line when it ends.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.tokens: Dict[str, int] = {}
+
+    def to_dict(self, endpoint: str, status: int, duration: float) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "endpoint": endpoint,
+            "path": self.path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "spans": self.spans,
+            "tokens": self.tokens,
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time an internal stage: observed in stage_duration_seconds and added to the current request's trace.
+    Tasks started inside a request share its trace (asyncio copies the context into them).
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    outcome = "ok"
+    stages_in_flight.inc(stage=stage)
+    try:
+        yield
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        stages_in_flight.dec(stage=stage)
+        duration = time.perf_counter() - start
+        stage_duration.observe(duration, stage=stage, outcome=outcome)
+        if trace is not None:
+            trace.spans.append({"stage": stage, "start_ms": round((start - trace.start) * 1000, 1),
+                                "duration_ms": round(duration * 1000, 1), "outcome": outcome})
+
+
+@contextmanager
+def external_call(service: str, operation: str) -> Iterator[Dict[str, str]]:
+    """
+    Count a call to an external service. The outcome is "ok", "cancelled" (e.g. a probe no longer needed) or
+    "error" if the block raises; the block can set another one (e.g. "rate_limited", "http_404") in the yielded dict.
+    """
+    result = {"outcome": "ok"}
+    try:
+        yield result
+    except asyncio.CancelledError:
+        result["outcome"] = "cancelled"
+        raise
+    except BaseException:
+        if result["outcome"] == "ok":
+            result["outcome"] = "error"
+        raise
+    finally:
+        external_calls.inc(service=service, operation=operation, outcome=result["outcome"])
+
+
+def record_llm_usage(response: Any, model: Optional[str] = None) -> None:
+    """
+    Count the prompt and completion tokens of an LLM response (chat completion or embeddings).
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    model = model or getattr(response, "model", None) or "unknown"
+    trace = _current_trace.get()
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None) or 0
+        if tokens:
+            llm_tokens.inc(tokens, model=model, kind=kind)
+            if trace is not None:
+                trace.tokens[kind] = trace.tokens.get(kind, 0) + tokens
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the request metrics and the trace of every HTTP request.
+
+    Latency is measured until the last body byte, so streamed responses count their whole duration. Endpoints
+    are labelled by route template ('unmatched' for unknown paths), which keeps the number of series bounded.
+    """
+
+    def __init__(self, app, routes: List[Any] = (), log_traces: bool = REQUEST_TRACE_LOG, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        """
+        Args:
+            app: ASGI app to wrap.
+            routes (list): Starlette routes of the application, to label requests by route template.
+            log_traces (bool): Log the trace of every request (except `skip_paths`) as one JSON line.
+            skip_paths (tuple): Paths whose requests are measured but not logged.
+        """
+        from starlette.routing import Match  # Only needed by the API, not by the pipeline scripts using the metrics
+        self.app = app
+        self.routes = routes
+        self._full_match = Match.FULL
+        self.log_traces = log_traces
+        self.skip_paths = skip_paths
+
+    def endpoint(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == self._full_match:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+        endpoint = self.endpoint(scope)
+        token = _current_trace.set(trace)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(endpoint=endpoint)
+            _current_trace.reset(token)
+            duration = time.perf_counter() - trace.start
+            http_requests.inc(endpoint=endpoint, method=trace.method, status=status["code"])
+            http_request_duration.observe(duration, endpoint=endpoint, method=trace.method)
+            if self.log_traces and scope["path"] not in self.skip_paths:
+                trace_logger.info(json.dumps(trace.to_dict(endpoint, status["code"], duration)))
@@ -2,7 +2,14 @@ import requests
 from datetime import datetime
 import json
 import os
-from utils import extract_article_content, batch_validate_articles, normalize_article
+from utils import batch_validate_articles, normalize_article
+from news_collector.crawler import add_full_content
+from article_store import SeenArticleStore
+from news_collector.near_duplicates import drop_near_duplicates
+from typing import Optional
+
+# Base endpoint of the Bing News API ("/search" is appended for queries)
+BING_NEWS_URL = os.getenv("BING_NEWS_URL", "https://api.bing.microsoft.com/v7.0/news")
 
 def get_news(search_term=None, market='en-US', count=3):
     api_key = os.getenv("BING_API_KEY")
@@ -17,7 +24,7 @@ def get_news(search_term=None, market='en-US', count=3):
     """
     
     # Base endpoint for news search
-    base_url = "https://api.bing.microsoft.com/v7.0/news"
+    base_url = BING_NEWS_URL
     
     # If search term provided, use /search endpoint
     if search_term:
@@ -75,15 +82,35 @@ def get_news(search_term=None, market='en-US', count=3):
 
 
 def get_bing_news(n_bing_news, use_litellm, market):
-    bing_news = get_news(search_term="electric vehicles", count = n_bing_news, market=market)
+    return get_bing_news_for_markets(n_bing_news, use_litellm, [market])
+
+
+def get_bing_news_for_markets(n_bing_news, use_litellm, markets, store: Optional[SeenArticleStore] = None, **crawler_kwargs):
+    """
+    Get the Bing news of several markets. The article pages of all markets are crawled together, so
+    the crawler's concurrency (and per-host politeness) spans every market.
+
+    With a `store`, articles whose URL or content was seen in an earlier run are skipped before being
+    fetched (respectively validated), and the validated articles are recorded in it.
+    """
+    bing_news = []
+    for market in markets:
+        bing_news.extend(get_news(search_term="electric vehicles", count = n_bing_news, market=market) or [])
     for article in bing_news:
-        article_content = extract_article_content(article['url'])
-        article['full_content'] = article_content
         article["type"] = "bing"
+    if store is not None:
+        bing_news = store.skip_known_urls(bing_news, 'url', 'bing')
+    add_full_content(bing_news, 'url', **crawler_kwargs)
 
     bing_news = [article for article in bing_news if article['full_content'] != '' and article['full_content'] is not None]
+    if store is not None:
+        bing_news = store.skip_known_contents(bing_news, 'bing')
+    # The same wire story shows up in several markets: validate a single copy of it
+    bing_news = drop_near_duplicates(bing_news, 'url', 'bing', store=store)
 
     bing_news_results = batch_validate_articles(bing_news, use_litellm=use_litellm)
+    if store is not None:
+        store.record_validations(bing_news_results['valid_articles'] + bing_news_results['invalid_articles'], 'url', 'bing')
     
     # Print results
     print(f"Found {len(bing_news_results['valid_articles'])} valid articles")
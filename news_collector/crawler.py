@@ -0,0 +1,195 @@
+import asyncio
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from extraction import extract_html
+
+# Browser-like user agent: several news sites reject the default python clients
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def parse_article_html(url: str, html: str) -> Optional[str]:
+    """
+    Extract the main text of an article page (see extraction.extract_html), or None if nothing was found.
+
+    Runs in a worker process, so it must stay a picklable top-level function.
+    """
+    article = extract_html(url, html)
+    return article.text if article.method != "failed" else None
+
+
+class HostLimiter:
+    """
+    Per-host politeness: at most `concurrency` open requests and at least `delay` seconds between request starts.
+    """
+
+    def __init__(self, concurrency: int, delay: float):
+        self.delay = delay
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self) -> "HostLimiter":
+        await self._semaphore.acquire()
+        async with self._lock:
+            wait = self._next_start - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start = time.monotonic() + self.delay
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+
+class AsyncCrawler:
+    """
+    Fetches article pages concurrently and extracts their text in a process pool.
+
+    Requests are bounded globally (`concurrency`) and per host (`per_host_concurrency`, `per_host_delay`).
+    Timeouts, connection errors and retryable status codes (429, 5xx) are retried up to `max_retries` times
+    with exponential backoff and jitter.
+
+    Usage:
+        async with AsyncCrawler() as crawler:
+            contents = await crawler.crawl(urls)
+    """
+
+    def __init__(self,
+                 concurrency: int = 16,
+                 per_host_concurrency: int = 2,
+                 per_host_delay: float = 0.5,
+                 timeout: float = 15.0,
+                 max_retries: int = 3,
+                 backoff: float = 1.0,
+                 parse_workers: Optional[int] = None,
+                 executor: Optional[Executor] = None):
+        """
+        Args:
+            concurrency (int): Maximum number of requests in flight overall.
+            per_host_concurrency (int): Maximum number of requests in flight per host.
+            per_host_delay (float): Minimum delay in seconds between two requests to the same host.
+            timeout (float): Timeout in seconds of a single request.
+            max_retries (int): Number of retries of a failed request.
+            backoff (float): Base delay in seconds of the exponential backoff.
+            parse_workers (int): Number of HTML parsing processes (defaults to the number of CPUs).
+            executor (Executor): Executor to parse in instead of a dedicated process pool.
+        """
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.parse_workers = parse_workers
+
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, HostLimiter] = {}
+
+    async def __aenter__(self) -> "AsyncCrawler":
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        if self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _host_limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = HostLimiter(self.per_host_concurrency, self.per_host_delay)
+        return self._hosts[host]
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """
+        Download a page, retrying transient failures. Returns the HTML, or None if the page could not be fetched.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Wait for the host's turn before taking a global slot, so that a burst of URLs on one host
+                # cannot hold every slot while sleeping through its per-host delay
+                async with self._host_limiter(url), self._semaphore:
+                    response = await self._client.get(url)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.text
+                error = f"HTTP {response.status_code}"
+            except (httpx.HTTPStatusError, httpx.InvalidURL, httpx.UnsupportedProtocol, ValueError) as e:
+                # Not worth retrying
+                print(f"Error fetching {url}: {str(e)}")
+                return None
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+            except httpx.HTTPError as e:
+                # Redirect loops, undecodable bodies, ...: not worth retrying either
+                print(f"Error fetching {url}: {str(e) or type(e).__name__}")
+                return None
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        print(f"Error fetching {url} after {self.max_retries + 1} attempts: {error}")
+        return None
+
+    async def fetch_article(self, url: str) -> Optional[str]:
+        """
+        Download an article page and extract its text in the parsing pool. Returns None on any failure, so
+        one bad page never aborts the crawl.
+        """
+        html = await self.fetch(url)
+        if html is None:
+            return None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, parse_article_html, url, html)
+        except Exception as e:
+            print(f"Error parsing {url}: {str(e) or type(e).__name__}")
+            return None
+
+    async def crawl(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Fetch and extract every URL (duplicates are fetched once).
+
+        Returns:
+            dict: URL -> article text, or None when the page could not be fetched or parsed.
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        contents = await asyncio.gather(*(self.fetch_article(url) for url in unique_urls))
+        return dict(zip(unique_urls, contents))
+
+
+def crawl_article_contents(urls: List[str], **crawler_kwargs) -> Dict[str, Optional[str]]:
+    """
+    Synchronous entry point: crawl `urls` with an AsyncCrawler built from `crawler_kwargs`.
+    """
+    async def run() -> Dict[str, Optional[str]]:
+        async with AsyncCrawler(**crawler_kwargs) as crawler:
+            return await crawler.crawl(urls)
+
+    return asyncio.run(run())
+
+
+def add_full_content(articles: List[Dict], url_key: str, **crawler_kwargs) -> List[Dict]:
+    """
+    Crawl the articles' pages concurrently and store the extracted text in their 'full_content' field.
+    """
+    contents = crawl_article_contents([article.get(url_key) for article in articles], **crawler_kwargs)
+    for article in articles:
+        article['full_content'] = contents.get(article.get(url_key))
+    return articles
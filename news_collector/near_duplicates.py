@@ -0,0 +1,148 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Word shingles of this many words
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 128
+# Estimated Jaccard similarity of the shingle sets above which two articles are near-duplicates
+DUPLICATE_THRESHOLD = 0.6
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    32-bit hashes of the word `size`-grams of a text, after lowercasing and stripping punctuation.
+    """
+    words = re.sub(r"[^\w\s]", " ", text.lower()).split()
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+
+def lsh_parameters(num_permutations: int, threshold: float) -> Tuple[int, int]:
+    """
+    Number of bands and rows per band (bands * rows <= num_permutations) whose S-curve threshold
+    (1 / bands) ** (1 / rows) is closest to `threshold`.
+    """
+    best = None
+    for rows in range(1, num_permutations + 1):
+        bands = num_permutations // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashLSH:
+    """
+    MinHash signatures of shingled texts, bucketed by LSH banding.
+
+    Only texts sharing at least one band become candidate pairs, so finding near-duplicates is close to linear
+    in the corpus size instead of comparing every pair. Candidates are confirmed by the fraction of equal
+    signature values (an estimate of the Jaccard similarity of the shingle sets).
+    """
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, threshold: float = DUPLICATE_THRESHOLD,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 0):
+        self.num_permutations = num_permutations
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_parameters(num_permutations, threshold)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32, with odd a
+        self._a = rng.integers(1, 2 ** 63, size=num_permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_permutations, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text, self.shingle_size)
+        if len(hashes) == 0:
+            return np.full(self.num_permutations, MAX_HASH, dtype=np.uint64)
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self.signature(text) for text in texts]) if texts else np.empty((0, self.num_permutations), dtype=np.uint64)
+
+    def candidate_pairs(self, signatures: np.ndarray) -> set:
+        pairs = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = defaultdict(list)
+            band_values = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for index, values in enumerate(band_values):
+                buckets[values.tobytes()].append(index)
+            for members in buckets.values():
+                for i in range(1, len(members)):
+                    for j in range(i):
+                        pairs.add((members[j], members[i]))
+        return pairs
+
+    def clusters(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group the texts into near-duplicate clusters.
+
+        Returns:
+            list: Clusters as lists of text indices (ascending), every text in exactly one cluster; singletons included.
+        """
+        signatures = self.signatures(texts)
+        # Empty texts have no shingles and must not all collapse into one cluster
+        empty = (signatures == MAX_HASH).all(axis=1)
+        parent = list(range(len(texts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self.candidate_pairs(signatures):
+            if empty[i] or empty[j]:
+                continue
+            if np.mean(signatures[i] == signatures[j]) >= self.threshold:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for index in range(len(texts)):
+            groups[find(index)].append(index)
+        return sorted(groups.values())
+
+
+def drop_near_duplicates(articles: List[Dict], url_key: str, stage: str, store=None,
+                         lsh: Optional[MinHashLSH] = None) -> List[Dict]:
+    """
+    Keep one representative per cluster of near-duplicate articles (the first one, in input order).
+
+    The representative's 'duplicate_urls' field lists the URLs of the copies it stands for. With a
+    SeenArticleStore, the copies are recorded in it so later runs skip them before fetching.
+
+    Args:
+        articles (list): Articles with their 'full_content'.
+        url_key (str): Field holding the article URL.
+        stage (str): Name of the collection stage, for the store's counts.
+        store (SeenArticleStore): Optional seen-article store.
+        lsh (MinHashLSH): Detector to use. Defaults to MinHashLSH().
+
+    Returns:
+        list: The representatives, in input order.
+    """
+    lsh = lsh or MinHashLSH()
+    texts = [article.get('full_content') if isinstance(article.get('full_content'), str) else "" for article in articles]
+    representatives = []
+    for cluster in lsh.clusters(texts):
+        representative = articles[cluster[0]]
+        copies = [articles[index] for index in cluster[1:]]
+        representative['duplicate_urls'] = [copy.get(url_key) for copy in copies]
+        representatives.append((cluster[0], representative))
+        if copies and store is not None:
+            store.record_duplicates(copies, url_key, representative.get(url_key), stage)
+    removed = len(articles) - len(representatives)
+    if removed:
+        print(f"Dropped {removed} near-duplicate articles ({stage})")
+    return [article for _, article in sorted(representatives, key=lambda item: item[0])]
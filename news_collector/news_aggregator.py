@@ -1,25 +1,42 @@
 import sys
 sys.path.append("./")
-from news_collector.bingnews import get_bing_news
+from news_collector.bingnews import get_bing_news_for_markets
 from utils import normalize_article
 from news_collector.rss import get_rss_articles
+from article_store import SeenArticleStore
+import os
 import pandas as pd
 
-def get_final_news_df(n_bing_news_per_market, use_litellm):
+NEWS_ARTICLES_CSV = "data/news_articles.csv"
+
+def get_final_news_df(n_bing_news_per_market, use_litellm, incremental=True, store_path=None):
+    """
+    Collect the news of all sources into NEWS_ARTICLES_CSV.
+
+    With `incremental=True`, articles already seen in an earlier run (see article_store.py) are neither
+    fetched nor validated again, and the new articles are added to the existing CSV instead of replacing it.
+    """
+    store = SeenArticleStore(store_path) if incremental else None
     
     markets = ["en-US", "en-GB", "de-DE", "fr-FR", "it-IT", "es-ES"]
-    all_bing_news = []
-    for market in markets:
-        print("Getting news for market:", market)
-        all_bing_news.append(pd.DataFrame(get_bing_news(n_bing_news_per_market, use_litellm, market)))
-    all_bing_news = pd.concat(all_bing_news, ignore_index=True)
-    rss_news = get_rss_articles()
+    print("Getting news for markets:", ", ".join(markets))
+    all_bing_news = pd.DataFrame(get_bing_news_for_markets(n_bing_news_per_market, use_litellm, markets, store=store))
+    rss_news = get_rss_articles(use_litellm=use_litellm, store=store)
     df = pd.concat([all_bing_news, pd.DataFrame(rss_news)], ignore_index=True)
+    new_articles = len(df)
+    if incremental and os.path.exists(NEWS_ARTICLES_CSV):
+        df = pd.concat([df, pd.read_csv(NEWS_ARTICLES_CSV)], ignore_index=True)
+    if df.empty:
+        print("No articles collected")
+        return df
     # Sort by date if needed
     df = df.sort_values('published_date', ascending=False).reset_index(drop=True)
     df.drop_duplicates(subset=["url"], inplace=True)
-    df.to_csv("data/news_articles.csv", index=False)
+    df.to_csv(NEWS_ARTICLES_CSV, index=False)
+    if store is not None:
+        print(f"Ingestion: {new_articles} new valid articles, {len(df)} in total ({store.report()})")
+        store.close()
     return df
 
 if __name__ == "__main__":
-    get_final_news_df(100, use_litellm=False)
\ No newline at end of file
+    get_final_news_df(100, use_litellm=False)
@@ -2,7 +2,10 @@ import requests
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Optional
 
-from utils import batch_validate_articles, extract_article_content, normalize_article
+from utils import batch_validate_articles, normalize_article
+from news_collector.crawler import add_full_content
+from article_store import SeenArticleStore
+from news_collector.near_duplicates import drop_near_duplicates
 
 
 def scrape_rss_feed(url: str,limit: Optional[int] = None) -> List[Dict]:
@@ -54,21 +57,36 @@ def scrape_rss_feed(url: str,limit: Optional[int] = None) -> List[Dict]:
         return []
     
 
-def get_rss_articles(use_litellm: bool = False) -> List[Dict]:
+def get_rss_articles(use_litellm: bool = False, store: Optional[SeenArticleStore] = None, **crawler_kwargs) -> List[Dict]:
+    """
+    Get the articles of the RSS feeds. With a `store`, articles seen in an earlier run are skipped (by URL
+    before fetching, by content before validating) and the validated articles are recorded in it.
+    """
     rss_urls  = [
         "https://rss.app/feeds/MLuDKqkwFtd2tuMr.xml",
         "https://www.autobild.de/rss/22590661.xml",
         "https://rss.app/feeds/u6rcvfy6PTSf9vQ4.xml"
     ]
+    feeds = [scrape_rss_feed(rss_url) for rss_url in rss_urls]
+    if store is not None:
+        feeds = [store.skip_known_urls(rss_articles, 'link', 'rss') for rss_articles in feeds]
+    # Crawl the pages of all feeds at once
+    add_full_content([article for rss_articles in feeds for article in rss_articles], 'link', **crawler_kwargs)
+    # Keep a single copy of the stories several feeds carry
+    representatives = drop_near_duplicates([article for rss_articles in feeds for article in rss_articles], 'link', 'rss', store=store)
+    representative_ids = {id(article) for article in representatives}
+    feeds = [[article for article in rss_articles if id(article) in representative_ids] for rss_articles in feeds]
+
     normalized_articles = []
-    for rss_url in rss_urls:
-        rss_articles = scrape_rss_feed(rss_url)
+    for rss_articles in feeds:
         for article in rss_articles:
-            article_content = extract_article_content(article['link'])
-            article['full_content'] = article_content
             article["type"] = "rss"
+        if store is not None:
+            rss_articles = store.skip_known_contents(rss_articles, 'rss')
 
         rss_results = batch_validate_articles(rss_articles, use_litellm=use_litellm)
+        if store is not None:
+            store.record_validations(rss_results['valid_articles'] + rss_results['invalid_articles'], 'link', 'rss')
 
         # Print results
         print(f"Found {len(rss_results['valid_articles'])} valid articles")
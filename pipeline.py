@@ -0,0 +1,91 @@
+import sys
+sys.path.append("./")
+import argparse
+import asyncio
+import os
+
+from stage_runner import Stage, StageRunner
+
+NEWS_ARTICLES_CSV = "data/news_articles.csv"
+FEEDBACK_CSV = "data/news_articles_with_feedback.csv"
+SUMMARY_CSV = "data/relevant_news_articles_with_feedback_and_summary.csv"
+EMBEDDINGS_CSV = "data/data_with_embeddings.csv"
+GROUPS_CSV = "data/df_with_embedding_and_sorted_groups.csv"
+ARTICLE_TABLE = "data/articles.sqlite"
+
+# Stage functions import their modules when they run, so listing or skipping stages needs no API keys
+
+
+def collect_news(n_bing_news_per_market: int, use_litellm: bool) -> None:
+    from news_collector.news_aggregator import get_final_news_df
+    get_final_news_df(n_bing_news_per_market, use_litellm=use_litellm)
+
+
+def score_articles(multi_dimension: bool) -> None:
+    from summary_and_feedback_generation.feedback_on_news_article_generation import fill_df_with_feedback_and_summary
+    asyncio.run(fill_df_with_feedback_and_summary(NEWS_ARTICLES_CSV, os.path.dirname(FEEDBACK_CSV), os.path.basename(FEEDBACK_CSV),
+                                                  os.path.basename(SUMMARY_CSV), multi_dimension=multi_dimension))
+
+
+def embed_articles(model: str) -> None:
+    from clustering.embed_summaries import embed_summaries
+    embed_summaries(SUMMARY_CSV, EMBEDDINGS_CSV, model=model)
+
+
+def cluster_articles(**params) -> None:
+    from clustering.knn_clustering import cluster_file
+    cluster_file(EMBEDDINGS_CSV, GROUPS_CSV, **params)
+
+
+def build_article_table() -> None:
+    from article_table import migrate_csvs
+    migrate_csvs(os.path.dirname(NEWS_ARTICLES_CSV), ARTICLE_TABLE).close()
+
+
+def build_stages(multi_dimension: bool = False) -> list:
+    """
+    The offline pipeline feeding the API: collect -> score -> embed -> cluster, then the columnar article
+    table gathering the columns of every stage.
+    """
+    return [
+        Stage("collect", collect_news, outputs=[NEWS_ARTICLES_CSV],
+              params={"n_bing_news_per_market": 100, "use_litellm": False},
+              sources=["news_collector/news_aggregator.py", "news_collector/bingnews.py", "news_collector/rss.py",
+                       "news_collector/crawler.py", "news_collector/near_duplicates.py"],
+              always_run=True),
+        Stage("score", score_articles, inputs=[NEWS_ARTICLES_CSV], outputs=[FEEDBACK_CSV, SUMMARY_CSV],
+              params={"multi_dimension": multi_dimension},
+              sources=["summary_and_feedback_generation/feedback_on_news_article_generation.py",
+                       "summary_and_feedback_generation/evaluation_dimensions.py",
+                       "summary_and_feedback_generation/summary_generation.py"]),
+        Stage("embed", embed_articles, inputs=[SUMMARY_CSV], outputs=[EMBEDDINGS_CSV],
+              params={"model": "text-embedding-3-small"},
+              sources=["clustering/embed_summaries.py", "embeddings.py"]),
+        Stage("cluster", cluster_articles, inputs=[EMBEDDINGS_CSV], outputs=[GROUPS_CSV],
+              params={"num_groups": 10, "group_size": 3, "sort_by": "overall_score"},
+              sources=["clustering/knn_clustering.py", "clustering/ann_index.py", "embedding_store.py"]),
+        Stage("table", build_article_table, inputs=[NEWS_ARTICLES_CSV, FEEDBACK_CSV, SUMMARY_CSV, EMBEDDINGS_CSV, GROUPS_CSV],
+              outputs=[ARTICLE_TABLE], sources=["article_table.py", "embedding_store.py"]),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline pipeline, skipping the stages whose inputs, code and parameters did not change.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--from", dest="start", help="Rerun this stage, then the downstream stages whose inputs changed.")
+    group.add_argument("--only", nargs="+", help="Rerun just these stages.")
+    parser.add_argument("--skip-collect", action="store_true", help="Do not fetch new articles (work on the collected ones).")
+    parser.add_argument("--force", action="store_true", help="Rerun the selected stages even if they are up to date.")
+    parser.add_argument("--multi-dimension", action="store_true", help="Rate all evaluation dimensions in one call.")
+    parser.add_argument("--jobs", type=int, default=None, help="Maximum number of stages running at once.")
+    args = parser.parse_args()
+
+    stages = build_stages(multi_dimension=args.multi_dimension)
+    if args.skip_collect:
+        stages = [stage for stage in stages if stage.name != "collect"]
+    runner = StageRunner(stages, max_workers=args.jobs)
+    try:
+        runner.run(only=args.only, start=args.start, force=args.force)
+    except (RuntimeError, ValueError) as e:
+        print(e)
+        sys.exit(1)
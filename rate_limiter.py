@@ -0,0 +1,322 @@
+import asyncio
+import email.utils
+import functools
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from metrics import external_call, record_llm_usage
+
+# Defaults of the shared limiters; set them to the quota of the deployment
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", 200_000))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+# Rough completion size added to the prompt estimate when a call does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+# Server errors worth retrying (the API clients are built with max_retries=0, the limiter retries instead)
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+# Connection and timeout errors of openai and litellm (APIConnectionError, APITimeoutError, Timeout, ...)
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "Timeout", "ServiceUnavailableError", "InternalServerError"}
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most `capacity` tokens.
+
+    `acquire` reserves the tokens immediately (the level may go negative) and sleeps until the reservation is
+    covered, so callers are served in arrival order without any asyncio lock. This also makes the bucket usable
+    from several event loops, including loops running in different threads (the reservation itself holds a
+    thread lock).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` tokens and return the number of seconds to wait before using them.
+        """
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class _LoopSlots:
+    # Concurrency state of an AIMDController on one event loop
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.in_flight = 0
+
+
+class AIMDController:
+    """
+    Concurrency limit adapted with additive increase / multiplicative decrease.
+
+    Every success raises the limit by `increase / limit` (about +`increase` per round of calls); a rate limit
+    error multiplies it by `decrease`, at most once per `cooldown` seconds so a burst of 429s from the same
+    overload only counts once.
+
+    asyncio primitives are bound to one loop, so the calls in flight are counted per event loop (e.g. the
+    threads of the stage runner, each in its own asyncio.run): the limit applies to each loop separately,
+    and `in_flight` is the total over all live loops.
+    """
+
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = MAX_CONCURRENCY,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        # Entries go away with their event loop
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopSlots]" = weakref.WeakKeyDictionary()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(slots.in_flight for slots in self._loops.values())
+
+    def _slots(self) -> _LoopSlots:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._loops.get(loop)
+            if slots is None:
+                slots = self._loops[loop] = _LoopSlots()
+            return slots
+
+    async def acquire(self) -> None:
+        slots = self._slots()
+        async with slots.condition:
+            await slots.condition.wait_for(lambda: slots.in_flight < max(1, int(self.limit)))
+            slots.in_flight += 1
+
+    async def release(self) -> None:
+        slots = self._slots()
+        async with slots.condition:
+            slots.in_flight -= 1
+            slots.condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_rate_limited(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_decrease = now
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    # openai and litellm API errors and httpx status errors all expose the status code
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and getattr(error, "response", None) is not None:
+        status_code = getattr(error.response, "status_code", None)
+    return status_code
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return _status_code(error) == 429
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether a failed call may succeed when retried: 5xx (and 408/409) responses, connection errors and timeouts.
+    """
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    return _status_code(error) in TRANSIENT_STATUS_CODES
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the server's Retry-After (or retry-after-ms) header from a rate limit error, if any.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_date.timestamp() - time.time()) if retry_date else None
+
+
+def estimate_tokens(messages: Optional[List[Dict[str, Any]]], max_tokens: Optional[int] = None) -> int:
+    """
+    Cheap token estimate of a chat request (about 4 characters per token) plus its completion budget.
+    """
+    characters = sum(len(str(message.get("content", ""))) for message in messages or [])
+    return characters // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class AsyncRateLimiter:
+    """
+    Shared limiter for LLM calls: request and token buckets, an AIMD concurrency limit, and retries of 429s.
+
+    On a rate limit error the limiter lowers its concurrency, pauses every caller for the server's Retry-After
+    (or an exponential backoff), then retries the call up to `max_retries` times. Transient errors (5xx,
+    connection errors, timeouts) are retried as many times with an exponential backoff of that call only.
+
+    Usage:
+        response = await limiter.run(client.chat.completions.create, model=..., messages=...)
+        limited_create = limiter.wrap(client.chat.completions.create)
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE,
+                 initial_concurrency: float = 8,
+                 max_concurrency: float = MAX_CONCURRENCY,
+                 max_retries: int = 5,
+                 backoff: float = 1.0,
+                 name: str = "default"):
+        """
+        Args:
+            requests_per_minute (float): Request quota.
+            tokens_per_minute (float): Token quota (prompt + completion, estimated).
+            initial_concurrency (float): Starting concurrency limit.
+            max_concurrency (float): Upper bound of the concurrency limit.
+            max_retries (int): Number of retries of a rate limited or transiently failing call.
+            backoff (float): Base delay in seconds when the server sends no Retry-After.
+            name (str): Quota name, used as the operation label of the external call metrics.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AIMDController(initial=initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.name = name
+        self._resume_at = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+        self.transient_errors = 0
+
+    async def _wait_for_cooldown(self) -> None:
+        while True:
+            wait = self._resume_at - time.monotonic()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args, estimated_tokens: Optional[int] = None, **kwargs) -> Any:
+        """
+        Call `await fn(*args, **kwargs)` within the limits, retrying rate limit and transient errors.
+
+        Args:
+            fn (callable): Async function to call.
+            estimated_tokens (int): Tokens used by the call. Estimated from `messages` and `max_tokens` by default.
+
+        Returns:
+            The result of `fn`.
+        """
+        if estimated_tokens is None:
+            estimated_tokens = estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+
+        retry_delay = 0.0
+        for attempt in range(self.max_retries + 1):
+            if retry_delay:
+                # Backoff of a transient error: only this call waits, and it holds no concurrency slot meanwhile
+                await asyncio.sleep(retry_delay)
+                retry_delay = 0.0
+            await self._wait_for_cooldown()
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            try:
+                self.calls += 1
+                with external_call("llm", self.name) as call:
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except Exception as e:
+                        if is_rate_limit_error(e):
+                            call["outcome"] = "rate_limited"
+                        raise
+                record_llm_usage(result)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                if not is_rate_limit_error(e):
+                    if not is_transient_error(e):
+                        raise
+                    self.transient_errors += 1
+                    retry_delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                    logging.warning(f"Transient LLM error ({type(e).__name__}), retrying in {retry_delay:.1f}s: {str(e)}")
+                    continue
+                self.rate_limited += 1
+                self.concurrency.on_rate_limited()
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                logging.warning(f"Rate limited, retrying in {delay:.1f}s (concurrency limit {self.concurrency.limit:.1f})")
+                continue
+            finally:
+                await self.concurrency.release()
+            self.concurrency.on_success()
+            return result
+
+    def wrap(self, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """
+        Return an async function with the signature of `fn` that runs through the limiter.
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await self.run(fn, *args, **kwargs)
+
+        return wrapper
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "transient_errors": self.transient_errors,
+            "concurrency_limit": self.concurrency.limit,
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+_rate_limiters: Dict[str, AsyncRateLimiter] = {}
+
+
+def get_rate_limiter(name: str = "default") -> AsyncRateLimiter:
+    """
+    Shared limiter per quota (e.g. one per model deployment), created with the default limits on first use.
+    """
+    if name not in _rate_limiters:
+        _rate_limiters[name] = AsyncRateLimiter(name=name)
+    return _rate_limiters[name]
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+from typing import Any, Dict
+
+
+class RowCheckpoint:
+    """
+    Append-only JSONL checkpoint of per-row results, keyed by a hash of the row's inputs.
+
+    Each finished row is appended as one line and flushed to disk immediately, so a crashed run loses at most
+    the rows that were in flight. A truncated last line (crash mid-write) is ignored on load and cut off the
+    file, so the next record starts on a fresh line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._load()
+        self._file = None
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        last_line_valid = True
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring unreadable line {line_number} of checkpoint {self.path}")
+                    last_line_valid = False
+                    continue
+                last_line_valid = True
+                self.records[entry["key"]] = entry["record"]
+        self._repair_tail(last_line_valid)
+
+    def _repair_tail(self, last_line_valid: bool) -> None:
+        # Make the file end with a newline so appends start on a fresh line: a complete last record only
+        # misses its newline, anything else after the last newline is a line cut short by a crash
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                chunk = f.read(end - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end == size:
+                return
+            if last_line_valid:
+                f.seek(size)
+                f.write(b"\n")
+            else:
+                logging.warning(f"Truncating the incomplete last line of checkpoint {self.path}")
+                f.truncate(end)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, key: str) -> Dict[str, Any]:
+        return self.records[key]
+
+    def append(self, key: str, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"key": key, "record": record}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records[key] = record
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        """
+        Delete the checkpoint file and forget every record.
+        """
+        self.close()
+        self.records = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -20,4 +20,25 @@ class ArticleResponse(BaseModel):
     
 class SearchQueryResponse(BaseModel):
     search_query: str  # The generated search query to find the image
-    
\ No newline at end of file
+
+class PregenerationStats(BaseModel):
+    queue_depth: int  # Groups waiting to be pre-generated
+    in_flight: int  # Generations currently running
+    cached_articles: int  # Articles ready to be served
+    hits: int  # /next-article/ requests served from the cache (or from a generation in flight)
+    misses: int  # /next-article/ requests generated on demand
+    hit_rate: float
+    generated: int
+    failures: int
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int  # Entries currently stored
+
+class LatencyStats(BaseModel):
+    count: int  # Recent samples (successful runs only)
+    mean: float  # Seconds
+    p50: float
+    p95: float
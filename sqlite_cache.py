@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Directory holding the cache databases (one SQLite file per cache)
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+# Expired entries are swept, and the entry count and size re-read from the database, once every this many writes
+SWEEP_EVERY = 256
+
+
+def hash_key(*parts: Any) -> str:
+    """
+    Build a stable cache key from JSON-serializable parts.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Persistent key -> JSON value cache backed by SQLite.
+
+    Entries expire `ttl` seconds after they were written (None disables expiry). When the cache grows past
+    `max_entries` or `max_bytes`, the least recently used entries are evicted. The entry count and total size
+    are kept as running totals (re-read every SWEEP_EVERY writes, as other processes may share the file), so a
+    write costs a few index lookups rather than a scan of the table. Hit and miss counters are kept for
+    monitoring. The async helpers run the (short) SQLite calls in a worker thread so they never block
+    the event loop.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, cache_dir: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        cache_dir = cache_dir or CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"{name}.sqlite")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)")
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._count, self._size = self._read_totals()
+
+    def _read_totals(self):
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def _delete_rows(self, rows) -> None:
+        # rows: (key, size) pairs that are known to exist
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+        self._count -= len(rows)
+        self._size -= sum(size for _, size in rows)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and row[1] + self.ttl < now:
+                self._delete_rows([(key, row[2])])
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            if previous is None:
+                self._count += 1
+            self._size += len(payload) - (previous[0] if previous else 0)
+
+            self._writes += 1
+            if self._writes % SWEEP_EVERY == 0:
+                self._sweep()
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._delete_rows([(key, row[0])])
+
+    def _sweep(self) -> None:
+        # Drop the expired entries (lookups already ignore them) and resynchronize the running totals
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        self._count, self._size = self._read_totals()
+
+    def _evict(self) -> None:
+        excess = max(0, self._count - self.max_entries) if self.max_entries is not None else 0
+        to_free = max(0, self._size - self.max_bytes) if self.max_bytes is not None else 0
+        if not excess and not to_free:
+            return
+        # Walk the entries from least to most recently used until both budgets are met
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if len(stale) >= excess and to_free <= 0:
+                break
+            stale.append((key, size))
+            to_free -= size
+        self._delete_rows(stale)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._count, self._size = 0, 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,45 @@
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+import numpy as np
+
+# Number of recent samples kept per stage
+LATENCY_WINDOW = 1000
+
+
+class LatencyRecorder:
+    """
+    Recent latencies of named stages (e.g. the steps of an article generation), for the stats endpoints.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._samples[stage].append(seconds)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """
+        Record the duration of the block under `stage` (only when it completes without raising).
+        """
+        start = time.perf_counter()
+        yield
+        self.record(stage, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for stage, samples in sorted(self._samples.items()):
+            values = np.fromiter(samples, dtype=float)
+            stats[stage] = {
+                "count": len(values),
+                "mean": float(values.mean()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+            }
+        return stats
+
+    def clear(self) -> None:
+        self._samples.clear()
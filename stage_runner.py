@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+# Fingerprints of the last successful run of every stage
+STAGE_MANIFEST = os.getenv("STAGE_MANIFEST", "data/.stage_manifest.json")
+
+
+class Stage:
+    """
+    One step of the offline pipeline: `fn(**params)` reads the `inputs` files and writes the `outputs` files.
+
+    A stage is up to date when its fingerprint (version, params, the contents of its `sources` and of its
+    input files) matches the one of its last successful run and its outputs are unchanged since then.
+    Stages that consume the outputs of another stage depend on it. `always_run` is for stages whose real
+    inputs are external (e.g. news sites), which no fingerprint can capture.
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 params: Optional[Dict[str, Any]] = None, version: str = "1", sources: Iterable[str] = (),
+                 always_run: bool = False):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.version = version
+        self.sources = list(sources)
+        self.always_run = always_run
+
+    def run(self) -> None:
+        self.fn(**self.params)
+
+
+class StageRunner:
+    """
+    Run a DAG of stages: stages whose dependencies are done run in parallel threads, up-to-date stages are
+    skipped, and each stage's fingerprint and timing are recorded in the manifest as soon as it finishes.
+    """
+
+    def __init__(self, stages: List[Stage], manifest_path: Optional[str] = None, max_workers: Optional[int] = None):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names in {names}")
+        self.stages = {stage.name: stage for stage in stages}
+        self.manifest_path = manifest_path or STAGE_MANIFEST
+        self.max_workers = max_workers or len(stages)
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+        producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is written by both '{producers[output]}' and '{stage.name}'")
+                producers[output] = stage.name
+        self.dependencies: Dict[str, Set[str]] = {
+            stage.name: {producers[path] for path in stage.inputs if path in producers} - {stage.name}
+            for stage in stages
+        }
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependencies form a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def descendants(self, name: str) -> Set[str]:
+        found, frontier = set(), [name]
+        while frontier:
+            current = frontier.pop()
+            for other, dependencies in self.dependencies.items():
+                if current in dependencies and other not in found:
+                    found.add(other)
+                    frontier.append(other)
+        return found
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            manifest = {}
+        manifest.setdefault("stages", {})
+        manifest.setdefault("files", {})
+        return manifest
+
+    def _save_manifest(self) -> None:
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def file_digest(self, path: str) -> Optional[str]:
+        """
+        SHA-256 of a file's contents (None if missing). Files whose size and mtime did not change since the
+        last hash are not read again.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            known = self._manifest["files"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._manifest["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        state = {
+            "version": stage.version,
+            "params": stage.params,
+            "sources": {path: self.file_digest(path) for path in stage.sources},
+            "inputs": {path: self.file_digest(path) for path in stage.inputs},
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, stage: Stage) -> bool:
+        with self._lock:
+            record = self._manifest["stages"].get(stage.name)
+        if stage.always_run or record is None or record["fingerprint"] != self.fingerprint(stage):
+            return False
+        return all(self.file_digest(path) is not None and self.file_digest(path) == record["outputs"].get(path)
+                   for path in stage.outputs)
+
+    def _execute(self, stage: Stage, forced: bool) -> Dict[str, Any]:
+        if not forced and self.is_up_to_date(stage):
+            print(f"[{stage.name}] up to date, skipped")
+            return {"status": "skipped", "seconds": 0.0}
+        print(f"[{stage.name}] running")
+        start = time.perf_counter()
+        stage.run()
+        elapsed = time.perf_counter() - start
+        outputs = {path: self.file_digest(path) for path in stage.outputs}
+        missing = [path for path, digest in outputs.items() if digest is None]
+        if missing:
+            print(f"[{stage.name}] warning: did not write {', '.join(missing)}")
+        fingerprint = self.fingerprint(stage)
+        with self._lock:
+            self._manifest["stages"][stage.name] = {
+                "fingerprint": fingerprint, "outputs": outputs, "finished_at": time.time(), "seconds": elapsed,
+            }
+            self._save_manifest()
+        print(f"[{stage.name}] ran in {elapsed:.2f}s")
+        return {"status": "ran", "seconds": elapsed}
+
+    def plan(self, only: Optional[List[str]] = None, start: Optional[str] = None, force: bool = False):
+        """
+        Stages to consider and stages to run even if up to date.
+
+        With `only`, just those stages run (forced). With `start`, that stage is forced and its descendants
+        run if their inputs changed; the other stages are left alone. Otherwise every stage is considered.
+        """
+        for name in (only or []) + ([start] if start else []):
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}' (stages: {', '.join(self.stages)})")
+        if only:
+            selected = set(only)
+            forced = set(only)
+        elif start:
+            selected = {start} | self.descendants(start)
+            forced = {start}
+        else:
+            selected = set(self.stages)
+            forced = set()
+        if force:
+            forced = set(selected)
+        return selected, forced
+
+    def run(self, only: Optional[List[str]] = None, start: Optional[str] = None, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Run the selected stages (see `plan`) in dependency order, independent ones in parallel.
+
+        Returns:
+            dict: Stage name -> {"status": "ran" | "skipped" | "failed" | "blocked", "seconds": float}.
+
+        Raises:
+            RuntimeError: If a stage failed (after the stages that could still run have finished).
+        """
+        selected, forced = self.plan(only, start, force)
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = [name for name in self.stages if name in selected]
+        running: Dict[Future, str] = {}
+        total_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    dependencies = self.dependencies[name] & selected
+                    if any(results.get(dependency, {}).get("status") in ("failed", "blocked") for dependency in dependencies):
+                        print(f"[{name}] blocked by a failed dependency")
+                        results[name] = {"status": "blocked", "seconds": 0.0}
+                        pending.remove(name)
+                    elif all(dependency in results for dependency in dependencies):
+                        running[executor.submit(self._execute, self.stages[name], name in forced)] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"[{name}] failed: {e}")
+                        results[name] = {"status": "failed", "seconds": 0.0}
+
+        print(f"{'stage':<12} {'status':<8} {'time':>8}")
+        for name in self.stages:
+            if name in results:
+                print(f"{name:<12} {results[name]['status']:<8} {results[name]['seconds']:>7.2f}s")
+        print(f"total {time.perf_counter() - total_start:.2f}s")
+        failed = [name for name, result in results.items() if result["status"] == "failed"]
+        if failed:
+            raise RuntimeError(f"Stages failed: {', '.join(failed)}")
+        return results
@@ -1,5 +1,5 @@
 from utils import get_completion_litellm_for_burda
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
 from jinja2 import Template
 from pydantic import BaseModel
@@ -19,6 +19,14 @@ class NewsRating(BaseModel):
     critique: str
     news_meets_standards: str
 
+class DimensionRating(BaseModel):
+    dimension: str
+    critique: str
+    news_meets_standards: str
+
+class MultiDimensionNewsRating(BaseModel):
+    ratings: List[DimensionRating]
+
 # ~~~ Originality, Value, and Purpose Dimension ~~~
 
 # Originality, Value, and Purpose As Instruction
@@ -153,6 +161,35 @@ FILTERING_USER_PROMPT_TEMPLATE = \
 <\ARTICLE>
 """
 
+# ~~~ MULTI-DIMENSION ASSESMENT (all dimensions in a single call) ~~~~
+MULTI_DIMENSION_SYSTEM_PROMPT = \
+"""
+You're a content moderator for a popular online platform. You've been tasked with reviewing articles about electric vehicles to assess if they should be used to generate articles on you own platform. You will be provide with several Evaluation Dimensions to Critique on. 
+Each Evaluation dimension and the instructions to follow will be provide in <EVALUATION DIMENSION name="..."> <\EVALUATION DIMENSION> tags and the article will be provided <ARTICLE> <\ARTICLE> tags. Within the <ARTICLE> tag there are can also the following tags <TITLE> <\TITLE>, <CONTENT> <\CONTENT> and <DESCRIPTION> <\DESCRIPTION> which will provide the title and content of the article respectively.
+Assess every Evaluation Dimension independently of the others: for each one, provide a critique of the article based on that dimension only, then a final assessment of whether the article meets the platform's standards on that dimension.
+As output I would like you to provide the following in the format of a JSON, with one rating per Evaluation Dimension:
+{
+    "ratings": [
+        {
+            "dimension": "name", # The name attribute of the Evaluation Dimension
+            "critique": "Your critique here", # Your critique of the article with respect to the Evaluation Dimension
+            "news_meets_standards": "Strongly Disagree/Disagree/Neutral/Agree/Strongly Agree" # You must chose only one of the options based on your critique
+        }
+    ]
+}
+Note that articles may be provided in various languages but keep your critique in English.
+"""
+
+MULTI_DIMENSION_USER_PROMPT_TEMPLATE = \
+"""
+{% for name, eval_dimension in eval_dimensions %}<EVALUATION DIMENSION name="{{name}}"> {{eval_dimension}} <\EVALUATION DIMENSION>
+{% endfor %}<ARTICLE>
+<TITLE> {{title}} <\TITLE>
+<DESCRIPTION> {{description}} <\DESCRIPTION>
+<CONTENT> {{content}} <\CONTENT>
+<\ARTICLE>
+"""
+
 EVAL_DIMENSION_TEMPLATE = \
 """
 <EVALUATION DIMENSION> {{eval_dimension}} <\EVALUATION DIMENSION>
@@ -177,32 +214,81 @@ dimension_name_to_prompt_qa = {
 
 
 #### FUNCTIONS TO GENERATE PROMPTS ####
-async def get_feedback(news_dict: Dict[str,Any], eval_dimension_name: str, as_qa: bool = True) -> Dict:
+def _dimension_prompt(eval_dimension_name: str, as_qa: bool = True) -> str:
     dict_of_interest = dimension_name_to_prompt_qa if as_qa else dimension_name_to_prompt
     
     dimension_prompt = dict_of_interest.get(eval_dimension_name.lower(), None)
     if dimension_prompt is None:
         raise ValueError(f"Invalid Evaluation Dimension Name: {eval_dimension_name}. Valid dimension names are: {list(dimension_name_to_prompt.keys())}")
-    
-    
+    return dimension_prompt
+
+def build_feedback_messages(news_dict: Dict[str,Any], eval_dimension_name: str, as_qa: bool = True) -> List[Dict[str, str]]:
     user_prompt = Template(FILTERING_USER_PROMPT_TEMPLATE).render(
-        eval_dimension = dimension_prompt,
+        eval_dimension = _dimension_prompt(eval_dimension_name, as_qa),
         title = news_dict.get("title", "Title Missing"),
         description = news_dict.get("description", "Description Missing"),
         content = news_dict.get("content", "Content Missing"),
         response_format = NewsRating,
     )
-    
+    return [{"role": "system", "content": FILTERING_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+
+def build_multi_dimension_messages(news_dict: Dict[str,Any], eval_dimension_names: List[str], as_qa: bool = True) -> List[Dict[str, str]]:
+    user_prompt = Template(MULTI_DIMENSION_USER_PROMPT_TEMPLATE).render(
+        eval_dimensions = [(name.lower(), _dimension_prompt(name, as_qa)) for name in eval_dimension_names],
+        title = news_dict.get("title", "Title Missing"),
+        description = news_dict.get("description", "Description Missing"),
+        content = news_dict.get("content", "Content Missing"),
+    )
+    return [{"role": "system", "content": MULTI_DIMENSION_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+
+def parse_multi_dimension_reply(reply, eval_dimension_names: List[str]) -> Dict[str, NewsRating]:
+    rating = MultiDimensionNewsRating(**json.loads(reply.choices[0].message.content))
+    ratings = {dimension_rating.dimension.lower(): dimension_rating for dimension_rating in rating.ratings}
+    missing = [name for name in eval_dimension_names if name.lower() not in ratings]
+    if missing:
+        raise ValueError(f"The multi-dimension reply has no rating for: {missing}")
+    return {
+        name: NewsRating(critique=ratings[name.lower()].critique, news_meets_standards=ratings[name.lower()].news_meets_standards)
+        for name in eval_dimension_names
+    }
+
+async def get_feedback(news_dict: Dict[str,Any], eval_dimension_name: str, as_qa: bool = True) -> Dict:
+    messages = build_feedback_messages(news_dict, eval_dimension_name, as_qa)
     
     completion_fn = get_completion_litellm_for_burda("gpt-4o")
     
     reply = await completion_fn(
-        messages=[{"role": "system", "content": FILTERING_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}],
+        messages=messages,
         response_format=NewsRating,
     )
     
     return NewsRating(**json.loads(reply.choices[0].message.content))
 
+async def get_multi_dimension_feedback(news_dict: Dict[str,Any], eval_dimension_names: Optional[List[str]] = None, as_qa: bool = True) -> Dict[str, NewsRating]:
+    """
+    Rate the article on several evaluation dimensions in a single structured-output call, so the article
+    content is sent once instead of once per dimension.
+    
+    Args:
+        news_dict (dict): Article with "title", "description" and "content".
+        eval_dimension_names (list): Dimensions to rate. Defaults to all dimensions.
+        as_qa (bool): Use the question-answering version of the dimension prompts.
+        
+    Returns:
+        dict: Dimension name -> NewsRating, as get_feedback would return for that dimension.
+    """
+    eval_dimension_names = eval_dimension_names or list(dimension_name_to_prompt.keys())
+    messages = build_multi_dimension_messages(news_dict, eval_dimension_names, as_qa)
+    
+    completion_fn = get_completion_litellm_for_burda("gpt-4o")
+    
+    reply = await completion_fn(
+        messages=messages,
+        response_format=MultiDimensionNewsRating,
+    )
+    
+    return parse_multi_dimension_reply(reply, eval_dimension_names)
+
 def textgrad_get_feedback(user_prompt, eval_dimension_name: str, as_qa: bool = True) -> Dict:
     dict_of_interest = dimension_name_to_prompt_qa if as_qa else dimension_name_to_prompt
     
@@ -2,76 +2,251 @@ import sys
 sys.path.append("./")
 from summary_and_feedback_generation.evaluation_dimensions import (
     get_feedback,
+    get_multi_dimension_feedback,
     dimension_name_to_prompt,
     verbal_feedback_to_score,
 )
 from summary_and_feedback_generation.summary_generation import generate_summary
+from row_checkpoint import RowCheckpoint
+from article_store import SeenArticleStore
+from sqlite_cache import hash_key
 import os
 import pandas as pd
 import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from tqdm import tqdm
-import time
 
+# Maximum number of LLM calls in flight across all rows (the shared rate limiter may lower it further)
+MAX_IN_FLIGHT = int(os.getenv("SCORING_MAX_IN_FLIGHT", 32))
 
-async def fill_df_with_feedback_and_summary(path_to_df, save_folder, feedback_only_save_name, feedback_and_summary_save_name, override=False, sleep_time=1.0):
+
+def row_news_dict(row: pd.Series) -> Dict[str, Any]:
+    return {"content": row["content"], "title": row["title"], "description": row["description"]}
+
+
+async def process_rows(news_dicts: List[Dict[str, Any]],
+                       process_fn: Callable[[Dict[str, Any], asyncio.Semaphore], Awaitable[Dict[str, Any]]],
+                       checkpoint: RowCheckpoint,
+                       calls_per_row: int,
+                       max_in_flight: int = MAX_IN_FLIGHT,
+                       desc: str = "Processing rows") -> List[Dict[str, Any]]:
+    """
+    Run `process_fn` on many rows concurrently, skipping rows already in the checkpoint and appending each
+    finished row to it.
+
+    Args:
+        news_dicts (list): Inputs of the rows.
+        process_fn (callable): Async function (news_dict, llm_slots) -> record; it holds one of `llm_slots` per LLM call.
+        checkpoint (RowCheckpoint): Checkpoint finished rows are read from and appended to.
+        calls_per_row (int): Number of LLM calls a row makes, used to size the pool of row workers.
+        max_in_flight (int): Maximum number of LLM calls in flight across all rows.
+        desc (str): Progress bar description.
+
+    Returns:
+        list: The record of every row, in input order.
+
+    Raises:
+        RuntimeError: If some rows failed. The finished rows are checkpointed, so a rerun only retries the failed ones.
+    """
+    keys = [hash_key(news_dict) for news_dict in news_dicts]
+    pending = [(key, news_dict) for key, news_dict in dict(zip(keys, news_dicts)).items() if key not in checkpoint]
+    if len(pending) < len(set(keys)):
+        print(f"{desc}: resuming, {len(set(keys)) - len(pending)} rows already in {checkpoint.path}")
+
+    llm_slots = asyncio.Semaphore(max_in_flight)
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    failures = []
+    progress = tqdm(total=len(pending), desc=desc)
+
+    async def worker() -> None:
+        while not queue.empty():
+            key, news_dict = queue.get_nowait()
+            try:
+                record = await process_fn(news_dict, llm_slots)
+            except Exception as e:
+                logging.error(f"{desc}: row '{news_dict.get('title')}' failed: {str(e)}")
+                failures.append(key)
+                continue
+            checkpoint.append(key, record)
+            progress.update(1)
+
+    # Enough row workers to keep max_in_flight calls busy
+    num_workers = max(1, -(-max_in_flight // calls_per_row))
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(num_workers, len(pending)))))
+    finally:
+        progress.close()
+        checkpoint.close()
+    if failures:
+        raise RuntimeError(f"{desc}: {len(failures)} rows failed; rerun to retry them (finished rows are checkpointed in {checkpoint.path})")
+    return [checkpoint.get(key) for key in keys]
+
+
+async def score_row(news_dict: Dict[str, Any], llm_slots: asyncio.Semaphore) -> Dict[str, Any]:
+    async def limited_feedback(dimension_name: str):
+        async with llm_slots:
+            return await get_feedback(news_dict, dimension_name)
+
+    dimension_names = list(dimension_name_to_prompt.keys())
+    results = await asyncio.gather(*(limited_feedback(dimension_name) for dimension_name in dimension_names))
+    record = {}
+    for dim_name, feedback in zip(dimension_names, results):
+        record[f"critique/{dim_name}"] = feedback.critique
+        record[f"news_meets_standards/{dim_name}"] = feedback.news_meets_standards
+    return record
+
+
+async def score_row_multi_dimension(news_dict: Dict[str, Any], llm_slots: asyncio.Semaphore) -> Dict[str, Any]:
+    async with llm_slots:
+        ratings = await get_multi_dimension_feedback(news_dict, list(dimension_name_to_prompt.keys()))
+    record = {}
+    for dim_name, feedback in ratings.items():
+        record[f"critique/{dim_name}"] = feedback.critique
+        record[f"news_meets_standards/{dim_name}"] = feedback.news_meets_standards
+    return record
+
+
+async def summarize_row(news_dict: Dict[str, Any], llm_slots: asyncio.Semaphore) -> Dict[str, Any]:
+    async with llm_slots:
+        summary = await generate_summary(news_dict)
+    return {"ev_summary": summary.summary}
+
+
+def seed_store(previous_path: str, lookup: Callable[[str], Optional[Dict[str, Any]]], record_fn: Callable[[str, Dict[str, Any]], None], columns: List[str]) -> None:
+    """
+    Copy the results of an output CSV into the store for the URLs it has no results for yet (e.g. a CSV
+    written before the store existed).
+    """
+    if not os.path.exists(previous_path):
+        return
+    for _, row in pd.read_csv(previous_path).iterrows():
+        if isinstance(row.get("url"), str) and lookup(row["url"]) is None:
+            record_fn(row["url"], {column: row[column] for column in columns})
+
+
+async def process_delta(df: pd.DataFrame,
+                        lookup: Optional[Callable[[str], Optional[Dict[str, Any]]]],
+                        record_fn: Optional[Callable[[str, Dict[str, Any]], None]],
+                        process_fn: Callable[[Dict[str, Any], asyncio.Semaphore], Awaitable[Dict[str, Any]]],
+                        checkpoint: RowCheckpoint,
+                        calls_per_row: int,
+                        max_in_flight: int,
+                        desc: str) -> List[Dict[str, Any]]:
+    """
+    Reuse the results `lookup(url)` finds for the rows and run `process_fn` on the other rows only (see
+    process_rows). New results are saved with `record_fn(url, record)`.
+
+    Returns:
+        list: The record of every row, in row order.
+    """
+    urls = df["url"].tolist()
+    stored, missing = {}, []
+    for position, url in enumerate(urls):
+        record = lookup(url) if lookup is not None and isinstance(url, str) else None
+        if record is None:
+            missing.append(position)
+        else:
+            stored[position] = record
+
+    news_dicts = [row_news_dict(df.iloc[position]) for position in missing]
+    new_records = await process_rows(news_dicts, process_fn, checkpoint, calls_per_row=calls_per_row,
+                                     max_in_flight=max_in_flight, desc=desc)
+    for position, record in zip(missing, new_records):
+        stored[position] = record
+        if record_fn is not None and isinstance(urls[position], str):
+            record_fn(urls[position], record)
+    print(f"{desc}: {len(df) - len(missing)} rows reused, {len(missing)} rows processed")
+    return [stored[position] for position in range(len(df))]
+
+
+def stored_summary(store: SeenArticleStore, url: str) -> Optional[Dict[str, Any]]:
+    summary = store.get_summary(url)
+    return {"ev_summary": summary} if summary is not None else None
+
+
+async def fill_df_with_feedback_and_summary(path_to_df, save_folder, feedback_only_save_name, feedback_and_summary_save_name, override=False, max_in_flight=MAX_IN_FLIGHT, multi_dimension=False, incremental=True, store_path=None):
+    """
+    Score the articles on every evaluation dimension, then summarize the relevant ones.
+
+    With `multi_dimension=True`, all dimensions of an article are rated in one call instead of one call per
+    dimension; the output columns are the same.
+
+    With `incremental=True`, feedback and summaries are kept per URL in the seen-article store (see
+    article_store.py) and only the articles without stored results are processed; the outputs are always
+    rewritten for the whole input. Without it, an existing output is kept unless `override` is set.
+    `override` recomputes every row.
+    """
     df = pd.read_csv(path_to_df)
     dimension_names = list(dimension_name_to_prompt.keys())
-    feedbacks = {dim_nam : [] for dim_nam in dimension_names}
-    feedbacks_scores = {dim_nam : [] for dim_nam in dimension_names}
-    
-    if os.path.exists(os.path.join(save_folder, feedback_only_save_name)) and not override:
-        df = pd.read_csv(os.path.join(save_folder, feedback_only_save_name))
+    feedback_columns = [f"{kind}/{dim_name}" for dim_name in dimension_names for kind in ("critique", "news_meets_standards")]
+    feedback_path = os.path.join(save_folder, feedback_only_save_name)
+    summary_path = os.path.join(save_folder, feedback_and_summary_save_name)
+
+    store = SeenArticleStore(store_path) if incremental else None
+    reuse_stored = store is not None and not override
+    if store is not None:
+        lookup_feedback = store.get_feedback if reuse_stored else None
+        lookup_summary = (lambda url: stored_summary(store, url)) if reuse_stored else None
+        record_feedback = store.record_feedback
+        record_summary = lambda url, record: store.record_summary(url, record["ev_summary"])
     else:
-        for i, row in tqdm(df.iterrows(), total=len(df), desc="Generating Feedback"):
-            news_dict = {"content": row["content"], "title": row["title"], "description": row["description"]}
-                
-            tasks = [
-                get_feedback(news_dict, dimension_name)
-                for dimension_name in dimension_names
-            ]
-
-            # Gather all tasks to run them concurrently
-            results = await asyncio.gather(*tasks)
-            
-            # Append the results to the feedback dictionary
-            for dim_name, feedback in zip(dimension_names, results):
-                feedbacks[dim_name].append(feedback.critique)
-                feedbacks_scores[dim_name].append(feedback.news_meets_standards)
-            time.sleep(sleep_time)
-                
-        for dim_name in dimension_names:
-            df[f"critique/{dim_name}"] = feedbacks[dim_name]
-            df[f"news_meets_standards/{dim_name}"] = feedbacks_scores[dim_name]
-            
+        lookup_feedback = lookup_summary = record_feedback = record_summary = None
+
+    if os.path.exists(feedback_path) and not override and store is None:
+        df = pd.read_csv(feedback_path)
+    else:
+        # Step 1: Score every row on all dimensions, resuming from the checkpoint of an interrupted run
+        if reuse_stored:
+            seed_store(feedback_path, lookup_feedback, record_feedback, feedback_columns)
+        # The two modes give different ratings: keep their checkpoints apart
+        checkpoint_suffix = ".multi_dimension" if multi_dimension else ""
+        checkpoint = RowCheckpoint(f"{feedback_path}{checkpoint_suffix}.checkpoint.jsonl")
+        if override:
+            checkpoint.clear()
+        if multi_dimension:
+            process_fn, calls_per_row = score_row_multi_dimension, 1
+        else:
+            process_fn, calls_per_row = score_row, len(dimension_names)
+        records = await process_delta(df, lookup_feedback, record_feedback, process_fn, checkpoint, calls_per_row,
+                                      max_in_flight, desc="Generating Feedback")
+        df = pd.concat([df, pd.DataFrame(records, index=df.index)], axis=1)
+
         for column in dimension_names:
             df[f"score/{column}"] = df[f"news_meets_standards/{column}"].map(lambda x: verbal_feedback_to_score[x.lower()])
-    
-        df.to_csv(os.path.join(save_folder, feedback_only_save_name), index=False)
-    
-    if os.path.exists(os.path.join(save_folder, feedback_and_summary_save_name)) and not override:
+
+        df.to_csv(feedback_path, index=False)
+        checkpoint.clear()
+
+    if os.path.exists(summary_path) and not override and store is None:
         return
     else:
-        above_up_to_date_threshold_df = df[df["score/up-to-date"] >= 0]
-        summaries = []
-        sleep_every = 10
-        for i, row in tqdm(above_up_to_date_threshold_df.iterrows(), total=len(above_up_to_date_threshold_df), desc="Generating Summaries"):
-            news_dict = {"content": row["content"], "title": row["title"], "description": row["description"]}
-            summary = await generate_summary(news_dict)
-            summaries.append(summary.summary)
-            if i % sleep_every == 0:
-                time.sleep(sleep_time)
-            
-        above_up_to_date_threshold_df["ev_summary"] = summaries
+        # Step 2: Summarize the relevant rows, with its own checkpoint
+        above_up_to_date_threshold_df = df[df["score/up-to-date"] >= 0].copy()
+        if reuse_stored:
+            seed_store(summary_path, lookup_summary, record_summary, ["ev_summary"])
+        checkpoint = RowCheckpoint(f"{summary_path}.checkpoint.jsonl")
+        if override:
+            checkpoint.clear()
+        records = await process_delta(above_up_to_date_threshold_df, lookup_summary, record_summary, summarize_row,
+                                      checkpoint, 1, max_in_flight, desc="Generating Summaries")
 
-        above_up_to_date_threshold_df.to_csv(os.path.join(save_folder, feedback_and_summary_save_name), index=False)
+        above_up_to_date_threshold_df["ev_summary"] = [record["ev_summary"] for record in records]
+
+        above_up_to_date_threshold_df.to_csv(summary_path, index=False)
+        checkpoint.clear()
+    if store is not None:
+        store.close()
 
 
 if __name__ == "__main__":
     override = False
+    multi_dimension = os.getenv("MULTI_DIMENSION_FEEDBACK", "0") == "1"
     path_to_df = "data/news_articles.csv"
     save_folder = "data"
     feedback_only_save_name = "news_articles_with_feedback.csv"
     feedback_and_summary_save_name = "relevant_news_articles_with_feedback_and_summary.csv"
-    asyncio.run(fill_df_with_feedback_and_summary(path_to_df, save_folder, feedback_only_save_name, feedback_and_summary_save_name,override=override))
-    
-    
\ No newline at end of file
+    asyncio.run(fill_df_with_feedback_and_summary(path_to_df, save_folder, feedback_only_save_name, feedback_and_summary_save_name,override=override, multi_dimension=multi_dimension))
+
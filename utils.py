@@ -1,25 +1,28 @@
-from litellm import acompletion, aembedding, completion, embedding
-import os
-from functools import partial
-from newspaper import Article
-import requests
-import re
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import base64
 import json
-from typing import List, Dict, Optional
-import pandas as pd
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import time
+from functools import partial
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-import base64
-import os
-from typing import List
-from fastapi import FastAPI, HTTPException
-import requests
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
-import logging
+
+from clients import get_async_openai_client, get_http_client
+from image_probe import cached_probe_image, find_live_images
+from image_cache import get_image_search_cache, image_search_key
+from llm_cache import cached_acompletion, cached_completion
+from metrics import external_call, span
+from rate_limiter import AsyncRateLimiter, get_rate_limiter
+
+if TYPE_CHECKING:
+    from extraction import ExtractedArticle
+
+# litellm, newspaper, openai, fastapi and the lxml extraction are imported by the functions using them: together
+# they take seconds to import, which every API worker and pipeline script would otherwise pay at startup
 
 
 load_dotenv(override=True)
@@ -27,8 +30,11 @@ load_dotenv(override=True)
 # Load OpenAI API key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 BING_API_KEY = os.getenv("BING_API_KEY")
+BING_IMAGE_SEARCH_URL = os.getenv("BING_IMAGE_SEARCH_URL", "https://api.bing.microsoft.com/v7.0/images/search")
+# Endpoint of the Azure OpenAI deployments used through litellm
+AZURE_API_BASE = os.getenv("AZURE_API_BASE", "https://hackatum-2024.openai.azure.com")
 
-def fetch_images(query: str, num_images: int = 10) -> List[bytes]:
+async def fetch_images(query: str, num_images: int = 10) -> List[bytes]:
     """
     Fetch images from Bing Image Search API, filtering by specific formats.
 
@@ -39,7 +45,7 @@ def fetch_images(query: str, num_images: int = 10) -> List[bytes]:
     Returns:
          images (List(str)): List of image urls in valid format (accepted by chatgpt).
     """
-    search_url = "https://api.bing.microsoft.com/v7.0/images/search"
+    search_url = BING_IMAGE_SEARCH_URL
     headers = {"Ocp-Apim-Subscription-Key": BING_API_KEY}
     print(headers)
 
@@ -54,31 +60,33 @@ def fetch_images(query: str, num_images: int = 10) -> List[bytes]:
         "safeSearch": "Moderate",  # Safe search level
     }
 
-    response = requests.get(search_url, headers=headers, params=params)
-    if response.status_code != 200:
-        print('Error withing image generation')
-        print(response.text)
-        raise HTTPException(status_code=500, detail="Failed to fetch images from Bing.")
+    # Reuse the candidates of an earlier search for the same (normalized) query
+    search_cache = get_image_search_cache()
+    cache_key = image_search_key(query, num_images)
+    with span("bing_search"):
+        image_urls = await search_cache.aget(cache_key)
+        if image_urls is None:
+            with external_call("bing", "image_search") as call:
+                response = await get_http_client().get(search_url, headers=headers, params=params)
+                if response.status_code != 200:
+                    call["outcome"] = f"http_{response.status_code}"
+            if response.status_code != 200:
+                from fastapi import HTTPException
+                print('Error withing image generation')
+                print(response.text)
+                raise HTTPException(status_code=500, detail="Failed to fetch images from Bing.")
 
-    results = response.json()
-    image_urls = [img["contentUrl"] for img in results.get("value", [])]
+            results = response.json()
+            image_urls = [img["contentUrl"] for img in results.get("value", [])]
+            await search_cache.aset(cache_key, image_urls)
     print(image_urls)
     # Valid file extensions to check against
     valid_extensions = (".png", ".jpeg", ".jpg")
 
-    images = []
-    for url in image_urls:
-        print(f"current url {url} is valid {url.lower().endswith(valid_extensions)}")
-        # Check if the URL ends with a valid image format
-        if url.lower().endswith(valid_extensions) and urlIsAlive(url):
-            try:
-                images.append(url)
-
-                # Stop if we have enough images
-                if len(images) >= num_images:
-                    break
-            except Exception:
-                continue  # Skip if the image can't be downloaded
+    # Keep the URLs with a valid image format, then probe them concurrently (HEAD / ranged GET, cached per URL)
+    candidate_urls = [url for url in image_urls if url.lower().endswith(valid_extensions)]
+    with span("image_probe"):
+        images = await find_live_images(candidate_urls, min(num_images, 5))
     
     print('Succesfully returned images urls')
     print(f"returning the following images urls: {images}")
@@ -90,7 +98,7 @@ def fetch_images(query: str, num_images: int = 10) -> List[bytes]:
 def convert_to_base64(image_data: bytes) -> str:
     return base64.b64encode(image_data).decode("utf-8")
 
-def generate_search_query_from_articles(articles_content: str) -> str:
+async def generate_search_query_from_articles(articles_content: str) -> str:
     """
     Use ChatGPT to generate a short search query from the given article content.
     
@@ -106,104 +114,98 @@ def generate_search_query_from_articles(articles_content: str) -> str:
     topic of the article(s) in a clear way. Please generate a concise description (less than 100 words) that can be used to search for a relevant image."""
     user_prompt = f"The articles content is as follows: {articles_content}"
     
-    client = OpenAI()
+    client = get_async_openai_client()
     try:
         # Send the request to OpenAI using the new interface
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.1  # Low temperature for more consistent results
-        )
+        with span("search_query"):
+            response = await cached_acompletion(get_rate_limiter("gpt-3.5-turbo").wrap(client.chat.completions.create))(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.1  # Low temperature for more consistent results
+            )
         # Extract and return the generated search query
         #search_query = response['choices'][0]['message']['content'].strip()
         search_query = response.choices[0].message.content
         return search_query
     
     except Exception as e:
+        from fastapi import HTTPException
         logging.error(f"Error generating search query from OpenAI: {e}")
         raise HTTPException(status_code=500, detail="Error generating image search query.")
 
-def urlIsAlive(image_url):
-    # Send GET request to the image URL
-    try:
-        response = requests.get(image_url)
-    except:
-        return False
-    # Check if the request was successful (status code 200)
-    return response.status_code == 200
+async def urlIsAlive(image_url):
+    # Probe the image URL without downloading it (results are cached per URL with a TTL)
+    return await cached_probe_image(image_url)
+
+
+
+MODEL_NAME_TO_API_VERSION = {
+    "text-embedding-ada-002": "2023-05-15",
+    "dall-e-3": "2024-02-01",
+    "gpt-4o": "2024-08-01-preview"
+}
 
+def get_completion_litellm_for_burda(model_name: str, async_f = True, cache = True, rate_limiter: Optional[AsyncRateLimiter] = None):
+    """
+    Build the litellm completion (or embedding) function for the Azure deployment of `model_name`.
 
+    Args:
+        model_name (str): Deployment name, one of MODEL_NAME_TO_API_VERSION.
+        async_f (bool): Return the async variant (acompletion / aembedding).
+        cache (bool): Serve repeated completion requests from the LLM response cache (see llm_cache.py).
+        rate_limiter (AsyncRateLimiter): Limiter async completions go through. Defaults to the shared limiter of the deployment.
 
-def get_completion_litellm_for_burda(model_name: str, async_f = True):
+    Returns:
+        callable: Completion or embedding function with the deployment settings bound.
+    """
     assert model_name in MODEL_NAME_TO_API_VERSION.keys(), f"model_name must be one of {MODEL_NAME_TO_API_VERSION.keys()}. If more have been added, please update the MODEL_NAME_TO_API_VERSION dictionary." 
     
-    MODEL_NAME_TO_API_VERSION = {
-        "text-embedding-ada-002": "2023-05-15",
-        "dall-e-3": "2024-02-01",
-        "gpt-4o": "2024-08-01-preview"
-    }
-    
+    from litellm import acompletion, aembedding, completion, embedding
+
     completion_func = completion if not async_f else acompletion
     embedding_func = embedding if not async_f else aembedding
     
     if model_name == "text-embedding-ada-002":
-        return partial(embedding_func, api_base = "https://hackatum-2024.openai.azure.com", api_version=MODEL_NAME_TO_API_VERSION[model_name], model = f"azure/{model_name}", api_key = os.getenv("AZURE_API_KEY"))
-    return partial(completion_func, api_base = "https://hackatum-2024.openai.azure.com", api_version=MODEL_NAME_TO_API_VERSION[model_name], model = f"azure/{model_name}", api_key = os.getenv("AZURE_API_KEY"))
+        return partial(embedding_func, api_base = AZURE_API_BASE, api_version=MODEL_NAME_TO_API_VERSION[model_name], model = f"azure/{model_name}", api_key = os.getenv("AZURE_API_KEY"))
+    completion_fn = partial(completion_func, api_base = AZURE_API_BASE, api_version=MODEL_NAME_TO_API_VERSION[model_name], model = f"azure/{model_name}", api_key = os.getenv("AZURE_API_KEY"))
+    if async_f:
+        # Rate limit below the cache, so cache hits do not use up the quota
+        completion_fn = (rate_limiter or get_rate_limiter(model_name)).wrap(completion_fn)
+    if cache:
+        completion_fn = cached_acompletion(completion_fn) if async_f else cached_completion(completion_fn)
+    return completion_fn
     
 
 
 
-def extract_article_content(url):
+def extract_article_content(url: str) -> "ExtractedArticle":
     """
-    Extract just the main article content from a news website.
+    Download a news page and extract its main article content (see extraction.extract_html).
     
     Args:
         url (str): URL of the news article
         
     Returns:
-        dict: Article title, text content, and publish date
+        ExtractedArticle: Article title, text content, publish date and extraction method ("failed", with
+            an empty text, if the page could not be fetched or parsed)
     """
+    from extraction import ExtractedArticle, extract_html
+    from news_collector.crawler import USER_AGENT
+
     try:
-        # Initialize Article object
-        article = Article(url)
-        article.download()
-        article.parse()
-        
-        # Get the main content
-        content = {
-            'title': article.title,
-            'text': article.text,
-            'publish_date': article.publish_date,
-        }
-        
-        # Clean the text content
-        content['text'] = re.sub(r'\n+', '\n', content['text'])  # Remove extra newlines
-        content['text'] = re.sub(r'\s+', ' ', content['text'])   # Remove extra whitespace
-        
-        return content['text']
-        
+        response = httpx.get(url, headers={"User-Agent": USER_AGENT}, timeout=15.0, follow_redirects=True)
+        response.raise_for_status()
+        return extract_html(url, response.text)
     except Exception as e:
+        # Invalid URLs (httpx.InvalidURL is not an HTTPError), network, HTTP and parsing errors: an empty result
         print(f"Error processing {url}: {str(e)}")
-        return {}
+        return ExtractedArticle(url=url)
 
-        
-client = OpenAI()
 
-def validate_article(content: Dict, use_litellm = False, wait_time = 0.75) -> Dict:
-    """
-    Validate if the content is a real article using ChatGPT.
-    
-    Args:
-        content (dict): Dictionary containing article content
-        
-    Returns:
-        dict: Original content with validation results added
-    """
-    
-    # Prepare the prompt
+def _validation_messages(content: Dict) -> List[Dict]:
     system_prompt = """Analyze the following text and determine if it's a real article or just website notices (like cookies, privacy policy, etc.).
     You need to base yourself on the full content of the article.
     Respond with a JSON object containing:
@@ -214,23 +216,27 @@ def validate_article(content: Dict, use_litellm = False, wait_time = 0.75) -> Di
 
     user_prompt = f"""Title: {content.get('title', 'No title')}
     Content: {content.get('full_content', '')}"""
-    time.sleep(wait_time)  # To avoid rate limiting
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def avalidate_article(content: Dict, completion_fn) -> Dict:
+    """
+    Validate if the content is a real article using ChatGPT.
+    
+    Args:
+        content (dict): Dictionary containing article content
+        completion_fn (callable): Async chat completion function (rate limited by the caller)
+        
+    Returns:
+        dict: Original content with validation results added
+    """
     try:
-        completion_kwargs = {
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.1  # Low temperature for more consistent results
-        }
-        if use_litellm:
-            completion_fn = get_completion_litellm_for_burda("gpt-4o")
-            response = completion_fn(**completion_kwargs)
-        else:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                **completion_kwargs,
-            )
+        response = await completion_fn(
+            messages=_validation_messages(content),
+            temperature=0.1  # Low temperature for more consistent results
+        )
         
         # Parse the response
         validation_result = json.loads(response.choices[0].message.content)
@@ -246,16 +252,64 @@ def validate_article(content: Dict, use_litellm = False, wait_time = 0.75) -> Di
         content.update({
             'is_valid_article': False,
             'validation_confidence': 0.0,
-            'validation_reason': f"Error during validation: {str(e)}"
+            'validation_reason': f"Error during validation: {str(e)}",
+            'validation_error': True  # Not judged by the model (rate limit, timeout, ...): retry on a later run
         })
         
     return content
 
+async def avalidate_articles(articles: List[Dict], use_litellm = False, rate_limiter: Optional[AsyncRateLimiter] = None) -> List[Dict]:
+    """
+    Validate articles concurrently. Calls share `rate_limiter` (the default shared limiter if None), which
+    bounds requests, tokens and concurrency and backs off on 429s.
+    
+    Args:
+        articles (list): List of article dictionaries
+        use_litellm (bool): Use the Azure deployment through litellm instead of the OpenAI API
+        rate_limiter (AsyncRateLimiter): Limiter the calls go through
+        
+    Returns:
+        list: The articles with validation results added, in input order
+    """
+    if use_litellm:
+        completion_fn = get_completion_litellm_for_burda("gpt-4o", rate_limiter=rate_limiter)
+        return await asyncio.gather(*(avalidate_article(article, completion_fn) for article in articles))
+    
+    from openai import AsyncOpenAI
+
+    rate_limiter = rate_limiter or get_rate_limiter("gpt-3.5-turbo")
+    # A client per batch (its connection pool is bound to the running event loop); retries are left to the limiter
+    async with AsyncOpenAI(max_retries=0) as openai_client:
+        completion_fn = partial(cached_acompletion(rate_limiter.wrap(openai_client.chat.completions.create)), model="gpt-3.5-turbo")
+        return await asyncio.gather(*(avalidate_article(article, completion_fn) for article in articles))
+
+def _run_sync(coroutine):
+    # asyncio.run cannot be nested: when called from a running event loop, run the coroutine on a fresh loop
+    # in a helper thread (this blocks the calling loop; async callers should await avalidate_articles)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def validate_article(content: Dict, use_litellm = False) -> Dict:
+    """
+    Validate if the content is a real article using ChatGPT.
+    
+    Args:
+        content (dict): Dictionary containing article content
+        
+    Returns:
+        dict: Original content with validation results added
+    """
+    return _run_sync(avalidate_articles([content], use_litellm=use_litellm))[0]
+
 def batch_validate_articles(articles: List[Dict], 
                             confidence_threshold: float = 0.8,
                             use_litellm=False) -> Dict[str, List[Dict]]:
     """
-    Validate multiple articles and separate them into valid and invalid.
+    Validate multiple articles concurrently and separate them into valid and invalid.
     
     Args:
         articles (list): List of article dictionaries
@@ -267,9 +321,7 @@ def batch_validate_articles(articles: List[Dict],
     valid_articles = []
     invalid_articles = []
     
-    for article in articles:
-        validated_article = validate_article(article, use_litellm=use_litellm)
-        
+    for validated_article in _run_sync(avalidate_articles(articles, use_litellm=use_litellm)):
         if (validated_article['is_valid_article'] and 
             validated_article['validation_confidence'] >= confidence_threshold):
             valid_articles.append(validated_article)
@@ -319,7 +371,8 @@ def normalize_article(article: Dict, source: str) -> Dict:
             'author': None,  # Bing News API doesn't provide author in basic response
             'content': article.get('full_content'),
             'category': article.get('category'),
-            'data_source': 'bing'
+            'data_source': 'bing',
+            'duplicate_urls': ' '.join(article.get('duplicate_urls') or [])  # Near-duplicate copies that were dropped
         }
     elif source == 'rss':
         return {
@@ -332,7 +385,8 @@ def normalize_article(article: Dict, source: str) -> Dict:
             'author': article.get('author'),
             'content': article.get('full_content'),
             'category': None,  # RSS typically doesn't include category
-            'data_source': 'rss'
+            'data_source': 'rss',
+            'duplicate_urls': ' '.join(article.get('duplicate_urls') or [])  # Near-duplicate copies that were dropped
         }
     
     return {}
\ No newline at end of file